@@ -1,34 +1,61 @@
+import time
+
+_INICIO_IMPORTS = time.perf_counter()
+
 import os
+import json
 import logging
 from flask import Flask, render_template
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
-from sqlalchemy import text
+from sqlalchemy import event, text
 from dotenv import load_dotenv
 
+from .inicializacao import RelatorioInicializacao, modo_execucao, opcoes_do_engine, usa_pooler
+from .metricas import registrar_metricas
+from .replicas import SessaoRoteada, binds_das_replicas, registrar_roteamento
+from .tempo_real import registrar_tempo_real
+
+_DURACAO_IMPORTS_MS = (time.perf_counter() - _INICIO_IMPORTS) * 1000
+
 # ============================================================
 # 🔹 Instâncias globais
 # ============================================================
-db = SQLAlchemy()
-migrate = Migrate()
+db = SQLAlchemy(session_options={"class_": SessaoRoteada})  # leituras de GET podem ir às réplicas
+migrate = None  # Flask-Migrate (alembic) só é carregado fora do modo serverless
 
 
 # ============================================================
 # 🔹 Fábrica da aplicação Flask
 # ============================================================
 def create_app():
-    """Cria e configura a aplicação Flask Escala360."""
-    load_dotenv()  # Carrega variáveis do .env local
+    """Cria e configura a aplicação Flask Escala360.
+
+    O modo de execução (MODO_EXECUCAO: local, servidor ou serverless)
+    define carga do .env, nível de log, estratégia de pool e se a
+    conexão com o banco é testada na subida ou só na primeira requisição.
+    """
+    global migrate
+
+    modo = modo_execucao()
+    relatorio = RelatorioInicializacao(modo)
+    relatorio.registrar("imports (flask, sqlalchemy)", _DURACAO_IMPORTS_MS)
+
+    if modo != "serverless":
+        with relatorio.etapa("load_dotenv"):
+            load_dotenv()  # Carrega variáveis do .env local
+        modo = relatorio.modo = modo_execucao()  # o .env pode definir MODO_EXECUCAO
 
     app = Flask(__name__)
 
     # -----------------------------
     # Configuração de logs (para Vercel)
     # -----------------------------
-    handler = logging.StreamHandler()
-    handler.setLevel(logging.DEBUG)
-    app.logger.addHandler(handler)
-    app.logger.setLevel(logging.DEBUG)
+    nivel = os.getenv("LOG_LEVEL") or ("DEBUG" if modo == "local" else "INFO")
+    if not app.logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setLevel(nivel)
+        app.logger.addHandler(handler)
+    app.logger.setLevel(nivel)
 
     # -----------------------------
     # Configurações principais
@@ -36,6 +63,30 @@ def create_app():
     app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "dev_secret")
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     app.config["SQLALCHEMY_ECHO"] = os.getenv("SQLALCHEMY_ECHO", "False") == "True"
+    app.config["SUGESTAO_INDICE_TTL"] = int(os.getenv("SUGESTAO_INDICE_TTL", "60"))
+    # Mapa id_funcao -> cargos aceitos, ex.: {"1": ["Enfermeira", "Enfermeiro"]}
+    app.config["FUNCOES_CARGOS"] = json.loads(os.getenv("FUNCOES_CARGOS", "{}"))
+    app.config["MODO_EXECUCAO"] = modo
+    # Worker de notificações (flask notificacoes worker)
+    app.config["NOTIFICACOES_LOTE"] = int(os.getenv("NOTIFICACOES_LOTE", "100"))
+    app.config["NOTIFICACOES_THREADS"] = int(os.getenv("NOTIFICACOES_THREADS", "4"))
+    app.config["NOTIFICACOES_MAX_TENTATIVAS"] = int(os.getenv("NOTIFICACOES_MAX_TENTATIVAS", "5"))
+    app.config["NOTIFICACOES_TAXA_EMAIL"] = float(os.getenv("NOTIFICACOES_TAXA_EMAIL", "10"))
+    app.config["NOTIFICACOES_TAXA_WHATSAPP"] = float(os.getenv("NOTIFICACOES_TAXA_WHATSAPP", "5"))
+    # Segundos em que um cliente lê do primário após uma escrita (réplicas de leitura)
+    app.config["REPLICA_ADERENCIA_S"] = int(os.getenv("REPLICA_ADERENCIA_S", "10"))
+    # Instrumentação, perfil das requisições lentas (0 = desligado) e GET /metrics (só com token)
+    app.config["METRICAS"] = os.getenv("METRICAS", "True") == "True"
+    app.config["METRICAS_TOKEN"] = os.getenv("METRICAS_TOKEN", "")
+    app.config["METRICAS_PERFIL_LENTO_MS"] = float(os.getenv("METRICAS_PERFIL_LENTO_MS", "0"))
+    app.config["METRICAS_PERFIL_DIR"] = os.getenv("METRICAS_PERFIL_DIR", "perfis_lentos")
+    # Clientes de GET /api/alteracoes (SSE) por processo
+    app.config["TEMPO_REAL_MAX_CLIENTES"] = int(os.getenv("TEMPO_REAL_MAX_CLIENTES", "100"))
+    # Feeds /profissionais/<id>/agenda.ics|.json: janela exibida, fuso e intervalo sugerido ao calendário
+    app.config["AGENDA_DIAS_PASSADOS"] = int(os.getenv("AGENDA_DIAS_PASSADOS", "60"))
+    app.config["AGENDA_DIAS_FUTUROS"] = int(os.getenv("AGENDA_DIAS_FUTUROS", "180"))
+    app.config["AGENDA_FUSO"] = os.getenv("AGENDA_FUSO", "America/Sao_Paulo")
+    app.config["AGENDA_ATUALIZAR_MIN"] = int(os.getenv("AGENDA_ATUALIZAR_MIN", "60"))
 
     # -----------------------------
     # Configuração do PostgreSQL (Neon ou Local)
@@ -61,82 +112,130 @@ def create_app():
         )
         app.logger.info("💻 Usando banco local (localhost)")
 
+    # Estratégia de pool: NullPool (serverless) ou QueuePool com pre-ping
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = opcoes_do_engine(
+        modo, app.config["SQLALCHEMY_DATABASE_URI"]
+    )
+    app.logger.info(
+        f"🔌 Pool: {app.config['SQLALCHEMY_ENGINE_OPTIONS']['poolclass'].__name__}"
+        + (" (pooler de transações)" if usa_pooler(app.config["SQLALCHEMY_DATABASE_URI"]) else "")
+    )
+    # Réplicas de leitura (DATABASE_REPLICA_URLS): um bind com pool próprio por réplica
+    app.config["SQLALCHEMY_BINDS"] = binds_das_replicas(modo, opcoes_do_engine)
+
     # -----------------------------
     # Inicialização das extensões
     # -----------------------------
-    db.init_app(app)
-    migrate.init_app(app, db)
+    with relatorio.etapa("extensões (SQLAlchemy)"):
+        db.init_app(app)
+
+    if modo != "serverless":
+        # Migrações só rodam pela CLI; na Vercel o import do alembic é evitado
+        with relatorio.etapa("extensões (Flask-Migrate)"):
+            from flask_migrate import Migrate
+
+            migrate = migrate or Migrate()
+            migrate.init_app(app, db)
 
     # -----------------------------
     # Teste de conexão (com log)
     # -----------------------------
-    with app.app_context():
-        try:
-            db.session.execute(text("SELECT 1"))
-            app.logger.info("✅ Conexão com o banco estabelecida com sucesso!")
-        except Exception as e:
-            app.logger.error(f"❌ Erro ao conectar ao banco de dados: {e}")
+    verificar = os.getenv("VERIFICAR_BANCO_NA_INICIALIZACAO")
+    verificar = modo != "serverless" if verificar is None else verificar == "True"
+    if verificar:
+        with relatorio.etapa("conexão com o banco (SELECT 1)"), app.app_context():
+            try:
+                db.session.execute(text("SELECT 1"))
+                app.logger.info("✅ Conexão com o banco estabelecida com sucesso!")
+            except Exception as e:
+                app.logger.error(f"❌ Erro ao conectar ao banco de dados: {e}")
+    else:
+        # A primeira conexão acontece na primeira requisição; mede o handshake
+        with app.app_context():
+            _medir_primeira_conexao(db.engine, relatorio, app.logger)
 
     # -----------------------------
     # Importa os modelos e rotas
     # -----------------------------
-    from . import models  # noqa: F401
-    from .routes.profissionais import bp as profissionais_bp
-    from .routes.plantoes import bp as plantoes_bp
-    from .routes.escalas import bp as escalas_bp
-    from .routes.substituicoes import bp as substituicoes_bp
-    from .routes.api import bp as api_bp
+    # O Flask não aceita novas rotas após a primeira requisição, então os
+    # Blueprints são registrados aqui; os serviços pesados que eles usam
+    # são importados apenas dentro das views que os chamam.
+    with relatorio.etapa("modelos e resumos"):
+        from . import models  # noqa: F401
+        from .servicos.resumos import dados_do_painel  # também registra os eventos dos resumos
+        from .servicos import auditoria  # noqa: F401  (eventos da trilha de auditoria)
+        from .servicos import agendas  # noqa: F401  (versões das agendas por profissional)
+
+    with relatorio.etapa("blueprints"):
+        from .routes.profissionais import bp as profissionais_bp
+        from .routes.plantoes import bp as plantoes_bp
+        from .routes.escalas import bp as escalas_bp
+        from .routes.substituicoes import bp as substituicoes_bp
+        from .routes.api import bp as api_bp
+
+        app.register_blueprint(profissionais_bp, url_prefix="/profissionais")
+        app.register_blueprint(plantoes_bp, url_prefix="/plantoes")
+        app.register_blueprint(escalas_bp, url_prefix="/escalas")
+        app.register_blueprint(substituicoes_bp, url_prefix="/substituicoes")
+        app.register_blueprint(api_bp, url_prefix="/api")
+
+    registrar_roteamento(app, db)
+
+    with relatorio.etapa("métricas"):
+        registrar_metricas(app, db)
+    registrar_tempo_real(app)
+
+    # -----------------------------
+    # Comandos de linha de comando
+    # -----------------------------
+    from .comandos import registrar_comandos
+
+    registrar_comandos(app)
 
-    app.register_blueprint(profissionais_bp, url_prefix="/profissionais")
-    app.register_blueprint(plantoes_bp, url_prefix="/plantoes")
-    app.register_blueprint(escalas_bp, url_prefix="/escalas")
-    app.register_blueprint(substituicoes_bp, url_prefix="/substituicoes")
-    app.register_blueprint(api_bp, url_prefix="/api")
+    relatorio.finalizar()
+    app.extensions["escala360_inicializacao"] = relatorio
+    app.logger.info(relatorio.formatar())
 
     # -----------------------------
     # Rota principal (Painel BI)
     # -----------------------------
     @app.route("/")
     def index():
-        """Página inicial (Painel BI - Fase 6)."""
+        """Página inicial (Painel BI - Fase 6).
+
+        Lê os agregados pré-calculados (tabelas resumo_*), mantidos
+        incrementalmente por app/servicos/resumos.py.
+        """
         try:
-            q1 = text("""
-                SELECT p.nome, COUNT(e.id) AS total_plantoes
-                FROM profissionais p
-                LEFT JOIN escalas e ON e.id_profissional = p.id
-                GROUP BY p.nome
-                ORDER BY total_plantoes DESC
-            """)
-
-            q2 = text("""
-                SELECT status, COUNT(*) AS total
-                FROM substituicoes
-                GROUP BY status
-                ORDER BY total DESC
-            """)
-
-            q3 = text("""
-                SELECT data::date AS dia, COUNT(*) AS total
-                FROM plantoes
-                GROUP BY dia
-                ORDER BY dia
-            """)
-
-            r1 = db.session.execute(q1).mappings().all()
-            r2 = db.session.execute(q2).mappings().all()
-            r3 = db.session.execute(q3).mappings().all()
+            r1, r2, r3 = dados_do_painel()
 
             return render_template(
                 "index.html",
-                carga_labels=[r["nome"] for r in r1],
-                carga_values=[int(r["total_plantoes"] or 0) for r in r1],
-                pizza_labels=[r["status"] for r in r2],
-                pizza_values=[int(r["total"] or 0) for r in r2],
-                linha_labels=[r["dia"].isoformat() for r in r3],
-                linha_values=[int(r["total"] or 0) for r in r3],
+                carga_labels=[r.nome for r in r1],
+                carga_values=[int(r.total or 0) for r in r1],
+                pizza_labels=[r.status for r in r2],
+                pizza_values=[int(r.total or 0) for r in r2],
+                linha_labels=[r.dia.isoformat() for r in r3],
+                linha_values=[int(r.total or 0) for r in r3],
             )
         except Exception as e:
             app.logger.error(f"❌ Erro ao renderizar index(): {e}")
             return render_template("erro.html", erro=str(e)), 500
 
     return app
+
+
+def _medir_primeira_conexao(engine, relatorio, logger):
+    """Registra no relatório o tempo do primeiro handshake com o banco."""
+    inicio = {}
+
+    @event.listens_for(engine, "do_connect")
+    def _antes(dialect, conn_rec, cargs, cparams):
+        inicio.setdefault("t0", time.perf_counter())
+
+    @event.listens_for(engine, "connect")
+    def _depois(dbapi_conn, conn_rec):
+        if "ms" not in inicio and "t0" in inicio:
+            inicio["ms"] = (time.perf_counter() - inicio["t0"]) * 1000
+            relatorio.registrar("primeira conexão (adiada p/ 1ª requisição)", inicio["ms"])
+            logger.info(f"🔌 Primeira conexão com o banco: {inicio['ms']:.1f} ms")
@@ -0,0 +1,231 @@
+# ============================================================
+# 🗄️ Cache HTTP — Versões por Tabela, ETag e Cache LRU
+# ============================================================
+# Cada commit que altera profissionais, plantões, escalas ou
+# substituições incrementa a versão da tabela (versoes_tabelas).
+# As listagens decoradas com @condicional(...) calculam um ETag
+# forte a partir de rota + parâmetros + versões das tabelas que
+# exibem — uma consulta a uma tabela de poucas linhas:
+#   • If-None-Match / If-Modified-Since válidos → 304, sem
+#     consultar os dados. Last-Modified tem resolução de segundos:
+#     vale o segundo seguinte à última alteração, e só é enviado
+#     depois que esse segundo passou (uma segunda alteração no
+#     mesmo segundo nunca fica escondida atrás de um 304);
+#   • caso contrário, o corpo já renderizado é reaproveitado do
+#     cache LRU do processo (limitado em bytes), ou gerado uma
+#     vez e guardado.
+# Gravações em lote fora do ORM chamam marcar_alteradas().
+# ============================================================
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import timedelta, timezone
+from functools import wraps
+
+from flask import make_response, request
+from sqlalchemy import event, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from . import db
+from .models import Escala, Plantao, Profissional, Substituicao, VersaoTabela
+
+VERSIONADOS = (Profissional, Plantao, Escala, Substituicao)
+
+_CHAVE = "tabelas_alteradas"
+
+
+# ------------------------------------------------------------
+# 🔹 Versões por tabela
+# ------------------------------------------------------------
+def marcar_alteradas(session, *tabelas):
+    """Registra tabelas alteradas na transação (a versão sobe no commit)."""
+    session.info.setdefault(_CHAVE, set()).update(tabelas)
+
+
+@event.listens_for(Session, "after_flush")
+def _acumular(session, flush_context):
+    tabelas = {
+        obj.__tablename__
+        for obj in (*session.new, *session.deleted, *session.dirty)
+        if isinstance(obj, VERSIONADOS)
+        and (obj not in session.dirty or session.is_modified(obj, include_collections=False))
+    }
+    if tabelas:
+        marcar_alteradas(session, *tabelas)
+
+
+@event.listens_for(Session, "before_commit")
+def _incrementar(session):
+    session.flush()  # o flush final do commit só acontece após este evento
+    tabelas = session.info.pop(_CHAVE, None)
+    if not tabelas:
+        return
+    tabela = VersaoTabela.__table__
+    # Relógio no momento da gravação (now() seria o início da transação, bem antes do commit)
+    agora = func.timezone("utc", func.clock_timestamp())
+    # Ordem fixa: transações concorrentes travam as linhas na mesma sequência
+    stmt = pg_insert(tabela).values([{"tabela": t, "versao": 1, "alterado_em": agora} for t in sorted(tabelas)])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["tabela"],
+        set_={"versao": tabela.c.versao + 1, "alterado_em": stmt.excluded.alterado_em},
+    )
+    session.connection().execute(stmt)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar(session):
+    session.info.pop(_CHAVE, None)
+
+
+def _segundo_seguinte(momento):
+    return momento.replace(microsecond=0) + timedelta(seconds=1)
+
+
+def versoes_de(tabelas):
+    """Retorna ({tabela: versão}, Last-Modified em UTC ou None) com uma única consulta.
+
+    Last-Modified é o segundo seguinte à última alteração, e None enquanto
+    esse segundo não passou no relógio do banco: um cliente só recebe um
+    Last-Modified X depois de X, então qualquer alteração posterior dá um
+    valor maior que X.
+    """
+    linhas = db.session.execute(
+        db.select(
+            VersaoTabela.tabela,
+            VersaoTabela.versao,
+            VersaoTabela.alterado_em,
+            func.timezone("utc", func.statement_timestamp()).label("agora"),
+        )
+        .where(VersaoTabela.tabela.in_(tabelas))
+    ).all()
+    versoes = {t: 0 for t in tabelas}
+    ultima = agora = None
+    for tabela, versao, alterado_em, agora in linhas:
+        versoes[tabela] = versao
+        if ultima is None or alterado_em > ultima:
+            ultima = alterado_em
+    if ultima is None or agora < _segundo_seguinte(ultima):
+        return versoes, None
+    return versoes, _segundo_seguinte(ultima).replace(tzinfo=timezone.utc)
+
+
+# ------------------------------------------------------------
+# 🔹 Cache LRU de respostas
+# ------------------------------------------------------------
+class CacheLRU:
+    """Corpos de resposta por chave, descartando os menos usados acima de `max_bytes`."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.max_entrada = max_bytes // 4  # uma resposta não ocupa o cache inteiro
+        self.bytes = 0
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is not None:
+                self._itens.move_to_end(chave)
+            return item
+
+    def guardar(self, chave, corpo, mimetype):
+        if len(corpo) > self.max_entrada:
+            return
+        with self._lock:
+            anterior = self._itens.pop(chave, None)
+            if anterior is not None:
+                self.bytes -= len(anterior[0])
+            self._itens[chave] = (corpo, mimetype)
+            self.bytes += len(corpo)
+            while self.bytes > self.max_bytes:
+                _, (antigo, _) = self._itens.popitem(last=False)
+                self.bytes -= len(antigo)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self.bytes = 0
+
+
+respostas = CacheLRU(int(os.getenv("CACHE_RESPOSTAS_MAX_BYTES", str(16 * 1024 * 1024))))
+
+
+# ------------------------------------------------------------
+# 🔹 Decorador de GET condicional
+# ------------------------------------------------------------
+def _etag(versoes):
+    partes = [request.endpoint, request.full_path]
+    partes += [f"{t}={v}" for t, v in sorted(versoes.items())]
+    return hashlib.sha1("|".join(partes).encode()).hexdigest()
+
+
+def _guardar_ao_final(etag, blocos_originais, original, mimetype):
+    """Repassa os blocos de uma resposta transmitida e a guarda no cache se couber."""
+    blocos, tamanho = [], 0
+    try:
+        for bloco in blocos_originais:
+            if blocos is not None:
+                tamanho += len(bloco)
+                if tamanho <= respostas.max_entrada:
+                    blocos.append(bloco)
+                else:
+                    blocos = None
+            yield bloco
+    finally:
+        if hasattr(original, "close"):
+            original.close()
+    if blocos is not None:
+        respostas.guardar(etag, b"".join(blocos), mimetype)
+
+
+def _nao_modificado(etag, ultima):
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    return bool(ultima and request.if_modified_since and request.if_modified_since >= ultima)
+
+
+def condicional(*tabelas):
+    """Responde 304 / reaproveita o corpo em cache enquanto as `tabelas` não mudarem."""
+
+    def decorador(view):
+        @wraps(view)
+        def envoltorio(*args, **kwargs):
+            versoes, ultima = versoes_de(tabelas)
+            etag = _etag(versoes)
+
+            if _nao_modificado(etag, ultima):
+                resposta = make_response("", 304)
+            else:
+                em_cache = respostas.obter(etag)
+                if em_cache is not None:
+                    corpo, mimetype = em_cache
+                    resposta = make_response(corpo, 200)
+                    resposta.mimetype = mimetype
+                    resposta.headers["X-Cache"] = "HIT"
+                else:
+                    resposta = make_response(view(*args, **kwargs))
+                    if resposta.status_code != 200:
+                        return resposta
+                    if resposta.is_streamed:
+                        # Não acumula em memória antes de enviar: guarda ao final, se couber
+                        resposta.response = _guardar_ao_final(
+                            etag, resposta.iter_encoded(), resposta.response, resposta.mimetype
+                        )
+                    else:
+                        respostas.guardar(etag, resposta.get_data(), resposta.mimetype)
+                    resposta.headers["X-Cache"] = "MISS"
+
+            resposta.set_etag(etag)
+            if ultima:
+                resposta.last_modified = ultima
+            # O navegador pode guardar, mas deve revalidar a cada uso
+            resposta.cache_control.no_cache = True
+            return resposta
+
+        return envoltorio
+
+    return decorador
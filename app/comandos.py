@@ -0,0 +1,352 @@
+# ============================================================
+# 🖥️ Comandos de Linha de Comando (flask ...)
+# ============================================================
+# Comandos administrativos registrados na CLI do Flask.
+# Exemplo:
+#   flask escalas preencher-vagas --inicio 2025-07-01 --fim 2025-07-31
+# ============================================================
+
+import json
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+escalas_cli = AppGroup("escalas", help="Operações sobre escalas e plantões.")
+
+
+# ------------------------------------------------------------
+# 🔹 flask escalas preencher-vagas
+# ------------------------------------------------------------
+@escalas_cli.command("preencher-vagas")
+@click.option("--inicio", required=True, type=click.DateTime(formats=["%Y-%m-%d"]), help="Data inicial (AAAA-MM-DD).")
+@click.option("--fim", required=True, type=click.DateTime(formats=["%Y-%m-%d"]), help="Data final (AAAA-MM-DD).")
+@click.option("--simular", is_flag=True, help="Apenas calcula o plano, sem gravar.")
+def preencher_vagas_cmd(inicio, fim, simular):
+    """Aloca automaticamente os plantões vagos do período."""
+    from .servicos.escalonamento import preencher_vagas
+
+    plano = preencher_vagas(
+        inicio.date(), fim.date(), current_app.config.get("FUNCOES_CARGOS"), simular=simular
+    )
+    for a in plano["alocacoes"]:
+        click.echo(f"✅ Plantão {a['id_plantao']} → {a['nome']} (#{a['id_profissional']})")
+    for v in plano["vagos"]:
+        click.echo(f"⚠️ Plantão {v['id_plantao']} continua vago: {v['motivo']}")
+
+    situacao = "simulação" if simular else ("gravado" if plano["gravado"] else "nada gravado")
+    click.echo(
+        f"📋 {len(plano['alocacoes'])} alocações, {len(plano['vagos'])} vagos "
+        f"({plano['tempo_ms']} ms, {situacao})"
+    )
+
+
+# ------------------------------------------------------------
+# 🔹 flask escalas conflitos
+# ------------------------------------------------------------
+@escalas_cli.command("conflitos")
+@click.option("--inicio", required=True, type=click.DateTime(formats=["%Y-%m-%d"]), help="Data inicial (AAAA-MM-DD).")
+@click.option("--fim", required=True, type=click.DateTime(formats=["%Y-%m-%d"]), help="Data final (AAAA-MM-DD).")
+def conflitos_cmd(inicio, fim):
+    """Relatório de profissionais escalados em plantões sobrepostos."""
+    from .servicos.conflitos import varrer_conflitos
+
+    conflitos = varrer_conflitos(inicio.date(), fim.date())
+    for c in conflitos:
+        a, b = c["escala_a"], c["escala_b"]
+        click.echo(
+            f"⚠️ {c['nome']} (#{c['id_profissional']}): escala {a['id']} ({a['inicio']} → {a['fim']}) "
+            f"× escala {b['id']} ({b['inicio']} → {b['fim']})"
+        )
+    click.echo(f"📋 {len(conflitos)} conflito(s) no período.")
+    if conflitos:
+        raise SystemExit(1)
+
+
+# ------------------------------------------------------------
+# 🔹 flask resumos reconstruir|conferir
+# ------------------------------------------------------------
+resumos_cli = AppGroup("resumos", help="Agregados do Painel BI.")
+
+
+@resumos_cli.command("reconstruir")
+def reconstruir_resumos_cmd():
+    """Recalcula do zero as tabelas resumo_* do painel."""
+    from .servicos.resumos import reconstruir_resumos
+
+    reconstruir_resumos()
+    click.echo("📊 Resumos do Painel BI reconstruídos.")
+
+
+@resumos_cli.command("conferir")
+def conferir_resumos_cmd():
+    """Compara os resumos incrementais com os totais recalculados (sai com 1 se divergirem)."""
+    from .servicos.resumos import conferir_resumos
+
+    divergencias = conferir_resumos()
+    for d in divergencias:
+        click.echo(f"❌ {d['resumo']}[{d['chave']}]: resumo {d['resumo_total']}, origem {d['origem_total']}")
+    click.echo(f"📋 {len(divergencias)} divergência(s) nos resumos do painel.")
+    if divergencias:
+        raise SystemExit(1)
+
+
+# ------------------------------------------------------------
+# 🔹 flask particoes criar | listar | arquivar
+# ------------------------------------------------------------
+particoes_cli = AppGroup("particoes", help="Partições mensais de plantões e escalas.")
+
+
+@particoes_cli.command("criar")
+@click.option("--meses", default=12, show_default=True, help="Meses à frente do mês atual.")
+def criar_particoes_cmd(meses):
+    """Garante as partições do mês atual e dos próximos meses."""
+    from .servicos.particoes import criar_particoes
+
+    garantidos = criar_particoes(meses)
+    click.echo(f"🗂️ Partições garantidas de {garantidos[0]:%Y-%m} a {garantidos[-1]:%Y-%m}.")
+
+
+@particoes_cli.command("listar")
+def listar_particoes_cmd():
+    """Lista as partições ativas e arquivadas (linhas estimadas)."""
+    from .servicos.particoes import listar_particoes
+
+    for p in listar_particoes():
+        situacao = "arquivada" if p["arquivada"] else "ativa"
+        click.echo(f"{'📦' if p['arquivada'] else '🗂️'} {p['particao']}: ~{p['linhas']} linhas ({situacao})")
+
+
+@particoes_cli.command("arquivar")
+@click.option("--ate", required=True, type=click.DateTime(formats=["%Y-%m"]),
+              help="Último mês a arquivar (AAAA-MM), inclusive.")
+def arquivar_particoes_cmd(ate):
+    """Desanexa os meses encerrados e os move para o esquema arquivo."""
+    from .servicos.particoes import arquivar_ate
+
+    try:
+        meses = arquivar_ate(ate.date())
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    for mes in meses:
+        click.echo(f"📦 {mes:%Y-%m} arquivado.")
+    click.echo(f"📋 {len(meses)} mês(es) arquivado(s).")
+
+
+# ------------------------------------------------------------
+# 🔹 flask dados importar | exportar | gerar
+# ------------------------------------------------------------
+dados_cli = AppGroup("dados", help="Importação, exportação e geração de dados.")
+
+
+@dados_cli.command("importar")
+@click.option("--profissionais", type=click.Path(exists=True, dir_okay=False), help="CSV/JSONL de profissionais.")
+@click.option("--plantoes", type=click.Path(exists=True, dir_okay=False), help="CSV/JSONL de plantões.")
+@click.option("--escalas", type=click.Path(exists=True, dir_okay=False), help="CSV/JSONL de escalas.")
+@click.option("--substituicoes", type=click.Path(exists=True, dir_okay=False), help="CSV/JSONL de substituições.")
+@click.option("--validar", is_flag=True, help="Apenas valida, sem gravar.")
+def importar_cmd(validar, **caminhos):
+    """Importa arquivos via COPY (staging → validação → mesclagem em uma transação)."""
+    from .servicos.importacao import importar_pela_sessao
+
+    arquivos = {tabela: caminho for tabela, caminho in caminhos.items() if caminho}
+    if not arquivos:
+        raise click.UsageError("Informe ao menos um arquivo.")
+
+    relatorio = importar_pela_sessao(arquivos, somente_validar=validar)
+    for tabela, info in relatorio["tabelas"].items():
+        click.echo(f"📥 {tabela}: {info['linhas']} linhas em {info['copy_ms']} ms ({info['linhas_por_s']} linhas/s)")
+    for erro in relatorio["erros"]:
+        click.echo(f"❌ {json.dumps(erro, ensure_ascii=False, default=str)}")
+
+    situacao = "gravado" if relatorio["gravado"] else "nada gravado"
+    click.echo(
+        f"📋 {relatorio['linhas']} linhas em {relatorio['tempo_ms']} ms "
+        f"({relatorio['linhas_por_s']} linhas/s, {situacao})"
+    )
+    if relatorio["erros"]:
+        raise SystemExit(1)
+
+
+@dados_cli.command("exportar")
+@click.option("--mes", help="Mês da exportação (AAAA-MM).")
+@click.option("--inicio", type=click.DateTime(formats=["%Y-%m-%d"]), help="Data inicial (AAAA-MM-DD).")
+@click.option("--fim", type=click.DateTime(formats=["%Y-%m-%d"]), help="Data final (AAAA-MM-DD).")
+@click.option("--local", "id_local", type=int, help="Filtra pelo local do plantão.")
+@click.option("--cargo", help="Filtra pelo cargo do profissional.")
+@click.option("--formato", type=click.Choice(["csv", "parquet"]), default="csv", show_default=True)
+@click.option("--saida", type=click.Path(dir_okay=False, writable=True),
+              help="Arquivo de saída (padrão: stdout para CSV).")
+def exportar_cmd(mes, inicio, fim, id_local, cargo, formato, saida):
+    """Exporta escalas ⨝ plantões ⨝ profissionais do período (cursor no servidor, memória constante)."""
+    from .servicos.exportacao import exportar, parquet_disponivel, periodo_do_mes
+
+    if mes:
+        inicio, fim = periodo_do_mes(mes)
+    elif inicio and fim:
+        inicio, fim = inicio.date(), fim.date()
+    else:
+        raise click.UsageError("Informe --mes ou --inicio e --fim.")
+    if formato == "parquet":
+        if not parquet_disponivel():
+            raise click.UsageError("Exportação Parquet requer o pacote pyarrow (pip install pyarrow).")
+        if not saida:
+            raise click.UsageError("Informe --saida para exportar em Parquet.")
+
+    blocos = exportar(formato, inicio, fim, id_local=id_local, cargo=cargo)
+    if not saida:
+        for bloco in blocos:
+            click.echo(bloco, nl=False)
+        return
+
+    modo = "wb" if formato == "parquet" else "w"
+    with open(saida, modo, **({} if formato == "parquet" else {"newline": "", "encoding": "utf-8"})) as arquivo:
+        for bloco in blocos:
+            arquivo.write(bloco)
+    click.echo(f"📤 Exportação {formato} de {inicio} a {fim} gravada em {saida}.", err=True)
+
+
+@dados_cli.command("gerar")
+@click.option("--linhas", default=100_000, show_default=True, help="Plantões gerados (10³ a 10⁷).")
+@click.option("--semente", default=42, show_default=True, help="Semente dos sorteios (mesma semente, mesmos dados).")
+@click.option("--inicio", type=click.DateTime(formats=["%Y-%m-%d"]), default="2024-01-01", show_default=True,
+              help="Primeiro dia dos plantões (AAAA-MM-DD).")
+@click.option("--lote", default=200_000, show_default=True, help="Plantões por transação.")
+@click.option("--limpar", is_flag=True, help="Esvazia as tabelas antes (apaga TODOS os dados).")
+@click.option("--sim", is_flag=True, help="Não pede confirmação para --limpar.")
+@click.option("--permitir-remoto", is_flag=True, help="Permite gerar em um banco que não é local.")
+def gerar_cmd(linhas, semente, inicio, lote, limpar, sim, permitir_remoto):
+    """Popula o banco com dados sintéticos em volume (para benchmark)."""
+    from .servicos.sinteticos import banco_local, gerar
+
+    if not permitir_remoto and not banco_local(current_app.config["SQLALCHEMY_DATABASE_URI"]):
+        raise click.UsageError("O banco configurado não é local; use --permitir-remoto para gerar nele.")
+    if limpar and not sim:
+        click.confirm("Apagar profissionais, plantões, escalas, substituições e auditoria?", abort=True)
+
+    resultado = gerar(linhas, semente=semente, inicio=inicio.date(), limpar=limpar, lote=lote,
+                      progresso=lambda mensagem: click.echo(f"🧪 {mensagem}"))
+    for tabela, total in resultado["tabelas"].items():
+        click.echo(f"📥 {tabela}: {total} linhas")
+    click.echo(f"📋 {sum(resultado['tabelas'].values())} linhas em {resultado['tempo_s']} s (semente {semente})")
+
+
+# ------------------------------------------------------------
+# 🔹 flask diagnostico inicializacao
+# ------------------------------------------------------------
+diagnostico_cli = AppGroup("diagnostico", help="Diagnóstico da aplicação.")
+
+
+@diagnostico_cli.command("inicializacao")
+@click.option("--json", "como_json", is_flag=True, help="Saída em JSON.")
+def relatorio_inicializacao_cmd(como_json):
+    """Mostra onde os milissegundos da subida (cold start) foram gastos."""
+    relatorio = current_app.extensions["escala360_inicializacao"]
+    if como_json:
+        click.echo(json.dumps(relatorio.como_dict(), ensure_ascii=False, indent=2))
+    else:
+        click.echo(relatorio.formatar())
+
+
+@diagnostico_cli.command("benchmark")
+@click.option("--rota", "rotas", multiple=True, help="Mede só as rotas cujo nome contém o texto (repetível).")
+@click.option("--repeticoes", default=20, show_default=True, help="Execuções medidas por rota.")
+@click.option("--aquecimento", default=2, show_default=True, help="Execuções descartadas por rota.")
+@click.option("--com-cache", is_flag=True, help="Mantém o cache de respostas entre as execuções.")
+@click.option("--concorrencia", default=0, show_default=True,
+              help="Clientes simultâneos na carga contra o gunicorn (0: sem carga).")
+@click.option("--duracao", default=30, show_default=True, help="Segundos de carga.")
+@click.option("--url", help="Servidor já em execução (em vez de iniciar o gunicorn).")
+@click.option("--workers", default=4, show_default=True, help="Workers do gunicorn iniciado.")
+@click.option("--threads", default=8, show_default=True, help="Threads por worker do gunicorn iniciado.")
+@click.option("--porta", default=8765, show_default=True, help="Porta do gunicorn iniciado.")
+@click.option("--baseline", default="benchmarks/baseline.json", show_default=True,
+              type=click.Path(dir_okay=False), help="Arquivo do baseline.")
+@click.option("--salvar", is_flag=True, help="Grava o resultado como novo baseline.")
+@click.option("--tolerancia", default=0.25, show_default=True, help="Piora aceita de latência/memória (0.25 = 25%).")
+@click.option("--json", "como_json", is_flag=True, help="Saída em JSON.")
+def benchmark_cmd(rotas, repeticoes, aquecimento, com_cache, concorrencia, duracao, url, workers, threads,
+                  porta, baseline, salvar, tolerancia, como_json):
+    """p50/p99, SQL por requisição e memória de cada rota, comparados ao baseline."""
+    from .servicos.benchmark import comparar, executar_benchmark, ler_baseline, salvar_baseline
+
+    try:
+        resultado = executar_benchmark(
+            current_app, filtro=rotas, repeticoes=repeticoes, aquecimento=aquecimento, com_cache=com_cache,
+            concorrencia=concorrencia, duracao_s=duracao, url=url, workers=workers, threads=threads, porta=porta,
+        )
+    except (RuntimeError, ValueError) as e:
+        raise click.UsageError(str(e))
+
+    if como_json:
+        click.echo(json.dumps(resultado, ensure_ascii=False, indent=2, default=str))
+    else:
+        click.echo(f"📦 Volume: {', '.join(f'{t} {n}' for t, n in resultado['volume'].items())}")
+        for nome, r in resultado["rotas"].items():
+            click.echo(f"⏱️ {nome}: p50 {r['p50_ms']} ms | p99 {r['p99_ms']} ms | {r['consultas']} SQL "
+                       f"| pico {r['memoria_pico_kb']} KB | {r['bytes']} bytes")
+        carga = resultado["carga"]
+        if carga:
+            click.echo(f"🔥 {carga['servidor']}: {carga['concorrencia']} clientes, {carga['duracao_s']} s — "
+                       f"{carga['requisicoes']} requisições ({carga['vazao_rps']}/s), {carga['erros']} erros")
+            for nome, r in carga["rotas"].items():
+                if r["n"]:
+                    click.echo(f"   {nome}: p50 {r['p50_ms']} ms | p99 {r['p99_ms']} ms ({r['n']}, {r['erros']} erros)")
+            if carga["memoria"]:
+                click.echo(f"   RSS: mestre {carga['memoria']['mestre_kb']} KB, "
+                           f"workers {carga['memoria']['workers_kb']} KB")
+
+    if salvar:
+        salvar_baseline(baseline, resultado)
+        click.echo(f"💾 Baseline gravado em {baseline}.", err=True)
+        return
+    anterior = ler_baseline(baseline)
+    if anterior is None:
+        click.echo(f"ℹ️ Sem baseline em {baseline} (grave um com --salvar).", err=True)
+        return
+    try:
+        regressoes = comparar(resultado, anterior, tolerancia=tolerancia)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    for r in regressoes:
+        click.echo(f"❌ {r['rota']}: {r['medida']} {r['baseline']} → {r['atual']}", err=True)
+    click.echo(f"📋 {len(regressoes)} regressão(ões) em relação a {baseline} ({anterior['gerado_em']}).", err=True)
+    if regressoes:
+        raise SystemExit(1)
+
+
+# ------------------------------------------------------------
+# 🔹 flask notificacoes worker
+# ------------------------------------------------------------
+notificacoes_cli = AppGroup("notificacoes", help="Fila de notificações.")
+
+
+@notificacoes_cli.command("worker")
+@click.option("--uma-vez", is_flag=True, help="Esvazia a fila e encerra.")
+def worker_notificacoes_cmd(uma_vez):
+    """Envia as notificações pendentes em lotes (com novas tentativas)."""
+    from .servicos.notificacoes import executar_worker
+
+    config = current_app.config
+    total = executar_worker(
+        tamanho=config["NOTIFICACOES_LOTE"],
+        threads=config["NOTIFICACOES_THREADS"],
+        max_tentativas=config["NOTIFICACOES_MAX_TENTATIVAS"],
+        taxas={"email": config["NOTIFICACOES_TAXA_EMAIL"], "whatsapp": config["NOTIFICACOES_TAXA_WHATSAPP"]},
+        uma_vez=uma_vez,
+    )
+    click.echo(
+        f"📣 {total['enviadas']} enviadas, {total['reagendadas']} reagendadas, "
+        f"{total['falharam']} com falha definitiva, "
+        f"{total['descartadas']} descartadas (reservadas de novo por outro worker)"
+    )
+
+
+def registrar_comandos(app):
+    """Registra os grupos de comandos na aplicação."""
+    app.cli.add_command(escalas_cli)
+    app.cli.add_command(resumos_cli)
+    app.cli.add_command(diagnostico_cli)
+    app.cli.add_command(dados_cli)
+    app.cli.add_command(notificacoes_cli)
+    app.cli.add_command(particoes_cli)
@@ -0,0 +1,91 @@
+# ============================================================
+# 🚀 Inicialização — Modo de Execução, Pool e Relatório
+# ============================================================
+# Define como a aplicação sobe em cada ambiente:
+#   • serverless (Vercel): sem .env, sem SELECT 1 na subida
+#     (a conexão acontece na primeira requisição) e NullPool —
+#     cada invocação é curta e o pooler do Neon reaproveita as
+#     conexões do lado do servidor;
+#   • servidor (gunicorn): QueuePool ajustado, com pre-ping;
+#   • local: comportamento de desenvolvimento (logs em DEBUG).
+# Também mede cada etapa da subida (relatório de cold start).
+# ============================================================
+
+import os
+import time
+from contextlib import contextmanager
+
+from sqlalchemy.pool import NullPool, QueuePool
+
+MODOS = ("local", "servidor", "serverless")
+
+
+def modo_execucao():
+    """Modo definido em MODO_EXECUCAO; na Vercel o padrão é serverless."""
+    modo = os.getenv("MODO_EXECUCAO") or ("serverless" if os.getenv("VERCEL") else "local")
+    return modo if modo in MODOS else "local"
+
+
+def usa_pooler(db_url):
+    """Indica conexão via PgBouncer / pooler de transações (ex.: host '-pooler' do Neon)."""
+    return os.getenv("DB_PGBOUNCER", "").lower() == "true" or "-pooler" in (db_url or "")
+
+
+def opcoes_do_engine(modo, db_url):
+    """Monta SQLALCHEMY_ENGINE_OPTIONS conforme o modo e as variáveis DB_*."""
+    pool = os.getenv("DB_POOL") or ("null" if modo == "serverless" else "queue")
+    opcoes = {"connect_args": {"connect_timeout": int(os.getenv("DB_CONNECT_TIMEOUT", "5"))}}
+
+    if pool == "null":
+        # Sem pool local: a conexão é aberta e devolvida a cada uso
+        opcoes["poolclass"] = NullPool
+        return opcoes
+
+    opcoes.update(
+        poolclass=QueuePool,
+        pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        pool_timeout=int(os.getenv("DB_POOL_TIMEOUT", "10")),
+        # Neon encerra conexões ociosas; recicla antes disso
+        pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "300")),
+        pool_pre_ping=True,
+    )
+    if usa_pooler(db_url):
+        # Atrás do pooler de transações, poucas conexões locais bastam
+        opcoes["pool_size"] = min(opcoes["pool_size"], 2)
+    return opcoes
+
+
+# ------------------------------------------------------------
+# 🔹 Relatório de inicialização
+# ------------------------------------------------------------
+class RelatorioInicializacao:
+    """Acumula a duração (ms) de cada etapa da subida da aplicação."""
+
+    def __init__(self, modo):
+        self.modo = modo
+        self.etapas = []
+        self.total_ms = None
+        self._inicio = time.perf_counter()
+
+    @contextmanager
+    def etapa(self, nome):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(nome, (time.perf_counter() - t0) * 1000)
+
+    def registrar(self, nome, ms):
+        self.etapas.append((nome, round(ms, 2)))
+
+    def finalizar(self):
+        self.total_ms = round((time.perf_counter() - self._inicio) * 1000, 2)
+
+    def como_dict(self):
+        return {"modo": self.modo, "total_ms": self.total_ms, "etapas": dict(self.etapas)}
+
+    def formatar(self):
+        linhas = [f"⏱️ Inicialização ({self.modo}): create_app() em {self.total_ms} ms"]
+        linhas += [f"   • {nome}: {ms} ms" for nome, ms in self.etapas]
+        return "\n".join(linhas)
@@ -0,0 +1,310 @@
+# ============================================================
+# 📈 Métricas — Latência, SQL por Requisição e Perfis Lentos
+# ============================================================
+# Instrumentação em memória do processo, exposta em GET /metrics
+# no formato texto do Prometheus:
+#   • escala360_http_duracao_segundos: latência por endpoint,
+#     método e status (inclui a transmissão das respostas em
+#     blocos);
+#   • escala360_sql_comandos_por_requisicao e
+#     escala360_sql_tempo_por_requisicao_segundos: quantos
+#     comandos SQL cada requisição executou e quanto tempo passou
+#     no banco — um N+1 aparece como contagem que cresce com os
+#     dados;
+#   • escala360_sql_duracao_segundos: cada comando, por bind
+#     (primário / réplicas), medido pelos eventos
+#     before/after_cursor_execute;
+#   • escala360_pool_espera_segundos: espera pelo checkout de uma
+#     conexão do pool (inclui abrir conexões novas), e o estado do
+#     pool no momento da coleta;
+#   • escala360_template_render_segundos: renderização Jinja.
+# Com METRICAS_PERFIL_LENTO_MS > 0 as requisições rodam sob
+# cProfile (uma por vez) e as que passam do limite têm o perfil
+# gravado em METRICAS_PERFIL_DIR: .prof (pstats / snakeviz) e
+# .txt com as funções mais caras e o SQL executado.
+# A rota só é publicada com METRICAS_TOKEN definido (latências,
+# rotas e estado dos pools não ficam abertos ao público).
+# Cada processo (worker do gunicorn) mantém suas próprias séries.
+# ============================================================
+
+import bisect
+import cProfile
+import hmac
+import io
+import math
+import os
+import pstats
+import re
+import threading
+import time
+from datetime import datetime
+
+from flask import Response, before_render_template, has_request_context, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+_CHAVE = "escala360.metricas"
+
+
+# ------------------------------------------------------------
+# 🔹 Histogramas
+# ------------------------------------------------------------
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _rotulos(nomes, valores, extra=""):
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+class Histograma:
+    """Histograma cumulativo do Prometheus, com uma série por combinação de rótulos."""
+
+    def __init__(self, nome, ajuda, rotulos, limites):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self.limites = tuple(limites)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor, *rotulos):
+        indice = bisect.bisect_left(self.limites, valor)  # le="x" inclui o próprio x
+        with self._lock:
+            serie = self._series.get(rotulos)
+            if serie is None:
+                serie = self._series[rotulos] = [[0] * (len(self.limites) + 1), 0.0]
+            serie[0][indice] += 1
+            serie[1] += valor
+
+    def limpar(self):
+        with self._lock:
+            self._series.clear()
+
+    def exportar(self):
+        with self._lock:
+            series = {r: (list(contagens), soma) for r, (contagens, soma) in self._series.items()}
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} histogram"]
+        for rotulos, (contagens, soma) in sorted(series.items()):
+            acumulado = 0
+            for limite, n in zip((*self.limites, math.inf), contagens):
+                acumulado += n
+                le = "+Inf" if limite == math.inf else repr(float(limite))
+                faixa = _rotulos(self.rotulos, rotulos, 'le="' + le + '"')
+                linhas.append(f"{self.nome}_bucket{faixa} {acumulado}")
+            linhas.append(f"{self.nome}_sum{_rotulos(self.rotulos, rotulos)} {soma!r}")
+            linhas.append(f"{self.nome}_count{_rotulos(self.rotulos, rotulos)} {acumulado}")
+        return linhas
+
+
+_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+_SEGUNDOS_CURTOS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+http_duracao = Histograma(
+    "escala360_http_duracao_segundos", "Duração das requisições HTTP.",
+    ("endpoint", "metodo", "status"), _SEGUNDOS,
+)
+sql_por_requisicao = Histograma(
+    "escala360_sql_comandos_por_requisicao", "Comandos SQL executados por requisição.",
+    ("endpoint",), (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500),
+)
+sql_tempo_por_requisicao = Histograma(
+    "escala360_sql_tempo_por_requisicao_segundos", "Tempo total no banco por requisição.",
+    ("endpoint",), _SEGUNDOS,
+)
+sql_duracao = Histograma(
+    "escala360_sql_duracao_segundos", "Duração de cada comando SQL.",
+    ("bind",), _SEGUNDOS_CURTOS,
+)
+pool_espera = Histograma(
+    "escala360_pool_espera_segundos", "Espera pelo checkout de uma conexão do pool.",
+    ("bind",), _SEGUNDOS_CURTOS + (5, 10),
+)
+template_render = Histograma(
+    "escala360_template_render_segundos", "Renderização dos templates Jinja.",
+    ("template",), _SEGUNDOS_CURTOS,
+)
+
+HISTOGRAMAS = (http_duracao, sql_por_requisicao, sql_tempo_por_requisicao, sql_duracao,
+               pool_espera, template_render)
+
+
+def _estado():
+    """Acumuladores da requisição atual (em request.environ: as respostas
+    transmitidas rodam em outro contexto de aplicação), ou None."""
+    if has_request_context():
+        return request.environ.get(_CHAVE)
+    return None
+
+
+# ------------------------------------------------------------
+# 🔹 SQL e pool (eventos do SQLAlchemy)
+# ------------------------------------------------------------
+def _instrumentar_engine(engine, bind):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        context._escala360_t0 = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _depois(conn, cursor, statement, parameters, context, executemany):
+        inicio = getattr(context, "_escala360_t0", None)
+        if inicio is None:
+            return
+        duracao = time.perf_counter() - inicio
+        sql_duracao.observar(duracao, bind)
+        estado = _estado()
+        if estado is None:
+            return
+        estado["comandos"] += 1
+        estado["tempo_sql"] += duracao
+        if estado["sql"] is not None:
+            acumulado = estado["sql"].setdefault(statement, [0, 0.0])
+            acumulado[0] += 1
+            acumulado[1] += duracao
+
+    # Não há evento "antes do checkout": mede a chamada que o engine faz ao pool
+    pool = engine.pool
+    conectar = pool.connect
+
+    def _connect_medido():
+        inicio = time.perf_counter()
+        try:
+            return conectar()
+        finally:
+            pool_espera.observar(time.perf_counter() - inicio, bind)
+
+    pool.connect = _connect_medido
+
+
+def _estado_dos_pools(engines):
+    linhas = [
+        "# HELP escala360_pool_conexoes Conexões do pool no momento da coleta.",
+        "# TYPE escala360_pool_conexoes gauge",
+    ]
+    for bind, engine in engines.items():
+        pool = engine.pool
+        if not isinstance(pool, QueuePool):
+            continue  # NullPool: não guarda conexões
+        for situacao, valor in (("em_uso", pool.checkedout()), ("ociosas", pool.checkedin()),
+                                ("excedentes", max(pool.overflow(), 0)), ("capacidade", pool.size())):
+            linhas.append(f"escala360_pool_conexoes{_rotulos(('bind', 'situacao'), (bind, situacao))} {valor}")
+    return linhas
+
+
+# ------------------------------------------------------------
+# 🔹 Perfil das requisições lentas
+# ------------------------------------------------------------
+_perfilando = threading.Lock()  # o cProfile não admite perfis simultâneos
+
+
+def _gravar_perfil(diretorio, estado, endpoint, duracao, logger):
+    os.makedirs(diretorio, exist_ok=True)
+    carimbo = datetime.now().strftime("%Y%m%d-%H%M%S")
+    base = os.path.join(diretorio, f"{carimbo}_{re.sub(r'[^A-Za-z0-9_.-]', '_', endpoint)}_{duracao * 1000:.0f}ms")
+    perfil = estado["perfil"]
+    perfil.dump_stats(base + ".prof")
+
+    saida = io.StringIO()
+    saida.write(f"{request.method} {request.full_path} -> {endpoint}\n")
+    saida.write(f"duração: {duracao * 1000:.1f} ms | SQL: {estado['comandos']} comandos, "
+                f"{estado['tempo_sql'] * 1000:.1f} ms\n\n")
+    saida.write("SQL (por número de execuções):\n")
+    for sql, (n, tempo) in sorted(estado["sql"].items(), key=lambda item: -item[1][0]):
+        saida.write(f"  {n:5d}x {tempo * 1000:9.1f} ms  {' '.join(sql.split())[:300]}\n")
+    saida.write("\n")
+    pstats.Stats(perfil, stream=saida).sort_stats("cumulative").print_stats(40)
+    with open(base + ".txt", "w", encoding="utf-8") as arquivo:
+        arquivo.write(saida.getvalue())
+    logger.warning(f"🐢 {request.method} {request.path}: {duracao * 1000:.0f} ms — perfil em {base}.txt")
+
+
+# ------------------------------------------------------------
+# 🔹 Registro na aplicação
+# ------------------------------------------------------------
+def registrar_metricas(app, db):
+    """Instrumenta requisições, SQL, pool e templates e publica GET /metrics (se houver token)."""
+    if not app.config["METRICAS"]:
+        return
+    limite_lento = app.config["METRICAS_PERFIL_LENTO_MS"] / 1000
+    diretorio_perfis = app.config["METRICAS_PERFIL_DIR"]
+    token = app.config["METRICAS_TOKEN"]
+
+    with app.app_context():
+        engines = {("primario" if chave is None else chave): e for chave, e in db.engines.items()}
+    for bind, engine in engines.items():
+        _instrumentar_engine(engine, bind)
+
+    @app.before_request
+    def _iniciar_medicao():
+        estado = request.environ[_CHAVE] = {
+            "inicio": time.perf_counter(), "comandos": 0, "tempo_sql": 0.0,
+            "status": None, "perfil": None, "sql": None,
+        }
+        if limite_lento and _perfilando.acquire(blocking=False):
+            estado["sql"] = {}
+            estado["perfil"] = cProfile.Profile()
+            estado["perfil"].enable()
+
+    @app.after_request
+    def _anotar_status(resposta):
+        estado = _estado()
+        if estado is not None:
+            estado["status"] = resposta.status_code
+        return resposta
+
+    # O teardown roda depois do último bloco das respostas transmitidas
+    @app.teardown_request
+    def _registrar_medicao(erro):
+        estado = request.environ.pop(_CHAVE, None)
+        if estado is None:
+            return
+        duracao = time.perf_counter() - estado["inicio"]
+        endpoint = request.url_rule.endpoint if request.url_rule else "sem_rota"
+        status = 500 if erro is not None else estado["status"] or 500
+        http_duracao.observar(duracao, endpoint, request.method, str(status))
+        sql_por_requisicao.observar(estado["comandos"], endpoint)
+        sql_tempo_por_requisicao.observar(estado["tempo_sql"], endpoint)
+
+        if estado["perfil"] is not None:
+            estado["perfil"].disable()
+            try:
+                if duracao >= limite_lento:
+                    _gravar_perfil(diretorio_perfis, estado, endpoint, duracao, app.logger)
+            except OSError as e:
+                app.logger.error(f"❌ Erro ao gravar o perfil da requisição lenta: {e}")
+            finally:
+                _perfilando.release()
+
+    # Os sinais do Flask chegam na mesma thread que renderiza
+    inicio_render = threading.local()
+
+    @before_render_template.connect_via(app)
+    def _antes_do_template(sender, template, context, **extra):
+        inicio_render.__dict__.setdefault("pilha", []).append(time.perf_counter())
+
+    @template_rendered.connect_via(app)
+    def _depois_do_template(sender, template, context, **extra):
+        pilha = getattr(inicio_render, "pilha", None)
+        if pilha:
+            template_render.observar(time.perf_counter() - pilha.pop(), template.name or "?")
+
+    perfil = f" (perfil de requisições acima de {limite_lento * 1000:.0f} ms)" if limite_lento else ""
+    if not token:
+        app.logger.warning(f"⚠️ METRICAS_TOKEN não definido: /metrics não publicado{perfil}")
+        return
+
+    @app.route("/metrics")
+    def metricas():
+        """Métricas do processo no formato texto do Prometheus."""
+        if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+            return Response("não autorizado\n", 401, {"WWW-Authenticate": "Bearer"}, mimetype="text/plain")
+        linhas = []
+        for histograma in HISTOGRAMAS:
+            linhas += histograma.exportar()
+        linhas += _estado_dos_pools(engines)
+        return Response("\n".join(linhas) + "\n", content_type="text/plain; version=0.0.4; charset=utf-8")
+
+    app.logger.info(f"📈 Métricas em /metrics{perfil}")
@@ -1,4 +1,5 @@
 from datetime import datetime
+from sqlalchemy.orm import contains_eager, selectinload
 from . import db
 
 # ==============================
@@ -9,6 +10,10 @@ from . import db
 class Profissional(db.Model):
     """Tabela de profissionais cadastrados no sistema."""
     __tablename__ = "profissionais"
+    __table_args__ = (
+        db.Index("idx_profissionais_nome", "nome", "id"),
+        db.Index("idx_profissionais_cargo", "cargo", "nome", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(120), nullable=False)
@@ -17,19 +22,17 @@ class Profissional(db.Model):
     telefone = db.Column(db.String(20))
     ativo = db.Column(db.Boolean, default=True)
 
-    # Relacionamentos
-    escalas = db.relationship("Escala", back_populates="profissional", lazy="selectin")
+    # Relacionamentos (carregados sob demanda; ver PERFIS_CARREGAMENTO)
+    escalas = db.relationship("Escala", back_populates="profissional")
     solicitacoes = db.relationship(
         "Substituicao",
         foreign_keys="Substituicao.id_profissional_solicitante",
         back_populates="solicitante",
-        lazy="selectin",
     )
     substituicoes = db.relationship(
         "Substituicao",
         foreign_keys="Substituicao.id_profissional_substituto",
         back_populates="substituto",
-        lazy="selectin",
     )
 
     def __repr__(self):
@@ -37,18 +40,22 @@ class Profissional(db.Model):
 
 
 class Plantao(db.Model):
-    """Tabela de plantões disponíveis."""
+    """Tabela de plantões disponíveis (particionada por mês de `data`)."""
     __tablename__ = "plantoes"
+    __table_args__ = (db.Index("idx_plantoes_data", "data", "hora_inicio", "id"),)
 
-    id = db.Column(db.Integer, primary_key=True)
-    data = db.Column(db.Date, nullable=False)
+    # Chave primária (id, data): a coluna de partição faz parte dela
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    # active_history: o valor anterior é carregado antes da alteração, mesmo
+    # com o objeto expirado (resumos do painel contam o dia que perdeu o plantão)
+    data = db.column_property(db.Column(db.Date, primary_key=True), active_history=True)
     hora_inicio = db.Column(db.Time, nullable=False)
     hora_fim = db.Column(db.Time, nullable=False)
     id_funcao = db.Column(db.Integer, nullable=False)
     id_local = db.Column(db.Integer, nullable=False)
 
-    # Relacionamento reverso
-    escalas = db.relationship("Escala", back_populates="plantao", lazy="selectin")
+    # Relacionamento reverso (junção por id e data; ver Escala.plantao)
+    escalas = db.relationship("Escala", back_populates="plantao")
 
     def __repr__(self):
         return f"<Plantao {self.id} - {self.data} ({self.hora_inicio} às {self.hora_fim})>"
@@ -57,17 +64,45 @@ class Plantao(db.Model):
 class Escala(db.Model):
     """Tabela que liga profissionais aos plantões (escala de trabalho)."""
     __tablename__ = "escalas"
+    __table_args__ = (
+        db.ForeignKeyConstraint(
+            ["id_plantao", "data_plantao"], ["plantoes.id", "plantoes.data"], onupdate="CASCADE"
+        ),
+        db.Index("idx_escalas_plantao", "id_plantao", "status"),
+        db.Index("idx_escalas_profissional", "id_profissional", "status"),
+        db.Index("idx_escalas_alocacao", "data_alocacao", "id"),
+    )
 
-    id = db.Column(db.Integer, primary_key=True)
-    id_plantao = db.Column(db.Integer, db.ForeignKey("plantoes.id"), nullable=False)
-    id_profissional = db.Column(db.Integer, db.ForeignKey("profissionais.id"), nullable=False)
+    # Chave primária (id, data_plantao), como no banco
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    id_plantao = db.Column(db.Integer, nullable=False)
+    # Chave de partição (mês do plantão). Quem cria a escala informa a data
+    # do plantão já carregado: a linha é roteada para a partição antes de
+    # qualquer trigger.
+    data_plantao = db.Column(db.Date, primary_key=True, server_onupdate=db.FetchedValue())
+    # active_history: o profissional anterior é conhecido mesmo com o objeto
+    # expirado (resumos e agendas precisam de quem perdeu a escala)
+    id_profissional = db.column_property(
+        db.Column(db.Integer, db.ForeignKey("profissionais.id"), nullable=False), active_history=True
+    )
     status = db.Column(db.String(50), default="ativo")
-    data_alocacao = db.Column(db.DateTime, default=datetime.utcnow)
+    data_alocacao = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Controle otimista: o UPDATE confere a versão lida (aprovações concorrentes)
+    versao = db.Column(db.Integer, nullable=False, server_default="1")
+    # A coluna "periodo" (tsrange) existe apenas no banco: é preenchida por
+    # trigger e usada pela restrição de exclusão escalas_sem_sobreposicao.
 
-    # Relacionamentos bidirecionais
+    __mapper_args__ = {"version_id_col": versao}
+
+    # Relacionamentos bidirecionais. A junção com o plantão segue a chave
+    # estrangeira (id_plantao, data_plantao): a data limita as partições lidas.
     plantao = db.relationship("Plantao", back_populates="escalas")
     profissional = db.relationship("Profissional", back_populates="escalas")
-    substituicoes = db.relationship("Substituicao", back_populates="escala_original", lazy="selectin")
+    substituicoes = db.relationship(
+        "Substituicao",
+        primaryjoin="Escala.id == foreign(Substituicao.id_escala_original)",
+        back_populates="escala_original",
+    )
 
     def __repr__(self):
         return f"<Escala {self.id} - Profissional {self.id_profissional} - Plantão {self.id_plantao}>"
@@ -76,18 +111,49 @@ class Escala(db.Model):
 class Substituicao(db.Model):
     """Tabela de solicitações de substituições de plantões."""
     __tablename__ = "substituicoes"
+    __table_args__ = (
+        db.Index("idx_substituicoes_solicitacao", "data_solicitacao", "id"),
+        # Apenas as pendentes: a fila consultada a todo momento pela API
+        db.Index(
+            "idx_substituicoes_pendentes",
+            "data_solicitacao",
+            "id",
+            postgresql_where=db.text("status = 'pendente'"),
+        ),
+        db.Index("idx_substituicoes_escala", "id_escala_original"),
+        db.Index("idx_substituicoes_solicitante", "id_profissional_solicitante"),
+        db.Index("idx_substituicoes_substituto", "id_profissional_substituto"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    id_escala_original = db.Column(db.Integer, db.ForeignKey("escalas.id"), nullable=False)
-    id_profissional_solicitante = db.Column(db.Integer, db.ForeignKey("profissionais.id"), nullable=False)
+    # Sem chave estrangeira: escalas.id não é único sozinho (escalas é particionada);
+    # no banco a referência é garantida por triggers
+    id_escala_original = db.Column(db.Integer, nullable=False)
+    # active_history: quem pediu antes é conhecido mesmo com o objeto expirado (agendas)
+    id_profissional_solicitante = db.column_property(
+        db.Column(db.Integer, db.ForeignKey("profissionais.id"), nullable=False), active_history=True
+    )
     id_profissional_substituto = db.Column(db.Integer, db.ForeignKey("profissionais.id"), nullable=False)
-    data_solicitacao = db.Column(db.DateTime, default=datetime.utcnow)
-    status = db.Column(db.String(50), default="pendente")
+    data_solicitacao = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # active_history: o status anterior é conhecido mesmo com o objeto expirado (resumos)
+    status = db.column_property(db.Column(db.String(50), default="pendente"), active_history=True)
+    # Fila de aprovação (app/servicos/aprovacoes.py)
+    versao = db.Column(db.Integer, nullable=False, server_default="1")
+    reservada_por = db.Column(db.String(120))
+    reservada_ate = db.Column(db.DateTime)
+    decidida_por = db.Column(db.String(120))
+    decidida_em = db.Column(db.DateTime)
+
+    __mapper_args__ = {"version_id_col": versao}
 
     # Relacionamentos
-    escala_original = db.relationship("Escala", back_populates="substituicoes")
+    escala_original = db.relationship(
+        "Escala",
+        primaryjoin="Escala.id == foreign(Substituicao.id_escala_original)",
+        back_populates="substituicoes",
+    )
     solicitante = db.relationship(
-        "Profissional", foreign_keys=[id_profissional_solicitante], back_populates="solicitacoes"
+        "Profissional", foreign_keys="Substituicao.id_profissional_solicitante", back_populates="solicitacoes"
     )
     substituto = db.relationship(
         "Profissional", foreign_keys=[id_profissional_substituto], back_populates="substituicoes"
@@ -100,13 +166,146 @@ class Substituicao(db.Model):
 class Auditoria(db.Model):
     """Tabela de auditoria de operações (logs do sistema)."""
     __tablename__ = "auditoria"
+    __table_args__ = (
+        # Trilha por período (GET /api/auditoria), da mais recente para a mais antiga
+        db.Index("idx_auditoria_data_hora", db.text("data_hora DESC"), db.text("id DESC")),
+        # Histórico de um registro específico
+        db.Index("idx_auditoria_entidade", "entidade", "id_entidade", db.text("data_hora DESC")),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     entidade = db.Column(db.String(100), nullable=False)
     id_entidade = db.Column(db.Integer, nullable=False)
     acao = db.Column(db.String(100), nullable=False)
     usuario = db.Column(db.String(120), nullable=False)
-    data_hora = db.Column(db.DateTime, default=datetime.utcnow)
+    data_hora = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
     def __repr__(self):
         return f"<Auditoria {self.entidade}#{self.id_entidade} - {self.acao}>"
+
+
+class Notificacao(db.Model):
+    """Fila (outbox) de notificações por e-mail/WhatsApp a enviar."""
+    __tablename__ = "notificacoes"
+
+    id = db.Column(db.Integer, primary_key=True)
+    canal = db.Column(db.String(20), nullable=False)  # email | whatsapp
+    destinatario = db.Column(db.String(120), nullable=False)
+    assunto = db.Column(db.String(200))
+    mensagem = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default="pendente")  # pendente | enviando | enviado | falhou
+    tentativas = db.Column(db.Integer, nullable=False, default=0)
+    proxima_tentativa = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    ultimo_erro = db.Column(db.Text)
+    criado_em = db.Column(db.DateTime, default=datetime.utcnow)
+    enviado_em = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f"<Notificacao {self.id} - {self.canal} para {self.destinatario} - {self.status}>"
+
+
+# ==============================
+# RESUMOS DO PAINEL BI
+# ==============================
+# Agregados mantidos incrementalmente (app/servicos/resumos.py)
+# para que o painel não execute GROUP BY sobre as tabelas inteiras.
+
+
+class ResumoCargaProfissional(db.Model):
+    """Total de escalas por profissional."""
+    __tablename__ = "resumo_carga_profissional"
+
+    id_profissional = db.Column(
+        db.Integer, db.ForeignKey("profissionais.id", ondelete="CASCADE"), primary_key=True
+    )
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ResumoSubstituicaoStatus(db.Model):
+    """Total de substituições por status."""
+    __tablename__ = "resumo_substituicoes_status"
+
+    status = db.Column(db.String(50), primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ResumoPlantoesDia(db.Model):
+    """Total de plantões por dia."""
+    __tablename__ = "resumo_plantoes_dia"
+
+    dia = db.Column(db.Date, primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+
+# ==============================
+# VERSÕES DAS TABELAS (CACHE HTTP)
+# ==============================
+# Incrementadas a cada commit que altera a tabela (app/cache.py);
+# alimentam os ETags das listagens sem consultar os dados.
+
+
+class VersaoTabela(db.Model):
+    """Contador de alterações e instante da última alteração de uma tabela."""
+    __tablename__ = "versoes_tabelas"
+
+    tabela = db.Column(db.String(63), primary_key=True)
+    versao = db.Column(db.BigInteger, nullable=False, default=0)
+    alterado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class VersaoAgenda(db.Model):
+    """Contador de alterações da agenda de um profissional (feeds .ics/.json, app/servicos/agendas.py)."""
+    __tablename__ = "versoes_agendas"
+
+    # Sem chave estrangeira: a versão sobrevive à exclusão/recriação do profissional
+    id_profissional = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    versao = db.Column(db.BigInteger, nullable=False, default=0)
+    alterado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+# ==============================
+# PERFIS DE CARREGAMENTO
+# ==============================
+# Os relacionamentos acima não são carregados automaticamente
+# (perfil "enxuto"). Cada consulta escolhe, pelo nome, o perfil
+# de que precisa — evitando trazer escalas e substituições de
+# todos os profissionais em telas que não as exibem.
+
+
+def _escala_detalhada(consulta):
+    """Escala + plantão + profissional em uma única consulta com JOIN.
+
+    A junção usa só o id do plantão (único pela sequência): a listagem não
+    filtra por data, e com (id, data) o PostgreSQL multiplica as duas
+    seletividades, subestima a junção e troca o índice de data_alocacao
+    por Seq Scan em todas as partições. Consultas por período seguem com
+    Escala.plantao, que poda as partições das duas tabelas.
+    """
+    return (
+        consulta.join(Plantao, Plantao.id == Escala.id_plantao)
+        .join(Escala.profissional)
+        .options(contains_eager(Escala.plantao), contains_eager(Escala.profissional))
+    )
+
+
+PERFIS_CARREGAMENTO = {
+    "enxuto": lambda consulta: consulta,
+    "escala_detalhada": _escala_detalhada,
+    "profissional_completo": lambda consulta: consulta.options(
+        selectinload(Profissional.escalas),
+        selectinload(Profissional.solicitacoes),
+        selectinload(Profissional.substituicoes),
+    ),
+    "plantao_com_escalas": lambda consulta: consulta.options(selectinload(Plantao.escalas)),
+    "substituicao_com_escala": lambda consulta: consulta.options(
+        selectinload(Substituicao.escala_original)
+    ),
+}
+
+
+def com_perfil(consulta, perfil="enxuto"):
+    """Aplica à consulta (select) o perfil de carregamento informado."""
+    try:
+        return PERFIS_CARREGAMENTO[perfil](consulta)
+    except KeyError:
+        raise ValueError(f"Perfil de carregamento desconhecido: {perfil}") from None
@@ -0,0 +1,150 @@
+# ============================================================
+# 📑 Paginação por Cursor (Keyset) e Filtros de Listagem
+# ============================================================
+# Em vez de OFFSET (que percorre todas as linhas anteriores),
+# cada página continua a partir da chave de ordenação da última
+# linha exibida: WHERE (data, hora_inicio, id) > (:d, :h, :id).
+# Com índice na mesma chave, o custo de qualquer página é
+# constante, independentemente do tamanho do histórico.
+# ============================================================
+
+import base64
+import json
+from datetime import date, datetime, time
+
+from flask import request, url_for
+from sqlalchemy import tuple_
+
+from . import db
+
+POR_PAGINA_PADRAO = 50
+POR_PAGINA_MAXIMO = 200
+
+
+# ------------------------------------------------------------
+# 🔹 Codificação do cursor
+# ------------------------------------------------------------
+def _serializar(valor):
+    if isinstance(valor, (date, datetime, time)):
+        return valor.isoformat()
+    return valor
+
+
+def _desserializar(valor, coluna):
+    """Valor do cursor no tipo da coluna (ValueError se não corresponder).
+
+    O cursor vem da URL: um valor adulterado (ex.: texto no lugar do id)
+    chegaria à comparação no banco e viraria erro 500.
+    """
+    tipo = coluna.type.python_type
+    if tipo in (date, datetime, time):
+        if not isinstance(valor, str):
+            raise ValueError("data/hora inválida no cursor")
+        return tipo.fromisoformat(valor)
+    if not isinstance(valor, tipo) or isinstance(valor, bool):
+        raise ValueError("valor do tipo errado no cursor")
+    return valor
+
+
+def codificar_cursor(valores):
+    """Converte a chave da última linha em um token opaco para a URL."""
+    bruto = json.dumps([_serializar(v) for v in valores], separators=(",", ":"))
+    return base64.urlsafe_b64encode(bruto.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor, colunas):
+    """Recupera a chave a partir do token (None se inválido)."""
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        valores = json.loads(bruto)
+        if not isinstance(valores, list) or len(valores) != len(colunas):
+            return None
+        return [_desserializar(v, c) for v, c in zip(valores, colunas)]
+    except (ValueError, TypeError):
+        return None
+
+
+# ------------------------------------------------------------
+# 🔹 Página de resultados
+# ------------------------------------------------------------
+class Pagina:
+    """Itens de uma página e links para a próxima/primeira página."""
+
+    def __init__(self, itens, proximo_cursor, cursor_atual):
+        self.itens = itens
+        self.proximo_cursor = proximo_cursor
+        self.cursor_atual = cursor_atual
+
+    def _url(self, **extra):
+        args = request.args.to_dict()
+        args.pop("cursor", None)
+        args.update(extra)
+        return url_for(request.endpoint, **args)
+
+    @property
+    def url_proxima(self):
+        return self._url(cursor=self.proximo_cursor) if self.proximo_cursor else None
+
+    @property
+    def url_primeira(self):
+        return self._url() if self.cursor_atual else None
+
+
+def tamanho_da_pagina():
+    """Lê ?por_pagina= respeitando o limite máximo."""
+    tamanho = request.args.get("por_pagina", POR_PAGINA_PADRAO, type=int)
+    return max(1, min(tamanho, POR_PAGINA_MAXIMO))
+
+
+def paginar(consulta, chave, descendente=False, escalar=True):
+    """Executa `consulta` a partir do cursor da requisição.
+
+    `chave` são as colunas de ordenação, todas NOT NULL (a comparação de
+    tuplas pularia as linhas com NULL); a última deve ser única, ex.: id.
+    `escalar=False` mantém as linhas completas (consultas com várias entidades).
+    """
+    cursor = request.args.get("cursor")
+    tamanho = tamanho_da_pagina()
+
+    valores = decodificar_cursor(cursor, chave) if cursor else None
+    if valores is not None:
+        comparacao = tuple_(*chave) < tuple_(*valores) if descendente else tuple_(*chave) > tuple_(*valores)
+        consulta = consulta.where(comparacao)
+
+    ordem = [c.desc() for c in chave] if descendente else list(chave)
+    consulta = consulta.order_by(*ordem).limit(tamanho + 1)
+    consulta = consulta.add_columns(*chave)
+
+    linhas = db.session.execute(consulta).all()
+    n_chave = len(chave)
+    itens = [(linha[0] if escalar else tuple(linha[:-n_chave])) for linha in linhas[:tamanho]]
+
+    proximo = None
+    if len(linhas) > tamanho:
+        proximo = codificar_cursor(linhas[tamanho - 1][-n_chave:])
+    return Pagina(itens, proximo, valores is not None)
+
+
+# ------------------------------------------------------------
+# 🔹 Filtros comuns (query string)
+# ------------------------------------------------------------
+def _data(valor):
+    return date.fromisoformat(valor)
+
+
+def filtros_da_requisicao(*nomes):
+    """Lê os filtros suportados pela listagem; valores inválidos são ignorados."""
+    tipos = {
+        "data_inicio": _data,
+        "data_fim": _data,
+        "status": str,
+        "cargo": str,
+        "local": int,
+        "funcao": int,
+    }
+    filtros = {}
+    for nome in nomes:
+        valor = request.args.get(nome, type=tipos[nome])
+        if valor not in (None, ""):
+            filtros[nome] = valor
+    return filtros
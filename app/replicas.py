@@ -0,0 +1,99 @@
+# ============================================================
+# 🪞 Réplicas de Leitura — Roteamento da Sessão
+# ============================================================
+# Com DATABASE_REPLICA_URLS definida (URLs separadas por vírgula),
+# cada réplica vira um bind do Flask-SQLAlchemy ("replica_1", ...)
+# com pool próprio, e as requisições GET/HEAD leem de uma delas:
+#   • a sessão (SessaoRoteada) só envia à réplica SELECTs do ORM /
+#     Core sem FOR UPDATE; flush, INSERT/UPDATE/DELETE, SQL textual
+#     e session.connection() vão sempre para o primário;
+#   • depois de uma escrita a requisição segue no primário; toda
+#     resposta a uma escrita (POST etc. bem-sucedido, ou GET que
+#     gravou) leva um cookie de aderência: por REPLICA_ADERENCIA_S
+#     segundos os GETs daquele cliente também leem do primário
+#     (lê as próprias escritas apesar do atraso de replicação).
+# Sem réplicas configuradas nada muda: tudo vai para o primário.
+# ============================================================
+
+import os
+import random
+import time
+
+from flask import has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql.elements import TextClause
+
+COOKIE_ADERENCIA = "escala360_primario"
+
+_CHAVE = "escala360.roteamento"
+
+
+def _estado(sessao):
+    """Estado do roteamento: da requisição (inclusive nas respostas transmitidas,
+    que rodam em outro contexto de aplicação/sessão) ou da própria sessão."""
+    if has_request_context():
+        return request.environ.setdefault(_CHAVE, {})
+    return sessao.info.setdefault(_CHAVE, {})
+
+
+def _e_escrita(clause):
+    if isinstance(clause, TextClause):
+        return not clause.text.lstrip()[:6].upper().startswith("SELECT")
+    return getattr(clause, "is_dml", False)
+
+
+def _e_leitura(clause):
+    # SQL textual vai ao primário: um SELECT pode chamar funções que gravam
+    return getattr(clause, "is_select", False) and getattr(clause, "_for_update_arg", None) is None
+
+
+class SessaoRoteada(Session):
+    """Sessão que envia as leituras da requisição à réplica escolhida."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if self._flushing or (clause is not None and _e_escrita(clause)):
+            _estado(self)["escreveu"] = True
+        elif bind is None and clause is not None and _e_leitura(clause):
+            estado = _estado(self)
+            if estado.get("replica") is not None and not estado.get("escreveu"):
+                return estado["replica"]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def binds_das_replicas(modo, opcoes_do_engine):
+    """SQLALCHEMY_BINDS das réplicas em DATABASE_REPLICA_URLS (mesmas opções de pool do primário)."""
+    urls = [u.strip() for u in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if u.strip()]
+    binds = {}
+    for i, url in enumerate(urls, start=1):
+        if "sslmode" not in url:
+            url += "?sslmode=require"
+        binds[f"replica_{i}"] = {"url": url, **opcoes_do_engine(modo, url)}
+    return binds
+
+
+def registrar_roteamento(app, db):
+    """Liga o roteamento das leituras às requisições (apenas com réplicas configuradas)."""
+    chaves = [c for c in app.config.get("SQLALCHEMY_BINDS", {}) if c.startswith("replica_")]
+    if not chaves:
+        return
+    janela = app.config["REPLICA_ADERENCIA_S"]
+
+    @app.before_request
+    def _escolher_replica():
+        if request.method not in ("GET", "HEAD"):
+            return
+        aderente_ate = request.cookies.get(COOKIE_ADERENCIA, type=float)
+        if aderente_ate and aderente_ate > time.time():
+            return
+        _estado(db.session)["replica"] = db.engines[random.choice(chaves)]
+
+    @app.after_request
+    def _aderir_ao_primario(resposta):
+        escrita = request.method not in ("GET", "HEAD") and resposta.status_code < 400
+        if escrita or _estado(db.session).get("escreveu"):
+            resposta.set_cookie(
+                COOKIE_ADERENCIA, str(time.time() + janela), max_age=janela, httponly=True, samesite="Lax"
+            )
+        return resposta
+
+    app.logger.info(f"🪞 Leituras de GET roteadas para {len(chaves)} réplica(s)")
@@ -5,9 +5,17 @@
 # oferecendo endpoints para substituições e notificações.
 # ============================================================
 
-from flask import Blueprint, jsonify, request
+import json
+from datetime import date, datetime, timedelta
+
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from sqlalchemy import or_
+from sqlalchemy.orm import aliased
+
 from .. import db
-from ..models import Substituicao
+from ..cache import condicional
+from ..models import Auditoria, Profissional, Substituicao
+from ..paginacao import filtros_da_requisicao, paginar
 
 # Criação do Blueprint
 bp = Blueprint("api", __name__)
@@ -15,22 +23,96 @@ bp = Blueprint("api", __name__)
 # ------------------------------------------------------------
 # 🔹 GET /api/substituicoes
 # ------------------------------------------------------------
+SOLICITANTE = aliased(Profissional, name="solicitante")
+SUBSTITUTO = aliased(Profissional, name="substituto")
+
+# Campo da resposta -> coluna (os nomes exigem a junção com profissionais)
+CAMPOS_SUBSTITUICAO = {
+    "id": Substituicao.id,
+    "id_escala_original": Substituicao.id_escala_original,
+    "id_solicitante": Substituicao.id_profissional_solicitante,
+    "solicitante": SOLICITANTE.nome,
+    "id_substituto": Substituicao.id_profissional_substituto,
+    "substituto": SUBSTITUTO.nome,
+    "status": Substituicao.status,
+    "data_solicitacao": Substituicao.data_solicitacao,
+}
+
+LINHAS_POR_LOTE = 500
+
+
+def _transmitir(consulta, campos, formato):
+    """Serializa o resultado aos poucos (yield_per) como array JSON ou NDJSON."""
+
+    def _json(linha):
+        return json.dumps(
+            {c: (v.isoformat() if isinstance(v, datetime) else v) for c, v in zip(campos, linha)},
+            ensure_ascii=False,
+        )
+
+    def gerar():
+        resultado = db.session.execute(consulta.execution_options(yield_per=LINHAS_POR_LOTE))
+        primeiro = True
+        if formato == "json":
+            yield "["
+        for lote in resultado.partitions():
+            itens = [_json(linha) for linha in lote]
+            if formato == "ndjson":
+                yield "\n".join(itens) + "\n"
+            else:
+                yield ("" if primeiro else ",") + ",".join(itens)
+            primeiro = False
+        if formato == "json":
+            yield "]"
+
+    mimetype = "application/x-ndjson" if formato == "ndjson" else "application/json"
+    return Response(stream_with_context(gerar()), mimetype=mimetype)
+
+
 @bp.get("/substituicoes")
+@condicional("substituicoes", "profissionais")
 def listar_substituicoes():
-    """Retorna as substituições pendentes em formato JSON."""
-    pendentes = Substituicao.query.filter_by(status="pendente").all()
-    data = [
-        {
-            "id": s.id,
-            "id_escala": s.id_escala_original,
-            "solicitante": s.id_profissional_solicitante,
-            "substituto": s.id_profissional_substituto,
-            "status": s.status,
-            "data_solicitacao": s.data_solicitacao.isoformat(),
-        }
-        for s in pendentes
-    ]
-    return jsonify(data), 200
+    """Lista as substituições (mais recentes primeiro) em JSON ou NDJSON, transmitidas em blocos.
+
+    Filtros: status, período da solicitação (data_inicio/data_fim) e
+    id_profissional (como solicitante ou substituto). `campos` escolhe
+    as colunas da resposta; `formato=ndjson` emite um objeto por linha.
+    """
+    campos = request.args.get("campos")
+    campos = [c.strip() for c in campos.split(",") if c.strip()] if campos else list(CAMPOS_SUBSTITUICAO)
+    invalidos = [c for c in campos if c not in CAMPOS_SUBSTITUICAO]
+    if invalidos:
+        return jsonify({"error": f"Campos inválidos: {', '.join(invalidos)}. "
+                                 f"Disponíveis: {', '.join(CAMPOS_SUBSTITUICAO)}."}), 400
+    formato = request.args.get("formato", "json")
+    if formato not in ("json", "ndjson"):
+        return jsonify({"error": "Formatos disponíveis: json, ndjson."}), 400
+
+    # Uma única consulta; os nomes vêm por junção apenas quando pedidos
+    consulta = db.select(*(CAMPOS_SUBSTITUICAO[c] for c in campos)).select_from(Substituicao)
+    if "solicitante" in campos:
+        consulta = consulta.join(SOLICITANTE, SOLICITANTE.id == Substituicao.id_profissional_solicitante)
+    if "substituto" in campos:
+        consulta = consulta.join(SUBSTITUTO, SUBSTITUTO.id == Substituicao.id_profissional_substituto)
+
+    filtros = filtros_da_requisicao("data_inicio", "data_fim", "status")
+    if "data_inicio" in filtros:
+        consulta = consulta.where(Substituicao.data_solicitacao >= filtros["data_inicio"])
+    if "data_fim" in filtros:
+        consulta = consulta.where(Substituicao.data_solicitacao < filtros["data_fim"] + timedelta(days=1))
+    if "status" in filtros:
+        consulta = consulta.where(Substituicao.status == filtros["status"])
+    id_profissional = request.args.get("id_profissional", type=int)
+    if id_profissional is not None:
+        consulta = consulta.where(
+            or_(
+                Substituicao.id_profissional_solicitante == id_profissional,
+                Substituicao.id_profissional_substituto == id_profissional,
+            )
+        )
+
+    consulta = consulta.order_by(Substituicao.data_solicitacao.desc(), Substituicao.id.desc())
+    return _transmitir(consulta, campos, formato)
 
 
 # ------------------------------------------------------------
@@ -54,17 +136,315 @@ def criar_substituicao():
     return jsonify({"message": "Substituição criada", "id": nova_sub.id}), 201
 
 
+# ------------------------------------------------------------
+# 🔹 Fila de aprovação: POST /api/substituicoes/reservar|aprovar|recusar
+# ------------------------------------------------------------
+def _json_da_reserva(reserva):
+    return {c: (v.isoformat() if isinstance(v, datetime) else v) for c, v in reserva.items()}
+
+
+def _aprovador():
+    """Aprovador do cabeçalho X-Usuario (None se ausente).
+
+    As reservas são do aprovador: sem o cabeçalho não há a quem atribuí-las
+    (o IP não serve — aprovadores atrás do mesmo proxy seriam um só).
+    """
+    return request.headers.get("X-Usuario", "").strip() or None
+
+
+_SEM_APROVADOR = {"error": "Informe o aprovador no cabeçalho X-Usuario."}
+_CORPO_INVALIDO = {"error": "O corpo deve ser um objeto JSON."}
+
+
+def _corpo_objeto():
+    """Corpo JSON da requisição como dict ({} se vazio), ou None se não for um objeto."""
+    payload = request.get_json(silent=True)
+    if payload is None:
+        return {}
+    return payload if isinstance(payload, dict) else None
+
+
+@bp.post("/substituicoes/reservar")
+def reservar_substituicoes():
+    """Reserva para o aprovador (X-Usuario) um lote das substituições pendentes mais antigas."""
+    from ..servicos.aprovacoes import LOTE_MAXIMO, reservar
+
+    usuario = _aprovador()
+    if usuario is None:
+        return jsonify(_SEM_APROVADOR), 400
+    payload = _corpo_objeto()
+    if payload is None:
+        return jsonify(_CORPO_INVALIDO), 400
+    quantidade = payload.get("quantidade", 20)
+    if not isinstance(quantidade, int) or not 1 <= quantidade <= LOTE_MAXIMO:
+        return jsonify({"error": f"quantidade deve ser um inteiro entre 1 e {LOTE_MAXIMO}."}), 400
+
+    reservadas = reservar(usuario, quantidade)
+    return jsonify({"total": len(reservadas), "reservadas": [_json_da_reserva(r) for r in reservadas]}), 200
+
+
+def _decidir(decisao):
+    from ..servicos.aprovacoes import normalizar_itens
+
+    usuario = _aprovador()
+    if usuario is None:
+        return jsonify(_SEM_APROVADOR), 400
+    payload = _corpo_objeto()
+    if payload is None:
+        return jsonify(_CORPO_INVALIDO), 400
+    try:
+        itens = normalizar_itens(payload.get("substituicoes"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(decisao(itens, usuario)), 200
+
+
+@bp.post("/substituicoes/aprovar")
+def aprovar_substituicoes():
+    """Aprova um lote de substituições, passando cada escala ao substituto."""
+    from ..servicos.aprovacoes import aprovar
+
+    return _decidir(aprovar)
+
+
+@bp.post("/substituicoes/recusar")
+def recusar_substituicoes():
+    """Recusa um lote de substituições."""
+    from ..servicos.aprovacoes import recusar
+
+    return _decidir(recusar)
+
+
+# ------------------------------------------------------------
+# 🔹 GET /api/alteracoes (Server-Sent Events)
+# ------------------------------------------------------------
+@bp.get("/alteracoes")
+def transmitir_alteracoes():
+    """Transmite as alterações confirmadas em substituições/escalas (text/event-stream).
+
+    `tabelas` filtra os eventos (padrão: todas). Cada evento traz a linha
+    alterada; eventos com `linhas` (alterações em lote) e `recarregar`
+    pedem que o cliente recarregue a lista. Não usa conexão com o banco.
+    """
+    from ..tempo_real import TABELAS, ouvinte_da_app, transmitir
+
+    ouvinte = ouvinte_da_app(current_app)
+    if ouvinte is None:
+        return jsonify({"error": "Eventos em tempo real indisponíveis no modo serverless."}), 501
+
+    tabelas = request.args.get("tabelas")
+    tabelas = [t.strip() for t in tabelas.split(",") if t.strip()] if tabelas else list(TABELAS)
+    invalidas = [t for t in tabelas if t not in TABELAS]
+    if invalidas:
+        return jsonify({"error": f"Tabelas inválidas: {', '.join(invalidas)}. "
+                                 f"Disponíveis: {', '.join(TABELAS)}."}), 400
+
+    assinada = ouvinte.assinar(tabelas, request.headers.get("Last-Event-ID"))
+    if assinada is None:
+        return jsonify({"error": "Limite de clientes conectados atingido."}), 503, {"Retry-After": "30"}
+
+    # Sem stream_with_context: a requisição (e a sessão do banco) termina aqui
+    resposta = Response(transmitir(ouvinte, *assinada), mimetype="text/event-stream")
+    resposta.headers["Cache-Control"] = "no-cache"
+    resposta.headers["X-Accel-Buffering"] = "no"  # nginx: não acumular os eventos
+    return resposta
+
+
+# ------------------------------------------------------------
+# 🔹 GET /api/substituicoes/sugerir
+# ------------------------------------------------------------
+@bp.get("/substituicoes/sugerir")
+def sugerir_substitutos():
+    """Retorna o ranking dos melhores substitutos para um plantão."""
+    from ..servicos.substitutos import sugerir_substituto
+
+    id_solicitante = request.args.get("id_solicitante", type=int)
+    id_plantao = request.args.get("id_plantao", type=int)
+    k = request.args.get("k", default=5, type=int)
+
+    if id_solicitante is None or id_plantao is None:
+        return jsonify({"error": "Informe id_solicitante e id_plantao."}), 400
+    if k < 1:
+        return jsonify({"error": "O parâmetro k deve ser maior que zero."}), 400
+
+    sugestoes = sugerir_substituto(
+        id_solicitante,
+        id_plantao,
+        k=k,
+        ttl=current_app.config.get("SUGESTAO_INDICE_TTL", 60),
+    )
+    if sugestoes is None:
+        return jsonify({"error": "Profissional ou plantão não encontrado."}), 404
+
+    return jsonify(sugestoes), 200
+
+
+# ------------------------------------------------------------
+# 🔹 POST /api/escalas/preencher-vagas
+# ------------------------------------------------------------
+@bp.post("/escalas/preencher-vagas")
+def preencher_plantoes_vagos():
+    """Aloca em lote os plantões vagos de um período."""
+    from ..servicos.escalonamento import preencher_vagas
+
+    payload = request.get_json(force=True)
+    try:
+        inicio = date.fromisoformat(payload["inicio"])
+        fim = date.fromisoformat(payload["fim"])
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "Informe inicio e fim no formato AAAA-MM-DD."}), 400
+    if fim < inicio:
+        return jsonify({"error": "A data final deve ser posterior à inicial."}), 400
+
+    plano = preencher_vagas(
+        inicio,
+        fim,
+        current_app.config.get("FUNCOES_CARGOS"),
+        simular=bool(payload.get("simular", False)),
+    )
+    return jsonify(plano), 201 if plano["gravado"] else 200
+
+
+# ------------------------------------------------------------
+# 🔹 GET /api/escalas/conflitos
+# ------------------------------------------------------------
+@bp.get("/escalas/conflitos")
+def listar_conflitos():
+    """Lista profissionais escalados em plantões sobrepostos no período."""
+    from ..servicos.conflitos import varrer_conflitos
+
+    try:
+        inicio = date.fromisoformat(request.args["inicio"])
+        fim = date.fromisoformat(request.args["fim"])
+    except (KeyError, ValueError):
+        return jsonify({"error": "Informe inicio e fim no formato AAAA-MM-DD."}), 400
+    if fim < inicio:
+        return jsonify({"error": "A data final deve ser posterior à inicial."}), 400
+
+    conflitos = varrer_conflitos(inicio, fim)
+    return jsonify({"total": len(conflitos), "conflitos": conflitos}), 200
+
+
+# ------------------------------------------------------------
+# 🔹 GET /api/escalas/exportar
+# ------------------------------------------------------------
+@bp.get("/escalas/exportar")
+def exportar_escalas():
+    """Exporta escalas ⨝ plantões ⨝ profissionais do período em CSV ou Parquet (transmitido em blocos)."""
+    from ..servicos.exportacao import FORMATOS, exportar, parquet_disponivel, periodo_do_mes
+
+    formato = request.args.get("formato", "csv")
+    if formato not in FORMATOS:
+        return jsonify({"error": f"Formatos disponíveis: {', '.join(FORMATOS)}."}), 400
+    if formato == "parquet" and not parquet_disponivel():
+        return jsonify({"error": "Exportação Parquet requer o pacote pyarrow."}), 501
+
+    try:
+        if "mes" in request.args:
+            inicio, fim = periodo_do_mes(request.args["mes"])
+        else:
+            inicio = date.fromisoformat(request.args["inicio"])
+            fim = date.fromisoformat(request.args["fim"])
+    except (KeyError, ValueError):
+        return jsonify({"error": "Informe mes (AAAA-MM) ou inicio e fim (AAAA-MM-DD)."}), 400
+    if fim < inicio:
+        return jsonify({"error": "A data final deve ser posterior à inicial."}), 400
+
+    blocos = exportar(
+        formato,
+        inicio,
+        fim,
+        id_local=request.args.get("local", type=int),
+        cargo=request.args.get("cargo") or None,
+    )
+    mimetype, extensao = FORMATOS[formato]
+    resposta = Response(stream_with_context(blocos), mimetype=mimetype)
+    resposta.headers["Content-Disposition"] = (
+        f'attachment; filename="escalas_{inicio.isoformat()}_{fim.isoformat()}.{extensao}"'
+    )
+    return resposta
+
+
+# ------------------------------------------------------------
+# 🔹 POST /api/importacao
+# ------------------------------------------------------------
+@bp.post("/importacao")
+def importar_dados():
+    """Importa arquivos CSV/JSONL (multipart; um campo por tabela) via COPY."""
+    from ..servicos.importacao import TABELAS, importar_pela_sessao
+
+    arquivos = {
+        tabela: (arquivo.filename, arquivo.stream)
+        for tabela, arquivo in request.files.items()
+        if tabela in TABELAS and arquivo.filename
+    }
+    if not arquivos:
+        return jsonify({"error": f"Envie ao menos um arquivo: {', '.join(TABELAS)}."}), 400
+
+    somente_validar = request.args.get("validar", "false").lower() == "true"
+    relatorio = importar_pela_sessao(arquivos, somente_validar=somente_validar)
+    if relatorio["erros"]:
+        return jsonify(relatorio), 422
+    return jsonify(relatorio), 201 if relatorio["gravado"] else 200
+
+
+# ------------------------------------------------------------
+# 🔹 GET /api/auditoria
+# ------------------------------------------------------------
+@bp.get("/auditoria")
+def listar_auditoria():
+    """Trilha de auditoria, da mais recente para a mais antiga (paginação por cursor)."""
+    # Valores inválidos são ignorados, como nos filtros das listagens
+    inicio = request.args.get("inicio", type=datetime.fromisoformat)
+    fim = request.args.get("fim", type=datetime.fromisoformat)
+    id_entidade = request.args.get("id_entidade", type=int)
+
+    consulta = db.select(Auditoria)
+    if inicio:
+        consulta = consulta.where(Auditoria.data_hora >= inicio)
+    if fim:
+        consulta = consulta.where(Auditoria.data_hora < fim)
+    if request.args.get("entidade"):
+        consulta = consulta.where(Auditoria.entidade == request.args["entidade"])
+    if id_entidade is not None:
+        consulta = consulta.where(Auditoria.id_entidade == id_entidade)
+    if request.args.get("usuario"):
+        consulta = consulta.where(Auditoria.usuario == request.args["usuario"])
+
+    pagina = paginar(consulta, (Auditoria.data_hora, Auditoria.id), descendente=True)
+    return jsonify({
+        "itens": [
+            {
+                "id": a.id,
+                "entidade": a.entidade,
+                "id_entidade": a.id_entidade,
+                "acao": a.acao,
+                "usuario": a.usuario,
+                "data_hora": a.data_hora.isoformat(),
+            }
+            for a in pagina.itens
+        ],
+        "proximo_cursor": pagina.proximo_cursor,
+        "proxima": pagina.url_proxima,
+    }), 200
+
+
 # ------------------------------------------------------------
 # 🔹 POST /api/notificacoes/email
 # ------------------------------------------------------------
 @bp.post("/notificacoes/email")
 def enviar_email():
-    """Simula o envio de notificação por e-mail."""
+    """Enfileira uma notificação por e-mail (enviada pelo worker)."""
+    from ..servicos.notificacoes import enfileirar
+
     data = request.get_json(force=True)
     destinatario = data.get("to")
+    if not destinatario:
+        return jsonify({"error": "Informe o destinatário (to)."}), 400
     assunto = data.get("subject", "Notificação Escala360")
-    print(f"[📧 E-mail Simulado] Para: {destinatario} | Assunto: {assunto}")
-    return jsonify({"message": "E-mail simulado enviado com sucesso", "to": destinatario}), 202
+    mensagem = data.get("mensagem", assunto)
+    id_notificacao = enfileirar("email", destinatario, mensagem, assunto=assunto)
+    return jsonify({"message": "E-mail enfileirado", "id": id_notificacao, "to": destinatario}), 202
 
 
 # ------------------------------------------------------------
@@ -72,9 +452,48 @@ def enviar_email():
 # ------------------------------------------------------------
 @bp.post("/notificacoes/whatsapp")
 def enviar_whatsapp():
-    """Simula o envio de mensagem WhatsApp."""
+    """Enfileira uma mensagem WhatsApp (enviada pelo worker)."""
+    from ..servicos.notificacoes import enfileirar
+
     data = request.get_json(force=True)
     destinatario = data.get("to")
+    if not destinatario:
+        return jsonify({"error": "Informe o destinatário (to)."}), 400
     mensagem = data.get("mensagem", "Mensagem automática Escala360")
-    print(f"[💬 WhatsApp Simulado] Para: {destinatario} | Mensagem: {mensagem}")
-    return jsonify({"message": "WhatsApp simulado enviado com sucesso", "to": destinatario}), 202
+    id_notificacao = enfileirar("whatsapp", destinatario, mensagem)
+    return jsonify({"message": "WhatsApp enfileirado", "id": id_notificacao, "to": destinatario}), 202
+
+
+# ------------------------------------------------------------
+# 🔹 POST /api/notificacoes/lote
+# ------------------------------------------------------------
+@bp.post("/notificacoes/lote")
+def enfileirar_notificacoes_em_lote():
+    """Enfileira a mesma mensagem para vários profissionais e canais."""
+    from ..servicos.notificacoes import (
+        CANAIS,
+        destinatarios_da_substituicao,
+        enfileirar_lote,
+        montar_notificacoes,
+    )
+
+    payload = request.get_json(force=True)
+    canais = payload.get("canais") or list(CANAIS)
+    if not set(canais) <= set(CANAIS):
+        return jsonify({"error": f"Canais válidos: {', '.join(CANAIS)}."}), 400
+    mensagem = payload.get("mensagem")
+    if not mensagem:
+        return jsonify({"error": "Informe a mensagem."}), 400
+
+    ids = list(payload.get("destinatarios") or [])
+    if payload.get("id_substituicao") is not None:
+        envolvidos = destinatarios_da_substituicao(payload["id_substituicao"])
+        if envolvidos is None:
+            return jsonify({"error": "Substituição não encontrada."}), 404
+        ids += [i for i in envolvidos if i is not None]
+    if not ids:
+        return jsonify({"error": "Informe destinatarios ou id_substituicao."}), 400
+
+    itens = montar_notificacoes(ids, canais, mensagem, assunto=payload.get("assunto"))
+    total = enfileirar_lote(itens)
+    return jsonify({"message": "Notificações enfileiradas", "enfileiradas": total}), 202
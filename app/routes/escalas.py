@@ -6,7 +6,10 @@
 # ============================================================
 
 from flask import Blueprint, render_template
-from ..models import Escala
+from .. import db
+from ..cache import condicional
+from ..models import Escala, Plantao, Profissional, com_perfil
+from ..paginacao import filtros_da_requisicao, paginar
 
 # Criação do Blueprint
 bp = Blueprint("escalas", __name__, template_folder="../templates")
@@ -16,7 +19,30 @@ bp = Blueprint("escalas", __name__, template_folder="../templates")
 # 🔹 Rota: /escalas
 # ------------------------------------------------------------
 @bp.route("/")
+@condicional("escalas", "plantoes", "profissionais")
 def listar():
-    """Lista todas as escalas, exibindo a data de alocação mais recente primeiro."""
-    escalas = Escala.query.order_by(Escala.data_alocacao.desc()).all()
-    return render_template("escalas.html", escalas=escalas)
+    """Lista as escalas (alocação mais recente primeiro), paginadas por cursor (data_alocacao, id).
+
+    Filtros: período do plantão, status da escala, cargo do profissional e local.
+    """
+    filtros = filtros_da_requisicao("data_inicio", "data_fim", "status", "cargo", "local")
+    # Uma única consulta: escalas ⨝ plantões ⨝ profissionais
+    consulta = com_perfil(db.select(Escala), "escala_detalhada")
+    # O período também filtra a chave de partição de escalas (só os meses pedidos são lidos)
+    if "data_inicio" in filtros:
+        consulta = consulta.where(
+            Plantao.data >= filtros["data_inicio"], Escala.data_plantao >= filtros["data_inicio"]
+        )
+    if "data_fim" in filtros:
+        consulta = consulta.where(
+            Plantao.data <= filtros["data_fim"], Escala.data_plantao <= filtros["data_fim"]
+        )
+    if "local" in filtros:
+        consulta = consulta.where(Plantao.id_local == filtros["local"])
+    if "status" in filtros:
+        consulta = consulta.where(Escala.status == filtros["status"])
+    if "cargo" in filtros:
+        consulta = consulta.where(Profissional.cargo == filtros["cargo"])
+
+    pagina = paginar(consulta, (Escala.data_alocacao, Escala.id), descendente=True)
+    return render_template("escalas.html", escalas=pagina.itens, pagina=pagina, filtros=filtros)
@@ -6,7 +6,10 @@
 # ============================================================
 
 from flask import Blueprint, render_template
-from ..models import Plantao
+from .. import db
+from ..cache import condicional
+from ..models import Plantao, com_perfil
+from ..paginacao import filtros_da_requisicao, paginar
 
 # Criação do Blueprint
 bp = Blueprint("plantoes", __name__, template_folder="../templates")
@@ -16,7 +19,19 @@ bp = Blueprint("plantoes", __name__, template_folder="../templates")
 # 🔹 Rota: /plantoes
 # ------------------------------------------------------------
 @bp.route("/")
+@condicional("plantoes")
 def listar():
-    """Lista todos os plantões cadastrados, ordenados por data e hora."""
-    plantoes = Plantao.query.order_by(Plantao.data, Plantao.hora_inicio).all()
-    return render_template("plantoes.html", plantoes=plantoes)
+    """Lista os plantões por data e hora, paginados por cursor (data, hora_inicio, id)."""
+    filtros = filtros_da_requisicao("data_inicio", "data_fim", "funcao", "local")
+    consulta = com_perfil(db.select(Plantao))
+    if "data_inicio" in filtros:
+        consulta = consulta.where(Plantao.data >= filtros["data_inicio"])
+    if "data_fim" in filtros:
+        consulta = consulta.where(Plantao.data <= filtros["data_fim"])
+    if "funcao" in filtros:
+        consulta = consulta.where(Plantao.id_funcao == filtros["funcao"])
+    if "local" in filtros:
+        consulta = consulta.where(Plantao.id_local == filtros["local"])
+
+    pagina = paginar(consulta, (Plantao.data, Plantao.hora_inicio, Plantao.id))
+    return render_template("plantoes.html", plantoes=pagina.itens, pagina=pagina, filtros=filtros)
@@ -2,11 +2,15 @@
 # 🧩 Módulo de Rotas — Profissionais
 # ============================================================
 # Este módulo é responsável por exibir a listagem dos
-# profissionais cadastrados no sistema Escala360.
+# profissionais cadastrados no sistema Escala360 e pelos
+# feeds de agenda (iCalendar / JSON) de cada profissional.
 # ============================================================
 
-from flask import Blueprint, render_template
-from ..models import Profissional
+from flask import Blueprint, abort, current_app, jsonify, make_response, render_template, request
+from .. import db
+from ..cache import condicional
+from ..models import Profissional, com_perfil
+from ..paginacao import filtros_da_requisicao, paginar
 
 # Criação do Blueprint
 bp = Blueprint("profissionais", __name__, template_folder="../templates")
@@ -16,7 +20,48 @@ bp = Blueprint("profissionais", __name__, template_folder="../templates")
 # 🔹 Rota: /profissionais
 # ------------------------------------------------------------
 @bp.route("/")
+@condicional("profissionais")
 def listar():
-    """Lista todos os profissionais cadastrados."""
-    profissionais = Profissional.query.order_by(Profissional.nome).all()
-    return render_template("profissionais.html", profissionais=profissionais)
+    """Lista os profissionais por nome, paginados por cursor (nome, id)."""
+    filtros = filtros_da_requisicao("cargo", "status")
+    consulta = com_perfil(db.select(Profissional))
+    if "cargo" in filtros:
+        consulta = consulta.where(Profissional.cargo == filtros["cargo"])
+    if "status" in filtros:
+        consulta = consulta.where(Profissional.ativo.is_(filtros["status"] == "ativo"))
+
+    pagina = paginar(consulta, (Profissional.nome, Profissional.id))
+    return render_template(
+        "profissionais.html", profissionais=pagina.itens, pagina=pagina, filtros=filtros
+    )
+
+
+# ------------------------------------------------------------
+# 🔹 Rota: /profissionais/<id>/agenda.ics | agenda.json
+# ------------------------------------------------------------
+@bp.get("/<int:id_profissional>/agenda.<formato>")
+def agenda(id_profissional, formato):
+    """Plantões do profissional para apps de calendário (ver app/servicos/agendas.py)."""
+    from ..servicos.agendas import FORMATOS, etag_da_agenda, obter_agenda
+
+    if formato not in FORMATOS:
+        abort(404)
+    etag = etag_da_agenda(id_profissional, formato, current_app.config)
+
+    if request.if_none_match.contains(etag):
+        resposta = make_response("", 304)
+    else:
+        feed = obter_agenda(id_profissional, formato, etag, current_app.config)
+        if feed is None:
+            return jsonify({"error": "Profissional não encontrado."}), 404
+        corpo, mimetype, origem = feed
+        resposta = make_response(corpo, 200)
+        resposta.mimetype = mimetype
+        resposta.headers["X-Cache"] = origem
+        if formato == "ics":
+            resposta.headers["Content-Disposition"] = f'inline; filename="agenda-{id_profissional}.ics"'
+
+    resposta.set_etag(etag)
+    # O calendário pode guardar, mas deve revalidar a cada consulta
+    resposta.cache_control.no_cache = True
+    return resposta
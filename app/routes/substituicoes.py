@@ -5,8 +5,13 @@
 # solicitações de substituição e suas situações atuais.
 # ============================================================
 
+from datetime import timedelta
+
 from flask import Blueprint, render_template
-from ..models import Substituicao
+from .. import db
+from ..cache import condicional
+from ..models import Profissional, Substituicao, com_perfil
+from ..paginacao import filtros_da_requisicao, paginar
 
 # Criação do Blueprint
 bp = Blueprint("substituicoes", __name__, template_folder="../templates")
@@ -16,7 +21,26 @@ bp = Blueprint("substituicoes", __name__, template_folder="../templates")
 # 🔹 Rota: /substituicoes
 # ------------------------------------------------------------
 @bp.route("/")
+@condicional("substituicoes", "profissionais")
 def listar():
-    """Lista todas as solicitações de substituição, mais recentes primeiro."""
-    substituicoes = Substituicao.query.order_by(Substituicao.data_solicitacao.desc()).all()
-    return render_template("substituicoes.html", substituicoes=substituicoes)
+    """Lista as substituições (mais recentes primeiro), paginadas por cursor (data_solicitacao, id).
+
+    Filtros: período da solicitação, status e cargo do solicitante.
+    """
+    filtros = filtros_da_requisicao("data_inicio", "data_fim", "status", "cargo")
+    consulta = com_perfil(db.select(Substituicao))
+    if "data_inicio" in filtros:
+        consulta = consulta.where(Substituicao.data_solicitacao >= filtros["data_inicio"])
+    if "data_fim" in filtros:
+        consulta = consulta.where(Substituicao.data_solicitacao < filtros["data_fim"] + timedelta(days=1))
+    if "status" in filtros:
+        consulta = consulta.where(Substituicao.status == filtros["status"])
+    if "cargo" in filtros:
+        consulta = consulta.join(
+            Profissional, Profissional.id == Substituicao.id_profissional_solicitante
+        ).where(Profissional.cargo == filtros["cargo"])
+
+    pagina = paginar(consulta, (Substituicao.data_solicitacao, Substituicao.id), descendente=True)
+    return render_template(
+        "substituicoes.html", substituicoes=pagina.itens, pagina=pagina, filtros=filtros
+    )
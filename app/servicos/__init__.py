@@ -0,0 +1,6 @@
+# ============================================================
+# ⚙️ Pacote de Serviços — Escala360
+# ============================================================
+# Regras de negócio reutilizadas pelas rotas (Blueprints),
+# pela API REST e pelos comandos de linha de comando.
+# ============================================================
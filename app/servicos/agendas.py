@@ -0,0 +1,288 @@
+# ============================================================
+# 📅 Serviço — Agendas por Profissional (iCalendar / JSON)
+# ============================================================
+# GET /profissionais/<id>/agenda.ics|.json entrega os plantões
+# de um profissional a apps de calendário, que consultam o feed
+# a cada poucos minutos:
+#   • cada profissional tem uma versão (versoes_agendas) que sobe
+#     no commit que altera as escalas dele, os plantões dessas
+#     escalas, as substituições que ele pediu ou o cadastro dele;
+#     as agendas dos demais continuam válidas;
+#   • o ETag vem dessa versão (uma leitura pela chave primária):
+#     If-None-Match válido → 304 sem consultar as escalas;
+#   • o corpo já gerado fica em um cache LRU do processo,
+#     limitado em bytes; as versões superadas nunca mais são
+#     pedidas e são as primeiras a sair.
+# Gravações em lote fora do ORM chamam marcar_agendas().
+# ============================================================
+
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import event, func, inspect
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from .. import db
+from ..cache import CacheLRU
+from ..models import Escala, Plantao, Profissional, Substituicao, VersaoAgenda
+from .substitutos import intervalo_do_plantao
+
+FORMATOS = {"ics": "text/calendar", "json": "application/json"}
+
+# Entidade -> atributos que apontam para o profissional cuja agenda muda
+AFETADOS = {
+    Escala: ("id_profissional",),
+    Substituicao: ("id_profissional_solicitante",),  # a agenda mostra a troca pendente
+}
+
+_CHAVE = "agendas_alteradas"
+
+agendas = CacheLRU(int(os.getenv("AGENDA_CACHE_MAX_BYTES", str(32 * 1024 * 1024))))
+
+
+# ------------------------------------------------------------
+# 🔹 Versões por profissional
+# ------------------------------------------------------------
+def marcar_agendas(session, ids):
+    """Registra profissionais com agenda alterada na transação (a versão sobe no commit)."""
+    session.info.setdefault(_CHAVE, set()).update(i for i in ids if i is not None)
+
+
+@event.listens_for(Session, "before_flush")
+def _carregar_excluidos(session, flush_context, instances):
+    # Após o flush os objetos excluídos não podem mais carregar atributos
+    for obj in session.deleted:
+        for atributo in AFETADOS.get(type(obj), ()):
+            getattr(obj, atributo)
+
+
+def _valores(obj, atributo):
+    """Valor atual e anteriores do atributo (o profissional que ganhou e o que perdeu).
+
+    Os atributos de AFETADOS usam active_history=True (app/models.py): o valor
+    anterior está no histórico mesmo que o objeto tenha expirado no último commit.
+    """
+    historico = inspect(obj).attrs[atributo].history
+    return {getattr(obj, atributo), *historico.deleted, *historico.unchanged}
+
+
+@event.listens_for(Session, "after_flush")
+def _acumular(session, flush_context):
+    ids, plantoes = set(), set()
+    for obj in (*session.new, *session.deleted, *session.dirty):
+        if obj in session.dirty and not session.is_modified(obj, include_collections=False):
+            continue
+        if type(obj) in AFETADOS:
+            for atributo in AFETADOS[type(obj)]:
+                ids |= _valores(obj, atributo)
+        elif isinstance(obj, Profissional):
+            ids.add(obj.id)
+        elif isinstance(obj, Plantao) and obj in session.dirty:
+            plantoes.add(obj.id)
+    if plantoes:
+        # Horário ou local do plantão mudou: afeta todos os escalados nele
+        ids.update(session.connection().execute(
+            db.select(Escala.id_profissional).where(Escala.id_plantao.in_(plantoes)).distinct()
+        ).scalars())
+    if ids:
+        marcar_agendas(session, ids)
+
+
+def incrementar_versoes(conexao, ids):
+    """Sobe a versão da agenda de cada profissional em `ids` (UPSERT)."""
+    tabela = VersaoAgenda.__table__
+    agora = func.timezone("utc", func.now())
+    # Ordem fixa: transações concorrentes travam as linhas na mesma sequência
+    stmt = pg_insert(tabela).values(
+        [{"id_profissional": i, "versao": 1, "alterado_em": agora} for i in sorted(ids)]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["id_profissional"],
+        set_={"versao": tabela.c.versao + 1, "alterado_em": stmt.excluded.alterado_em},
+    )
+    conexao.execute(stmt)
+
+
+@event.listens_for(Session, "before_commit")
+def _incrementar(session):
+    session.flush()  # o flush final do commit só acontece após este evento
+    ids = session.info.pop(_CHAVE, None)
+    if ids:
+        incrementar_versoes(session.connection(), ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar(session):
+    session.info.pop(_CHAVE, None)
+
+
+# ------------------------------------------------------------
+# 🔹 Leitura do feed
+# ------------------------------------------------------------
+def janela(config, fuso):
+    """(primeiro dia, último dia) exibidos no feed, contados a partir de hoje no fuso da agenda."""
+    hoje = datetime.now(fuso).date()
+    return (
+        hoje - timedelta(days=config["AGENDA_DIAS_PASSADOS"]),
+        hoje + timedelta(days=config["AGENDA_DIAS_FUTUROS"]),
+    )
+
+
+def etag_da_agenda(id_profissional, formato, config):
+    """ETag do feed: versão da agenda + formato + janela (muda também na virada do dia)."""
+    versao = db.session.execute(
+        db.select(VersaoAgenda.versao).where(VersaoAgenda.id_profissional == id_profissional)
+    ).scalar() or 0
+    inicio, fim = janela(config, ZoneInfo(config["AGENDA_FUSO"]))
+    partes = ["agenda", id_profissional, versao, formato, inicio, fim, config["AGENDA_FUSO"]]
+    return hashlib.sha1("|".join(map(str, partes)).encode()).hexdigest()
+
+
+def _plantoes(id_profissional, inicio, fim):
+    troca_pendente = (
+        db.select(Substituicao.id)
+        .where(
+            Substituicao.id_escala_original == Escala.id,
+            Substituicao.id_profissional_solicitante == id_profissional,
+            Substituicao.status == "pendente",
+        )
+        .exists()
+    )
+    return db.session.execute(
+        db.select(
+            Escala.id,
+            Escala.status,
+            Escala.versao,
+            Plantao.id.label("id_plantao"),
+            Plantao.data,
+            Plantao.hora_inicio,
+            Plantao.hora_fim,
+            Plantao.id_funcao,
+            Plantao.id_local,
+            troca_pendente.label("troca_pendente"),
+        )
+        .join(Escala.plantao)
+        .where(
+            Escala.id_profissional == id_profissional,
+            # Repetido nas duas tabelas para limitar as partições lidas
+            Escala.data_plantao.between(inicio, fim),
+            Plantao.data.between(inicio, fim),
+        )
+        .order_by(Plantao.data, Plantao.hora_inicio, Escala.id)
+    ).all()
+
+
+def obter_agenda(id_profissional, formato, etag, config):
+    """(corpo, mimetype, "HIT"/"MISS") do feed, ou None se o profissional não existe."""
+    em_cache = agendas.obter(etag)
+    if em_cache is not None:
+        return (*em_cache, "HIT")
+
+    profissional = db.session.get(Profissional, id_profissional)
+    if profissional is None:
+        return None
+    fuso = ZoneInfo(config["AGENDA_FUSO"])
+    inicio, fim = janela(config, fuso)
+    plantoes = _plantoes(id_profissional, inicio, fim)
+    gerado_em = datetime.now(timezone.utc).replace(microsecond=0)
+    if formato == "ics":
+        corpo = formatar_ics(profissional, plantoes, fuso, gerado_em, config["AGENDA_ATUALIZAR_MIN"])
+    else:
+        corpo = formatar_json(profissional, plantoes, fuso, gerado_em, inicio, fim)
+    agendas.guardar(etag, corpo, FORMATOS[formato])
+    return corpo, FORMATOS[formato], "MISS"
+
+
+# ------------------------------------------------------------
+# 🔹 Formatos
+# ------------------------------------------------------------
+def _texto(valor):
+    """Escapa um valor TEXT do iCalendar (RFC 5545, 3.3.11)."""
+    return (
+        str(valor).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+    )
+
+
+def _dobrar(linha):
+    """Quebra linhas acima de 75 octetos sem partir caracteres UTF-8 (RFC 5545, 3.1)."""
+    if len(linha.encode()) <= 75:
+        return linha
+    partes, atual, tamanho, limite = [], [], 0, 75
+    for caractere in linha:
+        octetos = len(caractere.encode())
+        if tamanho + octetos > limite:
+            partes.append("".join(atual))
+            atual, tamanho, limite = [], 0, 74  # a continuação começa com um espaço
+        atual.append(caractere)
+        tamanho += octetos
+    partes.append("".join(atual))
+    return "\r\n ".join(partes)
+
+
+def _utc(momento, fuso):
+    return momento.replace(tzinfo=fuso).astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def formatar_ics(profissional, plantoes, fuso, gerado_em, atualizar_min):
+    """Calendário iCalendar com um VEVENT por escala (horários em UTC)."""
+    linhas = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//Escala360//Agenda de plantões//PT-BR",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_texto(f'Plantões — {profissional.nome}')}",
+        f"X-WR-TIMEZONE:{fuso.key}",
+        f"REFRESH-INTERVAL;VALUE=DURATION:PT{atualizar_min}M",
+        f"X-PUBLISHED-TTL:PT{atualizar_min}M",
+    ]
+    carimbo = gerado_em.strftime("%Y%m%dT%H%M%SZ")
+    for p in plantoes:
+        inicio, fim = intervalo_do_plantao(p.data, p.hora_inicio, p.hora_fim)
+        descricao = f"Plantão #{p.id_plantao} — função {p.id_funcao}"
+        if p.troca_pendente:
+            descricao += "\nSubstituição solicitada, aguardando aprovação."
+        linhas += [
+            "BEGIN:VEVENT",
+            f"UID:escala-{p.id}@escala360",
+            f"DTSTAMP:{carimbo}",
+            f"SEQUENCE:{p.versao}",  # sobe quando a escala muda de mãos
+            f"DTSTART:{_utc(inicio, fuso)}",
+            f"DTEND:{_utc(fim, fuso)}",
+            f"SUMMARY:{_texto(f'Plantão {p.hora_inicio:%H:%M}–{p.hora_fim:%H:%M} (local {p.id_local})')}",
+            f"LOCATION:{_texto(f'Local {p.id_local}')}",
+            f"DESCRIPTION:{_texto(descricao)}",
+            f"STATUS:{'CANCELLED' if p.status == 'cancelado' else 'CONFIRMED'}",
+            "END:VEVENT",
+        ]
+    linhas.append("END:VCALENDAR")
+    return "".join(_dobrar(linha) + "\r\n" for linha in linhas).encode()
+
+
+def formatar_json(profissional, plantoes, fuso, gerado_em, inicio, fim):
+    """Mesmos plantões em JSON, com horários locais no fuso da agenda (ISO 8601)."""
+    itens = []
+    for p in plantoes:
+        comeco, termino = intervalo_do_plantao(p.data, p.hora_inicio, p.hora_fim)
+        itens.append({
+            "id_escala": p.id,
+            "id_plantao": p.id_plantao,
+            "inicio": comeco.replace(tzinfo=fuso).isoformat(),
+            "fim": termino.replace(tzinfo=fuso).isoformat(),
+            "id_funcao": p.id_funcao,
+            "id_local": p.id_local,
+            "status": p.status,
+            "troca_pendente": p.troca_pendente,
+            "versao": p.versao,
+        })
+    return json.dumps({
+        "profissional": {"id": profissional.id, "nome": profissional.nome, "cargo": profissional.cargo},
+        "periodo": {"inicio": inicio.isoformat(), "fim": fim.isoformat()},
+        "fuso": fuso.key,
+        "gerado_em": gerado_em.isoformat(),
+        "plantoes": itens,
+    }, ensure_ascii=False).encode()
@@ -0,0 +1,298 @@
+# ============================================================
+# ✅ Serviço — Fila de Aprovação de Substituições
+# ============================================================
+# Vários supervisores processam as substituições pendentes ao
+# mesmo tempo sem esperar uns pelos outros nem aplicar a mesma
+# decisão duas vezes:
+#   • reservar: entrega ao aprovador um lote das pendentes mais
+#     antigas por RESERVA_S segundos; as linhas são escolhidas com
+#     FOR UPDATE SKIP LOCKED, então reservas concorrentes recebem
+#     lotes disjuntos;
+#   • aprovar / recusar: travam as substituições pedidas com SKIP
+#     LOCKED (a que outro aprovador está decidindo vira conflito, sem
+#     espera), conferem status, reserva e a versão informada pelo
+#     cliente e gravam o lote com um UPDATE por tabela;
+#   • a aprovação passa a escala ao substituto com controle
+#     otimista: escalas não são travadas na leitura e o UPDATE só
+#     vale onde versão e profissional ainda são os lidos.
+# Cada chamada é uma transação curta, e a vazão cresce com o número
+# de aprovadores. UPDATE em lote não dispara os eventos de flush:
+# resumos, auditoria e versões (tabelas e agendas) são atualizados à parte.
+# ============================================================
+
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import Date, Integer, column, or_, update, values
+from sqlalchemy.exc import DBAPIError
+
+from .. import db
+from ..cache import marcar_alteradas
+from ..models import Escala, Substituicao
+from .agendas import marcar_agendas
+from .auditoria import registrar_auditoria
+from .resumos import acumular_deltas
+from .substitutos import invalidar_indice
+
+RESERVA_S = 300
+LOTE_MAXIMO = 200
+
+# Restrição de exclusão (substituto com horário sobreposto) e impasse entre aprovadores
+_REPETIR_ITEM_A_ITEM = {"23P01": "substituto já escalado em horário sobreposto",
+                        "40P01": "impasse com outro aprovador; tente novamente"}
+
+
+# ------------------------------------------------------------
+# 🔹 Reserva
+# ------------------------------------------------------------
+def reservar(usuario, quantidade):
+    """Reserva até `quantidade` pendentes (as mais antigas) para `usuario` e as retorna.
+
+    Reservas vencidas voltam para a fila; as do próprio usuário são renovadas.
+    """
+    agora = datetime.utcnow()
+    livres = (
+        db.select(Substituicao.id)
+        .where(
+            Substituicao.status == "pendente",
+            or_(
+                Substituicao.reservada_ate.is_(None),
+                Substituicao.reservada_ate <= agora,
+                Substituicao.reservada_por == usuario,
+            ),
+        )
+        .order_by(Substituicao.data_solicitacao, Substituicao.id)
+        .limit(quantidade)
+        .with_for_update(skip_locked=True)
+    )
+    reservadas = db.session.execute(
+        update(Substituicao)
+        .where(Substituicao.id.in_(livres.scalar_subquery()))
+        .values(
+            reservada_por=usuario,
+            reservada_ate=agora + timedelta(seconds=RESERVA_S),
+            versao=Substituicao.versao + 1,
+        )
+        .returning(
+            Substituicao.id,
+            Substituicao.versao,
+            Substituicao.id_escala_original,
+            Substituicao.id_profissional_solicitante,
+            Substituicao.id_profissional_substituto,
+            Substituicao.data_solicitacao,
+            Substituicao.reservada_ate,
+        )
+        .execution_options(synchronize_session=False)
+    ).mappings().all()
+    db.session.commit()
+    return sorted((dict(r) for r in reservadas), key=lambda r: (r["data_solicitacao"], r["id"]))
+
+
+# ------------------------------------------------------------
+# 🔹 Decisões
+# ------------------------------------------------------------
+def normalizar_itens(itens):
+    """[id | {"id": ..., "versao": ...}] -> {id: versão esperada (ou None)}."""
+    if not isinstance(itens, list) or not itens:
+        raise ValueError("Informe a lista 'substituicoes' (ids ou objetos {id, versao}).")
+    if len(itens) > LOTE_MAXIMO:
+        raise ValueError(f"No máximo {LOTE_MAXIMO} substituições por chamada.")
+    normalizados = {}
+    for item in itens:
+        if isinstance(item, dict):
+            id_, versao = item.get("id"), item.get("versao")
+        else:
+            id_, versao = item, None
+        if not isinstance(id_, int) or isinstance(id_, bool) or not (versao is None or isinstance(versao, int)):
+            raise ValueError(f"Item inválido: {item!r}.")
+        normalizados[id_] = versao
+    return normalizados
+
+
+def _travar(itens, usuario, agora):
+    """Trava as substituições pedidas (SKIP LOCKED) e separa as que podem ser decididas."""
+    linhas = db.session.execute(
+        db.select(
+            Substituicao.id,
+            Substituicao.versao,
+            Substituicao.status,
+            Substituicao.reservada_por,
+            Substituicao.reservada_ate,
+            Substituicao.id_escala_original,
+            Substituicao.id_profissional_solicitante,
+            Substituicao.id_profissional_substituto,
+        )
+        .where(Substituicao.id.in_(list(itens)))
+        .order_by(Substituicao.id)
+        .with_for_update(skip_locked=True)
+    ).all()
+    travadas = {linha.id: linha for linha in linhas}
+
+    validas, conflitos = [], []
+    for id_, versao in itens.items():
+        linha = travadas.get(id_)
+        if linha is None:
+            motivo = "inexistente ou em decisão por outro aprovador"
+        elif linha.status != "pendente":
+            motivo = f"já {linha.status}"
+        elif versao is not None and linha.versao != versao:
+            motivo = f"alterada desde a leitura (versão atual {linha.versao})"
+        elif linha.reservada_por not in (None, usuario) and linha.reservada_ate and linha.reservada_ate > agora:
+            motivo = f"reservada por {linha.reservada_por}"
+        else:
+            validas.append(linha)
+            continue
+        conflitos.append({"id": id_, "motivo": motivo})
+    return validas, conflitos
+
+
+def _registrar_decisao(decididas, status, usuario, agora):
+    db.session.execute(
+        update(Substituicao)
+        .where(Substituicao.id.in_([s.id for s in decididas]))
+        .values(
+            status=status,
+            versao=Substituicao.versao + 1,
+            decidida_por=usuario,
+            decidida_em=agora,
+            reservada_por=None,
+            reservada_ate=None,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    registrar_auditoria(db.session, Substituicao.__tablename__, [s.id for s in decididas],
+                        status)
+
+
+def _aprovar_lote(itens, usuario):
+    agora = datetime.utcnow()
+    validas, conflitos = _travar(itens, usuario, agora)
+
+    # Escalas lidas sem trava: o UPDATE abaixo confere versão e profissional
+    escalas = {
+        e.id: e
+        for e in db.session.execute(
+            db.select(Escala.id, Escala.data_plantao, Escala.versao, Escala.id_profissional, Escala.status)
+            .where(Escala.id.in_({s.id_escala_original for s in validas}))
+        ).all()
+    } if validas else {}
+
+    pedidos = {}  # id da escala -> substituição (uma por escala)
+    for sub in validas:
+        escala = escalas.get(sub.id_escala_original)
+        if escala is None or escala.status != "ativo":
+            motivo = "escala inexistente ou cancelada"
+        elif escala.id_profissional != sub.id_profissional_solicitante:
+            motivo = "a escala não é mais do solicitante"
+        elif sub.id_escala_original in pedidos:
+            motivo = "outra substituição da mesma escala no lote"
+        else:
+            pedidos[sub.id_escala_original] = sub
+            continue
+        conflitos.append({"id": sub.id, "motivo": motivo})
+
+    aprovadas = []
+    if pedidos:
+        alvo = values(
+            column("id", Integer),
+            column("data_plantao", Date),
+            column("versao", Integer),
+            column("solicitante", Integer),
+            column("substituto", Integer),
+            name="alvo",
+        ).data([
+            (id_escala, escalas[id_escala].data_plantao, escalas[id_escala].versao,
+             sub.id_profissional_solicitante, sub.id_profissional_substituto)
+            for id_escala, sub in sorted(pedidos.items())
+        ])
+        trocadas = set(db.session.execute(
+            update(Escala)
+            .where(
+                Escala.id == alvo.c.id,
+                Escala.data_plantao == alvo.c.data_plantao,
+                Escala.versao == alvo.c.versao,
+                Escala.id_profissional == alvo.c.solicitante,
+            )
+            .values(id_profissional=alvo.c.substituto, versao=Escala.versao + 1)
+            .returning(Escala.id)
+            .execution_options(synchronize_session=False)
+        ).scalars())
+        for id_escala, sub in pedidos.items():
+            if id_escala in trocadas:
+                aprovadas.append(sub)
+            else:
+                conflitos.append({"id": sub.id, "motivo": "escala alterada por outra transação"})
+
+    if aprovadas:
+        _registrar_decisao(aprovadas, "aprovado", usuario, agora)
+        carga = Counter()
+        for sub in aprovadas:
+            carga[sub.id_profissional_substituto] += 1
+            carga[sub.id_profissional_solicitante] -= 1
+        acumular_deltas(db.session, {
+            Substituicao: Counter({"pendente": -len(aprovadas), "aprovado": len(aprovadas)}),
+            Escala: carga,
+        })
+        registrar_auditoria(db.session, Escala.__tablename__, [s.id_escala_original for s in aprovadas],
+                            "atualizado: id_profissional (substituição aprovada)")
+        marcar_alteradas(db.session, Escala.__tablename__, Substituicao.__tablename__)
+        marcar_agendas(db.session, {s.id_profissional_solicitante for s in aprovadas}
+                       | {s.id_profissional_substituto for s in aprovadas})
+    db.session.commit()
+    if aprovadas:
+        invalidar_indice()
+
+    return {
+        "aprovadas": [
+            {"id": s.id, "id_escala": s.id_escala_original, "id_profissional": s.id_profissional_substituto}
+            for s in sorted(aprovadas, key=lambda s: s.id)
+        ],
+        "conflitos": conflitos,
+    }
+
+
+def aprovar(itens, usuario):
+    """Aprova as substituições `itens` ({id: versão}) passando cada escala ao substituto.
+
+    Retorna {"aprovadas": [...], "conflitos": [{"id", "motivo"}]}.
+    """
+    try:
+        return _aprovar_lote(itens, usuario)
+    except DBAPIError as e:
+        if getattr(e.orig, "pgcode", None) not in _REPETIR_ITEM_A_ITEM:
+            raise
+        db.session.rollback()
+
+    # Um item do lote violou a restrição de exclusão (ou houve impasse):
+    # repete um a um para isolar os problemáticos
+    resultado = {"aprovadas": [], "conflitos": []}
+    for id_, versao in itens.items():
+        try:
+            parcial = _aprovar_lote({id_: versao}, usuario)
+        except DBAPIError as e:
+            motivo = _REPETIR_ITEM_A_ITEM.get(getattr(e.orig, "pgcode", None))
+            if motivo is None:
+                raise
+            db.session.rollback()
+            parcial = {"aprovadas": [], "conflitos": [{"id": id_, "motivo": motivo}]}
+        resultado["aprovadas"] += parcial["aprovadas"]
+        resultado["conflitos"] += parcial["conflitos"]
+    return resultado
+
+
+def recusar(itens, usuario):
+    """Recusa as substituições `itens` ({id: versão}).
+
+    Retorna {"recusadas": [ids], "conflitos": [{"id", "motivo"}]}.
+    """
+    agora = datetime.utcnow()
+    validas, conflitos = _travar(itens, usuario, agora)
+    if validas:
+        _registrar_decisao(validas, "recusado", usuario, agora)
+        acumular_deltas(db.session, {
+            Substituicao: Counter({"pendente": -len(validas), "recusado": len(validas)}),
+        })
+        marcar_alteradas(db.session, Substituicao.__tablename__)
+        marcar_agendas(db.session, {s.id_profissional_solicitante for s in validas})  # sem troca pendente
+    db.session.commit()
+    return {"recusadas": sorted(s.id for s in validas), "conflitos": conflitos}
@@ -0,0 +1,104 @@
+# ============================================================
+# 🕵️ Serviço — Trilha de Auditoria
+# ============================================================
+# Registra automaticamente inclusões, alterações e exclusões de
+# Profissional, Plantao, Escala e Substituicao:
+#   • after_flush acumula os registros em session.info (nenhuma
+#     escrita extra por objeto);
+#   • before_commit grava tudo com UM INSERT de várias linhas;
+#   • after_rollback descarta o que não foi confirmado.
+# Vocabulário da trilha (o mesmo da carga inicial, escala360.sql):
+# entidade no singular ('escala') e ação no particípio ('criado',
+# 'atualizado: campos', 'excluido', 'aprovado'...).
+# Gravações em lote fora do ORM usam registrar_auditoria().
+# ============================================================
+
+from datetime import datetime
+
+from flask import has_request_context, request
+from sqlalchemy import event, inspect, insert
+from sqlalchemy.orm import Session
+
+from ..models import Auditoria, Escala, Plantao, Profissional, Substituicao
+
+AUDITADOS = (Profissional, Plantao, Escala, Substituicao)
+
+# Tabela -> nome da entidade na trilha
+ENTIDADES = {
+    "profissionais": "profissional",
+    "plantoes": "plantao",
+    "escalas": "escala",
+    "substituicoes": "substituicao",
+}
+
+# Controle otimista: muda em toda atualização, não é um campo alterado pelo usuário
+_IGNORADOS = {"versao"}
+
+_CHAVE = "auditoria_pendente"
+
+
+def usuario_atual():
+    """Usuário informado no cabeçalho X-Usuario ('anonimo' sem ele; 'sistema' fora de requisições)."""
+    if has_request_context():
+        return request.headers.get("X-Usuario") or "anonimo"
+    return "sistema"
+
+
+def _pendentes(session):
+    return session.info.setdefault(_CHAVE, [])
+
+
+def registrar_auditoria(session, tabela, ids, acao):
+    """Acrescenta registros das linhas `ids` de `tabela` ao buffer da transação (gravados no commit)."""
+    agora, usuario = datetime.utcnow(), usuario_atual()
+    _pendentes(session).extend(
+        {"entidade": ENTIDADES[tabela], "id_entidade": i, "acao": acao, "usuario": usuario, "data_hora": agora}
+        for i in ids
+    )
+
+
+def _campos_alterados(obj):
+    estado = inspect(obj)
+    return [
+        atributo.key
+        for atributo in estado.mapper.column_attrs
+        if atributo.key not in _IGNORADOS and estado.attrs[atributo.key].history.has_changes()
+    ]
+
+
+@event.listens_for(Session, "after_flush")
+def _acumular(session, flush_context):
+    registros = []
+    for obj in session.new:
+        if isinstance(obj, AUDITADOS):
+            registros.append((ENTIDADES[obj.__tablename__], obj.id, "criado"))
+    for obj in session.dirty:
+        if isinstance(obj, AUDITADOS):
+            campos = _campos_alterados(obj)
+            if campos:
+                registros.append((ENTIDADES[obj.__tablename__], obj.id, f"atualizado: {', '.join(campos)}"[:100]))
+    for obj in session.deleted:
+        if isinstance(obj, AUDITADOS):
+            registros.append((ENTIDADES[obj.__tablename__], obj.id, "excluido"))
+
+    if registros:
+        agora, usuario = datetime.utcnow(), usuario_atual()
+        _pendentes(session).extend(
+            {"entidade": e, "id_entidade": i, "acao": a, "usuario": usuario, "data_hora": agora}
+            for e, i, a in registros
+        )
+
+
+@event.listens_for(Session, "before_commit")
+def _gravar(session):
+    # O commit só faz o flush final depois deste evento: antecipa-o
+    # para que as últimas mudanças também entrem no buffer.
+    session.flush()
+    registros = session.info.pop(_CHAVE, None)
+    if registros:
+        session.connection().execute(insert(Auditoria.__table__).values(registros))
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar(session):
+    session.info.pop(_CHAVE, None)
@@ -0,0 +1,442 @@
+# ============================================================
+# ⏱️ Serviço — Benchmark das Rotas (ponta a ponta)
+# ============================================================
+# Mede as rotas da aplicação sobre o banco atual (em geral
+# populado com `flask dados gerar`):
+#   1. cliente de teste do Flask: cada rota é executada N vezes
+#      (após o aquecimento) e reporta p50/p99 da latência,
+#      comandos SQL por requisição (eventos do SQLAlchemy) e o pico
+#      de memória alocada (tracemalloc, em uma execução à parte);
+#   2. carga concorrente (opcional) contra o gunicorn — iniciado
+#      aqui ou já em execução (--url): clientes em threads com
+#      conexões keep-alive percorrem as rotas por um tempo fixo;
+#      reporta p50/p99 por rota, vazão, erros e a memória (RSS)
+#      do mestre e de cada worker;
+#   3. baseline: o resultado pode ser gravado em JSON e as
+#      execuções seguintes são comparadas a ele (regressão de
+#      latência acima da tolerância, qualquer comando SQL a mais,
+#      pico de memória). Só faz sentido comparar com o mesmo
+#      volume de dados e a mesma máquina.
+# As rotas que gravam ficam de fora (mudariam os dados entre as
+# execuções); o preenchimento de vagas roda em simulação.
+# Exposto em `flask diagnostico benchmark`.
+# ============================================================
+
+import http.client
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+from sqlalchemy import event, text
+
+from .. import db
+
+try:
+    import resource  # indisponível no Windows
+except ImportError:
+    resource = None
+
+# Nome -> (método, caminho, corpo JSON); {inicio}, {mes}, ... vêm de _parametros()
+ROTAS = {
+    "painel": ("GET", "/", None),
+    "profissionais": ("GET", "/profissionais/", None),
+    "profissionais por cargo": ("GET", "/profissionais/?cargo=Enfermeiro", None),
+    "plantões": ("GET", "/plantoes/", None),
+    "plantões por período": ("GET", "/plantoes/?data_inicio={inicio}&data_fim={fim}", None),
+    "escalas": ("GET", "/escalas/", None),
+    "escalas por período": ("GET", "/escalas/?data_inicio={inicio}&data_fim={fim}", None),
+    "escalas por cargo": ("GET", "/escalas/?cargo=Enfermeiro", None),
+    "substituições": ("GET", "/substituicoes/", None),
+    "substituições pendentes": ("GET", "/substituicoes/?status=pendente", None),
+    "api substituições pendentes": ("GET", "/api/substituicoes?status=pendente", None),
+    "api substituições por profissional": ("GET", "/api/substituicoes?id_profissional={profissional}", None),
+    # Sem filtros a rota transmite a tabela inteira
+    "api substituições (todas)": ("GET", "/api/substituicoes", None),
+    "exportação do mês": ("GET", "/api/escalas/exportar?mes={mes}", None),
+    "auditoria por registro": ("GET", "/api/auditoria?entidade=escala&id_entidade={escala}", None),
+    "auditoria do dia": ("GET", "/api/auditoria?inicio={inicio}T00:00:00&fim={inicio}T23:59:59", None),
+    "conflitos da semana": ("GET", "/api/escalas/conflitos?inicio={inicio}&fim={fim}", None),
+    "sugestão de substitutos": (
+        "GET", "/api/substituicoes/sugerir?id_solicitante={profissional}&id_plantao={plantao}", None,
+    ),
+    "preenchimento (simulação)": (
+        "POST", "/api/escalas/preencher-vagas", {"inicio": "{inicio}", "fim": "{fim}", "simular": True},
+    ),
+}
+
+TABELAS = ("profissionais", "plantoes", "escalas", "substituicoes", "auditoria")
+
+# Diferenças abaixo destes pisos são ruído, qualquer que seja a tolerância
+PISO_MS = 2.0
+PISO_MEMORIA_KB = 256
+
+
+# ------------------------------------------------------------
+# 🔹 Preparação
+# ------------------------------------------------------------
+def _parametros():
+    """Valores reais do banco para as rotas: uma semana no meio do período dos plantões."""
+    meio = db.session.execute(text(
+        "SELECT min(data) + (max(data) - min(data)) / 2 FROM plantoes"
+    )).scalar()
+    if meio is None:
+        raise RuntimeError("Não há plantões no banco; popule-o com `flask dados gerar`.")
+    linha = db.session.execute(text("""
+        SELECT e.id, e.id_profissional, e.id_plantao, e.data_plantao
+          FROM escalas e
+         WHERE e.data_plantao >= :meio AND e.status = 'ativo'
+         ORDER BY e.data_plantao, e.id
+         LIMIT 1
+    """), {"meio": meio}).one()
+    db.session.rollback()
+    return {
+        "inicio": linha.data_plantao.isoformat(),
+        "fim": (linha.data_plantao + timedelta(days=6)).isoformat(),
+        "mes": f"{linha.data_plantao:%Y-%m}",
+        "escala": linha.id,
+        "profissional": linha.id_profissional,
+        "plantao": linha.id_plantao,
+    }
+
+
+def _resolver(filtro, parametros):
+    """[(nome, método, caminho, corpo)] das rotas selecionadas, com os parâmetros aplicados."""
+    rotas = []
+    for nome, (metodo, caminho, corpo) in ROTAS.items():
+        if filtro and not any(f.lower() in nome.lower() for f in filtro):
+            continue
+        if corpo is not None:
+            corpo = {c: v.format(**parametros) if isinstance(v, str) else v for c, v in corpo.items()}
+        rotas.append((nome, metodo, caminho.format(**parametros), corpo))
+    if not rotas:
+        raise ValueError(f"Nenhuma rota corresponde a {', '.join(filtro)}.")
+    return rotas
+
+
+def volume():
+    """Linhas por tabela (o baseline só vale para o mesmo volume)."""
+    contagens = {t: db.session.execute(text(f"SELECT COUNT(*) FROM {t}")).scalar() for t in TABELAS}
+    db.session.rollback()
+    return contagens
+
+
+def _percentil(valores, p):
+    """Percentil pelo posto mais próximo (valores já ordenados)."""
+    if not valores:
+        return None
+    return valores[min(len(valores) - 1, max(0, round(p / 100 * len(valores) + 0.5) - 1))]
+
+
+def _resumo_latencias(segundos):
+    ms = sorted(s * 1000 for s in segundos)
+    return {
+        "p50_ms": round(_percentil(ms, 50), 2),
+        "p99_ms": round(_percentil(ms, 99), 2),
+        "max_ms": round(ms[-1], 2),
+        "n": len(ms),
+    }
+
+
+# ------------------------------------------------------------
+# 🔹 1. Cliente de teste
+# ------------------------------------------------------------
+def medir_rotas(app, rotas, repeticoes=20, aquecimento=2, com_cache=False):
+    """Executa as rotas no processo e retorna {nome: latências, SQL e memória}.
+
+    Sem `com_cache` o cache de respostas é esvaziado antes de cada
+    requisição (mede a consulta e a renderização, não o cache).
+    """
+    from ..cache import respostas
+
+    comandos = [0]
+
+    def _contar(conn, cursor, statement, parameters, context, executemany):
+        comandos[0] += 1
+
+    def _executar(cliente, metodo, caminho, corpo):
+        if not com_cache:
+            respostas.limpar()
+        comandos[0] = 0
+        inicio = time.perf_counter()
+        resposta = cliente.open(caminho, method=metodo, json=corpo)
+        tamanho = len(resposta.get_data())  # consome respostas transmitidas em blocos
+        resposta.close()
+        duracao = time.perf_counter() - inicio
+        if resposta.status_code >= 400:
+            raise RuntimeError(f"{metodo} {caminho} retornou {resposta.status_code}")
+        return duracao, comandos[0], tamanho
+
+    # Todas as engines: com réplicas configuradas, os GETs leem delas
+    for engine in db.engines.values():
+        event.listen(engine, "before_cursor_execute", _contar)
+    resultado = {}
+    try:
+        cliente = app.test_client()
+        for nome, metodo, caminho, corpo in rotas:
+            tempos, sql = [], []
+            for n in range(aquecimento + repeticoes):
+                duracao, total_sql, tamanho = _executar(cliente, metodo, caminho, corpo)
+                if n >= aquecimento:
+                    tempos.append(duracao)
+                    sql.append(total_sql)
+
+            # Memória em uma execução à parte: o tracemalloc deixa tudo mais lento
+            tracemalloc.start()
+            try:
+                _executar(cliente, metodo, caminho, corpo)
+                _, pico = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+
+            sql.sort()
+            resultado[nome] = {
+                **_resumo_latencias(tempos),
+                "consultas": sql[len(sql) // 2],
+                "consultas_max": sql[-1],
+                "bytes": tamanho,
+                "memoria_pico_kb": round(pico / 1024),
+            }
+    finally:
+        for engine in db.engines.values():
+            event.remove(engine, "before_cursor_execute", _contar)
+    return resultado
+
+
+# ------------------------------------------------------------
+# 🔹 2. Carga concorrente (gunicorn)
+# ------------------------------------------------------------
+def _rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as arquivo:
+            for linha in arquivo:
+                if linha.startswith("VmRSS:"):
+                    return int(linha.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _filhos(pid):
+    filhos = []
+    for entrada in os.listdir("/proc"):
+        if not entrada.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entrada}/stat", encoding="ascii", errors="replace") as arquivo:
+                # pid (comando) estado ppid ...: o comando pode conter espaços
+                if int(arquivo.read().rpartition(")")[2].split()[1]) == pid:
+                    filhos.append(int(entrada))
+        except (OSError, ValueError, IndexError):
+            continue
+    return filhos
+
+
+def memoria_do_servidor(pid):
+    """RSS do mestre e de cada worker (Linux, via /proc); None em outros sistemas."""
+    if not os.path.isdir("/proc"):
+        return None
+    return {"mestre_kb": _rss_kb(pid), "workers_kb": sorted(filter(None, map(_rss_kb, _filhos(pid))))}
+
+
+@contextmanager
+def servidor_gunicorn(raiz, workers=4, threads=8, porta=8765, espera_s=60):
+    """Inicia `gunicorn main:app` (gthread) em 127.0.0.1:`porta`; produz (url, pid)."""
+    if importlib.util.find_spec("gunicorn") is None:
+        raise RuntimeError("gunicorn não está instalado (pip install gunicorn).")
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "main:app", "-b", f"127.0.0.1:{porta}",
+         "-w", str(workers), "-k", "gthread", "--threads", str(threads), "--log-level", "warning"],
+        cwd=raiz,
+    )
+    url = f"http://127.0.0.1:{porta}"
+    try:
+        limite = time.monotonic() + espera_s
+        while True:
+            if processo.poll() is not None:
+                raise RuntimeError(f"gunicorn encerrou na subida (código {processo.returncode}).")
+            try:
+                conexao = http.client.HTTPConnection("127.0.0.1", porta, timeout=5)
+                conexao.request("GET", "/profissionais/")
+                conexao.getresponse().read()
+                conexao.close()
+                break
+            except OSError:
+                if time.monotonic() > limite:
+                    raise RuntimeError(f"gunicorn não respondeu em {espera_s} s.")
+                time.sleep(0.2)
+        yield url, processo.pid
+    finally:
+        processo.terminate()
+        try:
+            processo.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            processo.kill()
+            processo.wait()
+
+
+def carga(url, rotas, concorrencia=16, duracao_s=30):
+    """Dispara `concorrencia` clientes contra `url` por `duracao_s` segundos.
+
+    Cada cliente percorre as rotas em sequência (a partir de uma rota
+    diferente) sobre uma conexão keep-alive. Retorna vazão, erros e
+    p50/p99 por rota.
+    """
+    alvo = urlsplit(url)
+    prefixo = alvo.path.rstrip("/")
+    medidas = {nome: [] for nome, *_ in rotas}
+    erros = {nome: 0 for nome, *_ in rotas}
+    lock = threading.Lock()
+    fim = time.monotonic() + duracao_s
+
+    def _cliente(deslocamento):
+        conexao = None
+        locais, falhas = [], []
+        j = deslocamento
+        while time.monotonic() < fim:
+            nome, metodo, caminho, corpo = rotas[j % len(rotas)]
+            j += 1
+            if conexao is None:
+                conexao = http.client.HTTPConnection(alvo.hostname, alvo.port or 80, timeout=120)
+            cabecalhos, dados = {}, None
+            if corpo is not None:
+                dados = json.dumps(corpo).encode()
+                cabecalhos["Content-Type"] = "application/json"
+            inicio = time.perf_counter()
+            try:
+                conexao.request(metodo, prefixo + caminho, body=dados, headers=cabecalhos)
+                resposta = conexao.getresponse()
+                resposta.read()
+                ok = resposta.status < 400
+            except (OSError, http.client.HTTPException):
+                conexao.close()
+                conexao = None
+                ok = False
+            duracao = time.perf_counter() - inicio
+            (locais if ok else falhas).append((nome, duracao))
+        if conexao is not None:
+            conexao.close()
+        with lock:
+            for nome, duracao in locais:
+                medidas[nome].append(duracao)
+            for nome, _ in falhas:
+                erros[nome] += 1
+
+    inicio = time.monotonic()
+    clientes = [threading.Thread(target=_cliente, args=(i,), daemon=True) for i in range(concorrencia)]
+    for cliente in clientes:
+        cliente.start()
+    for cliente in clientes:
+        cliente.join()
+    decorrido = time.monotonic() - inicio
+
+    total = sum(len(m) for m in medidas.values())
+    return {
+        "concorrencia": concorrencia,
+        "duracao_s": round(decorrido, 1),
+        "requisicoes": total,
+        "vazao_rps": round(total / decorrido, 1),
+        "erros": sum(erros.values()),
+        "rotas": {
+            nome: {**(_resumo_latencias(m) if m else {"n": 0}), "erros": erros[nome]}
+            for nome, m in medidas.items()
+        },
+    }
+
+
+# ------------------------------------------------------------
+# 🔹 Execução completa e baseline
+# ------------------------------------------------------------
+def executar_benchmark(app, filtro=None, repeticoes=20, aquecimento=2, com_cache=False,
+                       concorrencia=0, duracao_s=30, url=None, workers=4, threads=8, porta=8765):
+    """Cliente de teste e, com `concorrencia` > 0, carga no gunicorn (ou em `url`)."""
+    parametros = _parametros()
+    rotas = _resolver(filtro, parametros)
+    resultado = {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "maquina": f"{platform.node()} / Python {platform.python_version()}",
+        "volume": volume(),
+        "parametros": parametros,
+        "rotas": medir_rotas(app, rotas, repeticoes=repeticoes, aquecimento=aquecimento, com_cache=com_cache),
+        "rss_pico_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None,
+        "carga": None,
+    }
+    if concorrencia > 0:
+        if url:
+            resultado["carga"] = {**carga(url, rotas, concorrencia, duracao_s), "servidor": url, "memoria": None}
+        else:
+            raiz = os.path.dirname(app.root_path)
+            with servidor_gunicorn(raiz, workers=workers, threads=threads, porta=porta) as (endereco, pid):
+                medida = carga(endereco, rotas, concorrencia, duracao_s)
+                resultado["carga"] = {**medida, "servidor": f"gunicorn {workers}×{threads} (gthread)",
+                                      "memoria": memoria_do_servidor(pid)}
+    return resultado
+
+
+def ler_baseline(caminho):
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, encoding="utf-8") as arquivo:
+        return json.load(arquivo)
+
+
+def salvar_baseline(caminho, resultado):
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        json.dump(resultado, arquivo, ensure_ascii=False, indent=2, default=str)
+        arquivo.write("\n")
+
+
+def _piorou(atual, anterior, tolerancia, piso):
+    return atual > anterior * (1 + tolerancia) and atual - anterior > piso
+
+
+def comparar(resultado, baseline, tolerancia=0.25):
+    """Regressões em relação ao baseline: [{"rota", "medida", "baseline", "atual"}].
+
+    Latência e memória pioram além da tolerância (e dos pisos de
+    ruído); qualquer comando SQL a mais por requisição é regressão.
+    Levanta ValueError se o volume de dados for outro.
+    """
+    if baseline["volume"] != resultado["volume"]:
+        raise ValueError(f"Volume diferente do baseline ({baseline['volume']}); gere os mesmos dados "
+                         f"(flask dados gerar --limpar com as mesmas --linhas e --semente).")
+    regressoes = []
+
+    def _registrar(rota, medida, anterior, atual):
+        regressoes.append({"rota": rota, "medida": medida, "baseline": anterior, "atual": atual})
+
+    for rota, atual in resultado["rotas"].items():
+        anterior = baseline["rotas"].get(rota)
+        if anterior is None:
+            continue
+        for medida in ("p50_ms", "p99_ms"):
+            if _piorou(atual[medida], anterior[medida], tolerancia, PISO_MS):
+                _registrar(rota, medida, anterior[medida], atual[medida])
+        if atual["consultas"] > anterior["consultas"]:
+            _registrar(rota, "consultas", anterior["consultas"], atual["consultas"])
+        if _piorou(atual["memoria_pico_kb"], anterior["memoria_pico_kb"], tolerancia, PISO_MEMORIA_KB):
+            _registrar(rota, "memoria_pico_kb", anterior["memoria_pico_kb"], atual["memoria_pico_kb"])
+
+    carga_atual, carga_anterior = resultado.get("carga"), baseline.get("carga")
+    if carga_atual and carga_anterior and carga_atual["concorrencia"] == carga_anterior["concorrencia"]:
+        if carga_atual["vazao_rps"] < carga_anterior["vazao_rps"] * (1 - tolerancia):
+            _registrar("carga", "vazao_rps", carga_anterior["vazao_rps"], carga_atual["vazao_rps"])
+        if carga_atual["erros"] > carga_anterior["erros"]:
+            _registrar("carga", "erros", carga_anterior["erros"], carga_atual["erros"])
+        for rota, atual in carga_atual["rotas"].items():
+            anterior = carga_anterior["rotas"].get(rota)
+            if not anterior or not atual["n"] or not anterior["n"]:
+                continue
+            for medida in ("p50_ms", "p99_ms"):
+                if _piorou(atual[medida], anterior[medida], tolerancia, PISO_MS):
+                    _registrar(f"carga: {rota}", medida, anterior[medida], atual[medida])
+    return regressoes
@@ -0,0 +1,70 @@
+# ============================================================
+# ⚠️ Serviço — Varredura de Conflitos de Escala
+# ============================================================
+# Encontra profissionais escalados em plantões sobrepostos
+# (double-booking) em qualquer período, com UMA consulta e um
+# algoritmo de linha de varredura (sweep-line): as alocações de
+# cada profissional são ordenadas por início e um heap guarda
+# as que ainda estão em andamento — O(n log n + conflitos).
+# ============================================================
+
+import heapq
+from collections import defaultdict
+from datetime import timedelta
+
+from .. import db
+from ..models import Escala, Plantao, Profissional
+from .substitutos import intervalo_do_plantao
+
+
+def varrer_conflitos(inicio, fim):
+    """Retorna os pares de escalas ativas sobrepostas com início da sobreposição no período."""
+    linhas = db.session.execute(
+        db.select(
+            Escala.id,
+            Escala.id_profissional,
+            Profissional.nome,
+            Plantao.id,
+            Plantao.data,
+            Plantao.hora_inicio,
+            Plantao.hora_fim,
+        )
+        .join(Escala.plantao)
+        .join(Profissional, Profissional.id == Escala.id_profissional)
+        .where(
+            Escala.status == "ativo",
+            # Um dia antes: plantões noturnos que atravessam a meia-noite
+            Plantao.data.between(inicio - timedelta(days=1), fim),
+            # Mesmo filtro na chave de partição: só os meses do período são lidos
+            Escala.data_plantao.between(inicio - timedelta(days=1), fim),
+        )
+    )
+
+    por_profissional = defaultdict(list)
+    nomes = {}
+    for id_escala, id_prof, nome, id_plantao, data, hora_inicio, hora_fim in linhas:
+        ini, f = intervalo_do_plantao(data, hora_inicio, hora_fim)
+        por_profissional[id_prof].append((ini, f, id_escala, id_plantao))
+        nomes[id_prof] = nome
+
+    conflitos = []
+    for id_prof, intervalos in por_profissional.items():
+        intervalos.sort()
+        em_andamento = []  # heap de (fim, id_escala, início, id_plantao)
+        for ini, f, id_escala, id_plantao in intervalos:
+            while em_andamento and em_andamento[0][0] <= ini:
+                heapq.heappop(em_andamento)
+            if ini.date() >= inicio:
+                for f2, id_escala2, ini2, id_plantao2 in em_andamento:
+                    conflitos.append({
+                        "id_profissional": id_prof,
+                        "nome": nomes[id_prof],
+                        "escala_a": {"id": id_escala2, "id_plantao": id_plantao2,
+                                     "inicio": ini2.isoformat(), "fim": f2.isoformat()},
+                        "escala_b": {"id": id_escala, "id_plantao": id_plantao,
+                                     "inicio": ini.isoformat(), "fim": f.isoformat()},
+                    })
+            heapq.heappush(em_andamento, (f, id_escala, ini, id_plantao))
+
+    conflitos.sort(key=lambda c: (c["escala_b"]["inicio"], c["id_profissional"]))
+    return conflitos
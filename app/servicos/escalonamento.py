@@ -0,0 +1,273 @@
+# ============================================================
+# 🗓️ Serviço — Preenchimento Automático de Plantões Vagos
+# ============================================================
+# Aloca, em uma única passada, todos os plantões vagos de um
+# período. Os plantões são agrupados em blocos que se sobrepõem
+# dois a dois (todos ocupam um mesmo instante) e cada bloco é
+# resolvido como um problema de atribuição de custo mínimo
+# (algoritmo húngaro), onde o custo é a carga atual do
+# profissional — o que equilibra a escala. Os blocos seguem em
+# ordem de horário: as alocações de um bloco entram no índice de
+# conflitos antes do próximo, então quem está livre de manhã e à
+# noite pode receber os dois plantões.
+# O resultado é gravado com um único INSERT em lote.
+# ============================================================
+
+import time
+from collections import Counter, defaultdict
+from datetime import date
+
+from sqlalchemy import insert, text
+
+from .. import db
+from ..cache import marcar_alteradas
+from ..models import Escala, Plantao, Profissional
+from .auditoria import registrar_auditoria
+from .resumos import acumular_deltas
+from .agendas import marcar_agendas
+from .substitutos import IndiceAlocacoes, intervalo_do_plantao, invalidar_indice
+
+# Custos auxiliares da matriz de atribuição
+CUSTO_VAGO = 10**6       # deixar o plantão sem profissional
+CUSTO_PROIBIDO = 10**9   # par incompatível (cargo, conflito de horário)
+
+# Plantões por matriz do húngaro (O(n²·m) em Python puro); blocos maiores são divididos
+BLOCO_MAXIMO = 100
+
+
+# ------------------------------------------------------------
+# 🔹 Algoritmo húngaro (atribuição de custo mínimo)
+# ------------------------------------------------------------
+def _hungaro(custos):
+    """Resolve a atribuição mínima de uma matriz n x m (n <= m).
+
+    Retorna, para cada linha, o índice da coluna escolhida.
+    """
+    n, m = len(custos), len(custos[0])
+    u, v = [0] * (n + 1), [0] * (m + 1)
+    p, caminho = [0] * (m + 1), [0] * (m + 1)
+
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = [float("inf")] * (m + 1)
+        usado = [False] * (m + 1)
+        while True:
+            usado[j0] = True
+            i0 = p[j0]
+            linha = custos[i0 - 1]
+            delta, j1 = float("inf"), 0
+            for j in range(1, m + 1):
+                if not usado[j]:
+                    atual = linha[j - 1] - u[i0] - v[j]
+                    if atual < minv[j]:
+                        minv[j] = atual
+                        caminho[j] = j0
+                    if minv[j] < delta:
+                        delta, j1 = minv[j], j
+            for j in range(m + 1):
+                if usado[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = caminho[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    escolha = [-1] * n
+    for j in range(1, m + 1):
+        if p[j]:
+            escolha[p[j] - 1] = j - 1
+    return escolha
+
+
+# ------------------------------------------------------------
+# 🔹 Consultas de apoio (número fixo de round-trips)
+# ------------------------------------------------------------
+def plantoes_vagos(inicio, fim):
+    """Plantões do período sem nenhuma escala ativa."""
+    ocupado = (
+        db.select(Escala.id)
+        .where(
+            Escala.id_plantao == Plantao.id,
+            Escala.data_plantao == Plantao.data,
+            Escala.data_plantao.between(inicio, fim),  # só as partições do período
+            Escala.status == "ativo",
+        )
+        .exists()
+    )
+    return db.session.execute(
+        db.select(Plantao.id, Plantao.data, Plantao.hora_inicio, Plantao.hora_fim, Plantao.id_funcao)
+        .where(Plantao.data.between(inicio, fim), ~ocupado)
+        .order_by(Plantao.data, Plantao.hora_inicio, Plantao.id)
+    ).all()
+
+
+def cargos_por_funcao(mapa_config=None):
+    """Cargos compatíveis com cada função de plantão.
+
+    Usa o mapeamento configurado (FUNCOES_CARGOS) e, para funções sem
+    mapeamento, os cargos que já atuaram naquela função.
+    """
+    mapa = defaultdict(set)
+    for id_funcao, cargos in (mapa_config or {}).items():
+        mapa[int(id_funcao)].update(cargos)
+    configuradas = set(mapa)
+
+    historico = db.session.execute(
+        db.select(Plantao.id_funcao, Profissional.cargo)
+        .join(Escala, Escala.id_plantao == Plantao.id)
+        .join(Profissional, Profissional.id == Escala.id_profissional)
+        .group_by(Plantao.id_funcao, Profissional.cargo)
+    )
+    for id_funcao, cargo in historico:
+        if id_funcao not in configuradas:
+            mapa[id_funcao].add(cargo)
+    return mapa
+
+
+# ------------------------------------------------------------
+# 🔹 Planejamento
+# ------------------------------------------------------------
+def _blocos_sobrepostos(vagos, maximo=BLOCO_MAXIMO):
+    """Agrupa, em ordem de início, plantões que se sobrepõem dois a dois.
+
+    Intervalos se sobrepõem dois a dois quando o maior início é anterior
+    ao menor fim: o bloco cresce enquanto o próximo plantão começa antes
+    do fim mais próximo do bloco, até `maximo` plantões.
+    """
+    blocos, bloco, menor_fim = [], [], None
+    for plantao in sorted(vagos, key=lambda p: p[1]):
+        inicio, fim = plantao[1]
+        if bloco and (inicio >= menor_fim or len(bloco) >= maximo):
+            blocos.append(bloco)
+            bloco, menor_fim = [], None
+        bloco.append(plantao)
+        menor_fim = fim if menor_fim is None else min(menor_fim, fim)
+    if bloco:
+        blocos.append(bloco)
+    return blocos
+
+
+def planejar_preenchimento(inicio, fim, mapa_config=None):
+    """Calcula um conjunto de alocações sem conflito para os plantões vagos.
+
+    Dentro de cada bloco de plantões simultâneos, cada profissional recebe
+    no máximo um plantão; o custo de cada par é a carga acumulada do
+    profissional, de modo que o plano distribui os plantões de forma
+    equilibrada. Retorna um dicionário com `alocacoes` e `vagos`.
+    """
+    t0 = time.perf_counter()
+    vagos = plantoes_vagos(inicio, fim)
+    compativeis = cargos_por_funcao(mapa_config)
+
+    profissionais = db.session.execute(
+        db.select(Profissional.id, Profissional.nome, Profissional.cargo)
+        .where(Profissional.ativo.is_(True))
+        .order_by(Profissional.id)
+    ).all()
+    por_cargo = defaultdict(list)
+    for prof in profissionais:
+        por_cargo[prof.cargo].append(prof)
+
+    # Índice próprio (não compartilhado): conflitos com o que já está alocado
+    # e com o planejado nos blocos anteriores; indice.carga acompanha o plano
+    indice = IndiceAlocacoes.carregar(db.session)
+    carga = indice.carga
+
+    plantoes = [
+        (p.id, intervalo_do_plantao(p.data, p.hora_inicio, p.hora_fim), p.id_funcao)
+        for p in vagos
+    ]
+
+    alocacoes, sem_profissional = [], []
+    for bloco in _blocos_sobrepostos(plantoes):
+        # Candidatos viáveis de cada plantão do bloco
+        viaveis = []
+        for id_plantao, (ini, f), id_funcao in bloco:
+            candidatos = {
+                prof.id: prof
+                for cargo in compativeis.get(id_funcao, ())
+                for prof in por_cargo.get(cargo, ())
+                if not indice.conflita(prof.id, ini, f)
+            }
+            viaveis.append(candidatos)
+
+        # Basta manter os n candidatos mais baratos de cada plantão: em uma
+        # atribuição ótima, quem usa outro pode trocar por um desses livre
+        n = len(bloco)
+        colunas = sorted({
+            id_prof
+            for candidatos in viaveis
+            for id_prof in sorted(candidatos, key=lambda c: (carga[c], c))[:n]
+        })
+        # Uma coluna "vago" por plantão garante solução mesmo sem candidatos
+        custos = []
+        for linha, candidatos in enumerate(viaveis):
+            custos.append(
+                [carga[c] if c in candidatos else CUSTO_PROIBIDO for c in colunas]
+                + [CUSTO_VAGO if k == linha else CUSTO_PROIBIDO for k in range(n)]
+            )
+
+        escolha = _hungaro(custos)
+        for (id_plantao, (ini, f), _), candidatos, col in zip(bloco, viaveis, escolha):
+            if col < len(colunas) and colunas[col] in candidatos:
+                prof = candidatos[colunas[col]]
+                indice.adicionar(prof.id, ini, f)  # também soma à carga
+                alocacoes.append({
+                    "id_plantao": id_plantao,
+                    "data": ini.date().isoformat(),
+                    "id_profissional": prof.id,
+                    "nome": prof.nome,
+                })
+            else:
+                motivo = "sem candidatos compatíveis" if not candidatos else "candidatos já alocados no horário"
+                sem_profissional.append({"id_plantao": id_plantao, "motivo": motivo})
+
+    return {
+        "alocacoes": alocacoes,
+        "vagos": sem_profissional,
+        "tempo_ms": round((time.perf_counter() - t0) * 1000, 1),
+    }
+
+
+def preencher_vagas(inicio, fim, mapa_config=None, simular=False):
+    """Planeja e grava (em um único INSERT em lote) as alocações dos plantões vagos."""
+    if not simular:
+        # Serializa execuções concorrentes para não alocar o mesmo plantão duas vezes
+        db.session.execute(text("SELECT pg_advisory_xact_lock(hashtext('escala360.preencher_vagas'))"))
+
+    plano = planejar_preenchimento(inicio, fim, mapa_config)
+
+    ids = []
+    if not simular and plano["alocacoes"]:
+        ids = db.session.execute(
+            insert(Escala).returning(Escala.id),
+            [
+                {
+                    "id_plantao": a["id_plantao"],
+                    "data_plantao": date.fromisoformat(a["data"]),
+                    "id_profissional": a["id_profissional"],
+                    "status": "ativo",
+                }
+                for a in plano["alocacoes"]
+            ],
+        ).scalars().all()
+        # INSERT em lote não dispara os eventos de flush: resumos, auditoria, versões e índice à parte
+        acumular_deltas(db.session, {Escala: Counter(a["id_profissional"] for a in plano["alocacoes"])})
+        registrar_auditoria(db.session, Escala.__tablename__, ids, "criado (preenchimento automático)")
+        marcar_alteradas(db.session, Escala.__tablename__)
+        marcar_agendas(db.session, {a["id_profissional"] for a in plano["alocacoes"]})
+        db.session.commit()
+        invalidar_indice()
+    elif not simular:
+        db.session.commit()  # libera o advisory lock
+
+    # Só há o que confirmar (201) se alguma escala foi de fato criada
+    plano["gravado"] = len(ids) > 0
+    return plano
@@ -0,0 +1,189 @@
+# ============================================================
+# 📤 Serviço — Exportação de Escalas (CSV / Parquet)
+# ============================================================
+# Exporta escalas ⨝ plantões ⨝ profissionais de um período (ex.:
+# o mês da folha de pagamento) sem carregar tudo em memória:
+# a consulta usa cursor no servidor (yield_per → stream_results)
+# e cada lote de linhas vira imediatamente um bloco de CSV ou um
+# row group do Parquet. O consumo de memória depende do tamanho
+# do lote, não do número de linhas.
+# Parquet depende do pacote opcional `pyarrow`.
+# ============================================================
+
+import csv
+import io
+from datetime import date, timedelta
+
+from .. import db
+from ..models import Escala, Plantao, Profissional
+from .substitutos import intervalo_do_plantao
+
+LINHAS_POR_LOTE = 5000
+
+COLUNAS = (
+    "id_escala",
+    "status",
+    "data_alocacao",
+    "id_plantao",
+    "data",
+    "hora_inicio",
+    "hora_fim",
+    "horas",
+    "id_funcao",
+    "id_local",
+    "id_profissional",
+    "nome",
+    "cargo",
+    "email",
+)
+
+FORMATOS = {
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+def periodo_do_mes(mes):
+    """'AAAA-MM' -> (primeiro dia, último dia)."""
+    inicio = date.fromisoformat(f"{mes}-01")
+    proximo = (inicio.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return inicio, proximo - timedelta(days=1)
+
+
+def consulta_exportacao(inicio, fim, id_local=None, cargo=None):
+    """Escalas dos plantões entre `inicio` e `fim` (inclusive), em ordem cronológica."""
+    consulta = (
+        db.select(
+            Escala.id,
+            Escala.status,
+            Escala.data_alocacao,
+            Plantao.id,
+            Plantao.data,
+            Plantao.hora_inicio,
+            Plantao.hora_fim,
+            Plantao.id_funcao,
+            Plantao.id_local,
+            Profissional.id,
+            Profissional.nome,
+            Profissional.cargo,
+            Profissional.email,
+        )
+        .join(Escala.plantao)
+        .join(Profissional, Profissional.id == Escala.id_profissional)
+        .where(Plantao.data.between(inicio, fim), Escala.data_plantao.between(inicio, fim))
+        .order_by(Plantao.data, Plantao.hora_inicio, Escala.id)
+    )
+    if id_local is not None:
+        consulta = consulta.where(Plantao.id_local == id_local)
+    if cargo:
+        consulta = consulta.where(Profissional.cargo == cargo)
+    return consulta
+
+
+def _lotes(consulta):
+    """Lotes de linhas na ordem de COLUNAS, lidos por cursor no servidor."""
+    resultado = db.session.execute(consulta.execution_options(yield_per=LINHAS_POR_LOTE))
+    for lote in resultado.partitions():
+        linhas = []
+        for (id_escala, status, alocacao, id_plantao, dia, hora_inicio, hora_fim,
+             id_funcao, id_local, id_prof, nome, cargo, email) in lote:
+            ini, f = intervalo_do_plantao(dia, hora_inicio, hora_fim)
+            horas = round((f - ini).total_seconds() / 3600, 2)
+            linhas.append((id_escala, status, alocacao, id_plantao, dia, hora_inicio, hora_fim,
+                           horas, id_funcao, id_local, id_prof, nome, cargo, email))
+        yield linhas
+
+
+# ------------------------------------------------------------
+# 🔹 CSV
+# ------------------------------------------------------------
+def gerar_csv(consulta):
+    """Gera o CSV (com cabeçalho) em blocos de texto, um por lote."""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(COLUNAS)
+    for linhas in _lotes(consulta):
+        escritor.writerows(linhas)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+# ------------------------------------------------------------
+# 🔹 Parquet
+# ------------------------------------------------------------
+def parquet_disponivel():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class _SaidaEmBlocos(io.RawIOBase):
+    """Arquivo só de escrita que acumula os bytes até serem retirados."""
+
+    def __init__(self):
+        self._blocos = []
+        self._posicao = 0
+
+    def writable(self):
+        return True
+
+    def write(self, dados):
+        self._blocos.append(bytes(dados))
+        self._posicao += len(dados)
+        return len(dados)
+
+    def tell(self):
+        return self._posicao
+
+    def retirar(self):
+        dados = b"".join(self._blocos)
+        self._blocos.clear()
+        return dados
+
+
+def gerar_parquet(consulta):
+    """Gera o Parquet em blocos de bytes: cada lote vira um row group colunar."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    esquema = pa.schema([
+        ("id_escala", pa.int32()),
+        ("status", pa.string()),
+        ("data_alocacao", pa.timestamp("us")),
+        ("id_plantao", pa.int32()),
+        ("data", pa.date32()),
+        ("hora_inicio", pa.time64("us")),
+        ("hora_fim", pa.time64("us")),
+        ("horas", pa.float64()),
+        ("id_funcao", pa.int32()),
+        ("id_local", pa.int32()),
+        ("id_profissional", pa.int32()),
+        ("nome", pa.string()),
+        ("cargo", pa.string()),
+        ("email", pa.string()),
+    ])
+
+    saida = _SaidaEmBlocos()
+    with pq.ParquetWriter(saida, esquema, compression="snappy") as escritor:
+        for linhas in _lotes(consulta):
+            colunas = list(zip(*linhas))
+            escritor.write_table(pa.Table.from_arrays(
+                [pa.array(valores, type=campo.type) for valores, campo in zip(colunas, esquema)],
+                schema=esquema,
+            ))
+            yield saida.retirar()
+    # O rodapé (metadados) é gravado ao fechar o escritor
+    yield saida.retirar()
+
+
+def exportar(formato, inicio, fim, id_local=None, cargo=None):
+    """Retorna o gerador de blocos do formato pedido ('csv' ou 'parquet')."""
+    consulta = consulta_exportacao(inicio, fim, id_local, cargo)
+    if formato == "parquet":
+        return gerar_parquet(consulta)
+    return gerar_csv(consulta)
@@ -0,0 +1,417 @@
+# ============================================================
+# 📥 Serviço — Importação em Lote via COPY
+# ============================================================
+# Carrega arquivos CSV/JSONL de profissionais, plantões, escalas
+# e substituições:
+#   1. cada arquivo é transmitido (streaming) com COPY para uma
+#      tabela temporária de staging (stg_<tabela>);
+#   2. chaves duplicadas, chaves estrangeiras e conflitos de
+#      horário são validados de forma set-wise (poucas consultas);
+#   3. se não houver erros, tudo é mesclado nas tabelas reais
+#      em uma única transação (criando as partições mensais que
+#      faltarem para os plantões importados).
+# Opera sobre uma conexão psycopg2 (DB-API), para ser usado
+# tanto pela aplicação quanto pelo iniciar_database.py.
+# ============================================================
+
+import csv
+import io
+import json
+import time
+
+# Ordem de mesclagem (respeita as chaves estrangeiras)
+TABELAS = {
+    "profissionais": ("id", "nome", "cargo", "email", "telefone", "ativo"),
+    "plantoes": ("id", "data", "hora_inicio", "hora_fim", "id_funcao", "id_local"),
+    "escalas": ("id", "id_plantao", "id_profissional", "status", "data_alocacao"),
+    "substituicoes": (
+        "id",
+        "id_escala_original",
+        "id_profissional_solicitante",
+        "id_profissional_substituto",
+        "data_solicitacao",
+        "status",
+    ),
+}
+
+OBRIGATORIAS = {
+    "profissionais": ("nome", "cargo", "email"),
+    "plantoes": ("data", "hora_inicio", "hora_fim", "id_funcao", "id_local"),
+    "escalas": ("id_plantao", "id_profissional"),
+    "substituicoes": (
+        "id_escala_original",
+        "id_profissional_solicitante",
+        "id_profissional_substituto",
+    ),
+}
+
+# (tabela, coluna, tabela referenciada)
+CHAVES_ESTRANGEIRAS = (
+    ("escalas", "id_plantao", "plantoes"),
+    ("escalas", "id_profissional", "profissionais"),
+    ("substituicoes", "id_escala_original", "escalas"),
+    ("substituicoes", "id_profissional_solicitante", "profissionais"),
+    ("substituicoes", "id_profissional_substituto", "profissionais"),
+)
+
+# Colunas NOT NULL com default que o arquivo pode deixar em branco
+# (chaves das listagens paginadas por cursor)
+PADROES = {
+    "data_alocacao": "now() AT TIME ZONE 'utc'",
+    "data_solicitacao": "now() AT TIME ZONE 'utc'",
+}
+
+AMOSTRA_ERROS = 5
+
+
+# ------------------------------------------------------------
+# 🔹 Leitura dos arquivos (streaming)
+# ------------------------------------------------------------
+class _JsonlComoCsv(io.RawIOBase):
+    """Converte, sob demanda, linhas JSONL em CSV para o COPY."""
+
+    def __init__(self, linhas, colunas):
+        self._linhas = linhas
+        self._colunas = colunas
+        self._buffer = b""
+
+    def readable(self):
+        return True
+
+    def _linha_csv(self, registro):
+        saida = io.StringIO()
+        csv.writer(saida, lineterminator="\n").writerow(registro.get(c) for c in self._colunas)
+        return saida.getvalue().encode("utf-8")
+
+    def read(self, tamanho=-1):
+        while tamanho < 0 or len(self._buffer) < tamanho:
+            linha = next(self._linhas, None)
+            if linha is None:
+                break
+            if linha.strip():
+                self._buffer += self._linha_csv(json.loads(linha))
+        if tamanho < 0:
+            tamanho = len(self._buffer)
+        dados, self._buffer = self._buffer[:tamanho], self._buffer[tamanho:]
+        return dados
+
+
+def _abrir(origem):
+    """Aceita caminho ou objeto de arquivo (texto ou binário); retorna texto."""
+    if isinstance(origem, (str, bytes)) or hasattr(origem, "__fspath__"):
+        return open(origem, "r", encoding="utf-8", newline="")
+    if isinstance(origem, io.TextIOBase):
+        return origem
+    return io.TextIOWrapper(origem, encoding="utf-8", newline="")
+
+
+def _preparar(tabela, origem, formato):
+    """Retorna (colunas, fluxo CSV sem cabeçalho) para o COPY."""
+    texto = _abrir(origem)
+    if formato == "jsonl":
+        linhas = iter(texto)
+        primeira = next((linha for linha in linhas if linha.strip()), None)
+        if primeira is None:
+            return [], io.BytesIO()
+        registro = json.loads(primeira)
+        colunas = [c for c in TABELAS[tabela] if c in registro]
+
+        def todas():
+            yield primeira
+            yield from linhas
+
+        return colunas, _JsonlComoCsv(todas(), colunas)
+
+    cabecalho = next(csv.reader([texto.readline()]), [])
+    return [c.strip() for c in cabecalho], texto
+
+
+def formato_do_arquivo(nome):
+    return "jsonl" if str(nome).lower().endswith((".jsonl", ".ndjson")) else "csv"
+
+
+# ------------------------------------------------------------
+# 🔹 Validações set-wise
+# ------------------------------------------------------------
+def _amostra(cur, sql):
+    """Total de ocorrências e alguns exemplos, sem trazer todas as linhas."""
+    cur.execute(f"SELECT x.*, COUNT(*) OVER () FROM ({sql}) x LIMIT {AMOSTRA_ERROS}")
+    linhas = cur.fetchall()
+    return (linhas[0][-1] if linhas else 0), [linha[0] for linha in linhas]
+
+
+def _validar(cur, carregadas):
+    erros = []
+
+    def registrar(mensagem, sql):
+        total, exemplos = _amostra(cur, sql)
+        if total:
+            erros.append({"erro": mensagem, "ocorrencias": total, "exemplos": exemplos})
+
+    for tabela in carregadas:
+        registrar(
+            f"{tabela}: id repetido no arquivo",
+            f"SELECT id FROM stg_{tabela} GROUP BY id HAVING COUNT(*) > 1",
+        )
+        registrar(
+            f"{tabela}: id já existe no banco",
+            f"SELECT s.id FROM stg_{tabela} s JOIN {tabela} t ON t.id = s.id",
+        )
+
+    for tabela, coluna, referenciada in CHAVES_ESTRANGEIRAS:
+        if tabela not in carregadas:
+            continue
+        origem_ref = f"SELECT id FROM {referenciada}"
+        if referenciada in carregadas:
+            origem_ref += f" UNION ALL SELECT id FROM stg_{referenciada}"
+        registrar(
+            f"{tabela}.{coluna}: referência inexistente em {referenciada}",
+            f"SELECT s.id FROM stg_{tabela} s "
+            f"WHERE NOT EXISTS (SELECT 1 FROM ({origem_ref}) r WHERE r.id = s.{coluna})",
+        )
+
+    if "plantoes" in carregadas:
+        registrar(
+            "plantoes: mês já arquivado",
+            "SELECT id FROM stg_plantoes "
+            "WHERE to_regclass('arquivo.plantoes_' || to_char(data, 'YYYY_MM')) IS NOT NULL",
+        )
+
+    if "escalas" in carregadas:
+        # Plantões novos sem escalas novas não têm quem conflite
+        registrar("escalas: profissional com plantões sobrepostos", _sql_conflitos(carregadas))
+
+    return erros
+
+
+def _sql_conflitos(carregadas):
+    """Pares de escalas ativas sobrepostas do mesmo profissional (ao menos uma nova).
+
+    Das escalas existentes só entram as dos profissionais importados, nas
+    datas do lote (± 1 dia, pelos plantões noturnos): o custo acompanha o
+    lote, não o histórico, e só as partições desses meses são lidas.
+    """
+    plantoes = "SELECT id, data, hora_inicio, hora_fim FROM plantoes"
+    if "plantoes" in carregadas:
+        plantoes += " UNION ALL SELECT id, data, hora_inicio, hora_fim FROM stg_plantoes"
+    periodo = """tsrange(p.data + p.hora_inicio,
+                           p.data + p.hora_fim
+                             + CASE WHEN p.hora_fim <= p.hora_inicio
+                                    THEN interval '1 day' ELSE interval '0' END)"""
+    return f"""
+        WITH novas AS (
+            SELECT s.id, s.id_profissional, p.data, {periodo} AS periodo
+            FROM stg_escalas s
+            JOIN ({plantoes}) p ON p.id = s.id_plantao
+            WHERE s.status = 'ativo'
+        ),
+        periodos AS (
+            SELECT id, id_profissional, true AS nova, periodo FROM novas
+            UNION ALL
+            SELECT e.id, e.id_profissional, false, {periodo}
+            FROM escalas e
+            JOIN plantoes p ON p.id = e.id_plantao
+            WHERE e.status = 'ativo'
+              AND e.id_profissional IN (SELECT id_profissional FROM novas)
+              AND e.data_plantao BETWEEN (SELECT MIN(data) - 1 FROM novas) AND (SELECT MAX(data) + 1 FROM novas)
+              AND p.data BETWEEN (SELECT MIN(data) - 1 FROM novas) AND (SELECT MAX(data) + 1 FROM novas)
+        )
+        SELECT b.id
+        FROM periodos a
+        JOIN periodos b ON b.id_profissional = a.id_profissional AND a.id < b.id
+        WHERE (a.nova OR b.nova) AND a.periodo && b.periodo
+    """
+
+
+# ------------------------------------------------------------
+# 🔹 Mesclagem e resumos
+# ------------------------------------------------------------
+def _origem(coluna, prefixo=""):
+    padrao = PADROES.get(coluna)
+    return f"COALESCE({prefixo}{coluna}, {padrao})" if padrao else f"{prefixo}{coluna}"
+
+
+def _mesclar(cur, tabela):
+    colunas = ", ".join(TABELAS[tabela])
+    if tabela == "plantoes":
+        # Partições mensais dos meses importados (plantoes e escalas)
+        cur.execute(
+            "SELECT criar_particoes_mes(mes) FROM "
+            "(SELECT DISTINCT date_trunc('month', data)::date AS mes FROM stg_plantoes) m ORDER BY mes"
+        )
+    if tabela == "escalas":
+        # data_plantao (chave de partição) vem do plantão, já mesclado
+        origem = ", ".join(_origem(c, "s.") for c in TABELAS[tabela])
+        cur.execute(
+            f"INSERT INTO escalas ({colunas}, data_plantao) SELECT {origem}, p.data "
+            f"FROM stg_escalas s JOIN plantoes p ON p.id = s.id_plantao"
+        )
+    else:
+        origem = ", ".join(_origem(c) for c in TABELAS[tabela])
+        cur.execute(f"INSERT INTO {tabela} ({colunas}) SELECT {origem} FROM stg_{tabela}")
+    cur.execute(
+        f"SELECT setval(pg_get_serial_sequence('{tabela}', 'id'), "
+        f"GREATEST((SELECT MAX(id) FROM {tabela}), 1))"
+    )
+
+
+def _atualizar_resumos(cur, carregadas):
+    """Aplica aos resumos do painel os totais dos registros importados."""
+    deltas = {
+        "escalas": ("resumo_carga_profissional", "id_profissional", "id_profissional", ""),
+        "substituicoes": ("resumo_substituicoes_status", "status", "status", "WHERE status IS NOT NULL"),
+        "plantoes": ("resumo_plantoes_dia", "dia", "data", ""),
+    }
+    for tabela, (resumo, chave, origem, filtro) in deltas.items():
+        if tabela in carregadas:
+            cur.execute(f"""
+                INSERT INTO {resumo} ({chave}, total)
+                SELECT {origem}, COUNT(*) FROM stg_{tabela} {filtro} GROUP BY {origem}
+                ON CONFLICT ({chave}) DO UPDATE SET total = {resumo}.total + EXCLUDED.total
+            """)
+
+
+def _registrar_auditoria(cur, carregadas, usuario):
+    """Registra na trilha de auditoria (set-wise) cada linha importada."""
+    from .auditoria import ENTIDADES
+
+    for tabela in carregadas:
+        cur.execute(
+            f"INSERT INTO auditoria (entidade, id_entidade, acao, usuario, data_hora) "
+            f"SELECT %s, id, 'importado', %s, now() AT TIME ZONE 'utc' FROM stg_{tabela}",
+            (ENTIDADES[tabela], usuario),
+        )
+
+
+def _incrementar_versoes(cur, carregadas):
+    """Invalida os ETags das listagens das tabelas importadas (ver app/cache.py)."""
+    cur.execute(
+        "INSERT INTO versoes_tabelas (tabela, versao, alterado_em) "
+        "SELECT t, 1, clock_timestamp() AT TIME ZONE 'utc' FROM unnest(%s::text[]) AS t ORDER BY t "
+        "ON CONFLICT (tabela) DO UPDATE SET versao = versoes_tabelas.versao + 1, "
+        "alterado_em = EXCLUDED.alterado_em",
+        (sorted(carregadas),),
+    )
+
+
+def _incrementar_agendas(cur, carregadas):
+    """Invalida os feeds de agenda dos profissionais com escalas ou pedidos importados."""
+    origens = [
+        sql for tabela, sql in (
+            ("escalas", "SELECT id_profissional FROM stg_escalas"),
+            ("substituicoes", "SELECT id_profissional_solicitante FROM stg_substituicoes"),
+        )
+        if tabela in carregadas
+    ]
+    if not origens:
+        return
+    cur.execute(
+        "INSERT INTO versoes_agendas (id_profissional, versao, alterado_em) "
+        f"SELECT id, 1, now() AT TIME ZONE 'utc' FROM ({' UNION '.join(origens)}) AS ids(id) ORDER BY id "
+        "ON CONFLICT (id_profissional) DO UPDATE SET versao = versoes_agendas.versao + 1, "
+        "alterado_em = EXCLUDED.alterado_em"
+    )
+
+
+# ------------------------------------------------------------
+# 🔹 Importação
+# ------------------------------------------------------------
+def importar_arquivos(conexao, arquivos, somente_validar=False, usuario="importacao"):
+    """Importa os arquivos em uma única transação da conexão psycopg2 informada.
+
+    `arquivos` mapeia tabela -> caminho (ou (nome, objeto de arquivo)).
+    Retorna um relatório com linhas, tempos, vazão (linhas/s) e erros;
+    havendo erros, nada é gravado.
+    """
+    desconhecidas = set(arquivos) - set(TABELAS)
+    if desconhecidas:
+        raise ValueError(f"Tabelas não suportadas: {', '.join(sorted(desconhecidas))}")
+
+    t0 = time.perf_counter()
+    relatorio = {"tabelas": {}, "erros": [], "gravado": False}
+    cur = conexao.cursor()
+    try:
+        carregadas = [t for t in TABELAS if t in arquivos]
+        for tabela in carregadas:
+            origem = arquivos[tabela]
+            nome, fluxo = origem if isinstance(origem, tuple) else (origem, origem)
+            colunas, dados = _preparar(tabela, fluxo, formato_do_arquivo(nome))
+
+            invalidas = set(colunas) - set(TABELAS[tabela])
+            ausentes = set(OBRIGATORIAS[tabela]) - set(colunas)
+            if invalidas or ausentes:
+                relatorio["erros"].append({
+                    "erro": f"{tabela}: cabeçalho inválido",
+                    "colunas_desconhecidas": sorted(invalidas),
+                    "colunas_ausentes": sorted(ausentes),
+                })
+                continue
+
+            cur.execute(
+                f"CREATE TEMP TABLE stg_{tabela} (LIKE {tabela} INCLUDING DEFAULTS) ON COMMIT DROP"
+            )
+            if tabela == "escalas":
+                # Preenchida na mesclagem a partir do plantão
+                cur.execute("ALTER TABLE stg_escalas ALTER COLUMN data_plantao DROP NOT NULL")
+            for coluna in PADROES.keys() & set(TABELAS[tabela]):
+                # Em branco no arquivo: recebe o padrão na mesclagem
+                cur.execute(f"ALTER TABLE stg_{tabela} ALTER COLUMN {coluna} DROP NOT NULL")
+            t_copy = time.perf_counter()
+            cur.copy_expert(
+                f"COPY stg_{tabela} ({', '.join(colunas)}) FROM STDIN WITH (FORMAT csv)", dados
+            )
+            linhas = cur.rowcount
+            duracao = time.perf_counter() - t_copy
+            relatorio["tabelas"][tabela] = {
+                "linhas": linhas,
+                "copy_ms": round(duracao * 1000, 1),
+                "linhas_por_s": round(linhas / duracao) if duracao else None,
+            }
+
+        if not relatorio["erros"]:
+            t_val = time.perf_counter()
+            relatorio["erros"] = _validar(cur, carregadas)
+            relatorio["validacao_ms"] = round((time.perf_counter() - t_val) * 1000, 1)
+
+        if relatorio["erros"] or somente_validar:
+            conexao.rollback()
+        else:
+            t_merge = time.perf_counter()
+            for tabela in carregadas:
+                _mesclar(cur, tabela)
+            _atualizar_resumos(cur, carregadas)
+            _registrar_auditoria(cur, carregadas, usuario)
+            _incrementar_versoes(cur, carregadas)
+            _incrementar_agendas(cur, carregadas)
+            conexao.commit()
+            relatorio["mesclagem_ms"] = round((time.perf_counter() - t_merge) * 1000, 1)
+            relatorio["gravado"] = True
+    except Exception:
+        conexao.rollback()
+        raise
+    finally:
+        cur.close()
+
+    total = sum(t["linhas"] for t in relatorio["tabelas"].values())
+    duracao = time.perf_counter() - t0
+    relatorio["linhas"] = total
+    relatorio["tempo_ms"] = round(duracao * 1000, 1)
+    relatorio["linhas_por_s"] = round(total / duracao) if duracao else None
+    return relatorio
+
+
+def importar_pela_sessao(arquivos, somente_validar=False):
+    """Executa a importação na conexão da sessão SQLAlchemy da aplicação."""
+    from .. import db
+    from .auditoria import usuario_atual
+    from .substitutos import invalidar_indice
+
+    db.session.commit()  # nada pendente na sessão antes de usar a conexão crua
+    conexao = db.session.connection().connection.dbapi_connection
+    try:
+        relatorio = importar_arquivos(conexao, arquivos, somente_validar, usuario=usuario_atual())
+    finally:
+        db.session.rollback()  # sincroniza o estado da sessão com a conexão
+    if relatorio["gravado"]:
+        invalidar_indice()
+    return relatorio
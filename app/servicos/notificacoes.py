@@ -0,0 +1,306 @@
+# ============================================================
+# 📣 Serviço — Fila de Notificações (Outbox)
+# ============================================================
+# As rotas apenas gravam a notificação na tabela `notificacoes`
+# (outbox) e respondem 202. Um worker (flask notificacoes worker)
+# drena a fila em lotes:
+#   • reserva o lote com FOR UPDATE SKIP LOCKED (vários workers
+#     podem rodar em paralelo sem enviar a mesma mensagem);
+#   • envia com um pool limitado de threads, respeitando o limite
+#     de mensagens por segundo de cada canal;
+#   • registra sucessos e falhas com UPDATE em lote, só onde a
+#     reserva ainda é a deste worker (um envio que passou de
+#     RESERVA_S pode ter sido reservado de novo); falhas são
+#     reagendadas com backoff exponencial até o limite de tentativas.
+# A tentativa é contada ao reservar: uma mensagem que derruba ou
+# trava o worker também se esgota, em vez de voltar para sempre.
+# Os provedores são plugáveis; os padrões apenas simulam o envio.
+# ============================================================
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, bindparam, insert, or_, update
+
+from .. import db
+from ..models import Notificacao, Profissional, Substituicao
+
+CANAIS = ("email", "whatsapp")
+
+BACKOFF_BASE_S = 30
+BACKOFF_MAXIMO_S = 3600
+RESERVA_S = 300  # após esse tempo, um lote "enviando" abandonado volta para a fila
+
+
+# ------------------------------------------------------------
+# 🔹 Provedores (plugáveis)
+# ------------------------------------------------------------
+def _email_simulado(notificacao):
+    print(f"[📧 E-mail Simulado] Para: {notificacao['destinatario']} | Assunto: {notificacao['assunto']}")
+
+
+def _whatsapp_simulado(notificacao):
+    print(f"[💬 WhatsApp Simulado] Para: {notificacao['destinatario']} | Mensagem: {notificacao['mensagem']}")
+
+
+PROVEDORES = {"email": _email_simulado, "whatsapp": _whatsapp_simulado}
+
+
+def registrar_provedor(canal, provedor):
+    """Substitui o provedor de um canal; `provedor(notificacao: dict)` deve levantar exceção em falha."""
+    if canal not in CANAIS:
+        raise ValueError(f"Canal desconhecido: {canal}")
+    PROVEDORES[canal] = provedor
+
+
+# ------------------------------------------------------------
+# 🔹 Limite de envio por canal (token bucket)
+# ------------------------------------------------------------
+class LimiteDeTaxa:
+    """Libera até `taxa` envios por segundo (rajadas de até `taxa` envios)."""
+
+    def __init__(self, taxa):
+        self.taxa = float(taxa)
+        self._fichas = self.taxa
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def aguardar(self):
+        if self.taxa <= 0:
+            return
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                self._fichas = min(self.taxa, self._fichas + (agora - self._ultimo) * self.taxa)
+                self._ultimo = agora
+                if self._fichas >= 1:
+                    self._fichas -= 1
+                    return
+                espera = (1 - self._fichas) / self.taxa
+            time.sleep(espera)
+
+
+# ------------------------------------------------------------
+# 🔹 Enfileiramento
+# ------------------------------------------------------------
+def enfileirar(canal, destinatario, mensagem, assunto=None):
+    """Grava uma notificação na fila e retorna seu id."""
+    notificacao = Notificacao(canal=canal, destinatario=destinatario, assunto=assunto, mensagem=mensagem)
+    db.session.add(notificacao)
+    db.session.commit()
+    return notificacao.id
+
+
+def enfileirar_lote(itens):
+    """Grava várias notificações com um único INSERT em lote; retorna a quantidade."""
+    if not itens:
+        return 0
+    agora = datetime.utcnow()
+    db.session.execute(
+        insert(Notificacao),
+        [
+            {
+                "canal": i["canal"],
+                "destinatario": i["destinatario"],
+                "assunto": i.get("assunto"),
+                "mensagem": i["mensagem"],
+                "status": "pendente",
+                "tentativas": 0,
+                "proxima_tentativa": agora,
+                "criado_em": agora,
+            }
+            for i in itens
+        ],
+    )
+    db.session.commit()
+    return len(itens)
+
+
+def destinatarios_da_substituicao(id_substituicao):
+    """Ids do solicitante e do substituto de uma substituição (ou None)."""
+    linha = db.session.execute(
+        db.select(Substituicao.id_profissional_solicitante, Substituicao.id_profissional_substituto)
+        .where(Substituicao.id == id_substituicao)
+    ).one_or_none()
+    return list(linha) if linha else None
+
+
+def montar_notificacoes(ids_profissionais, canais, mensagem, assunto=None):
+    """Resolve e-mail/telefone dos profissionais (uma consulta) e monta os itens da fila."""
+    profissionais = db.session.execute(
+        db.select(Profissional.email, Profissional.telefone).where(Profissional.id.in_(set(ids_profissionais)))
+    ).all()
+    itens = []
+    for email, telefone in profissionais:
+        if "email" in canais and email:
+            itens.append({"canal": "email", "destinatario": email, "assunto": assunto, "mensagem": mensagem})
+        if "whatsapp" in canais and telefone:
+            itens.append({"canal": "whatsapp", "destinatario": telefone, "assunto": assunto, "mensagem": mensagem})
+    return itens
+
+
+# ------------------------------------------------------------
+# 🔹 Worker
+# ------------------------------------------------------------
+def encerrar_abandonadas(max_tentativas=5):
+    """Marca como 'falhou' as reservas expiradas que já esgotaram as tentativas; retorna quantas."""
+    agora = datetime.utcnow()
+    abandonadas = (
+        db.select(Notificacao.id)
+        .where(
+            Notificacao.status == "enviando",
+            Notificacao.proxima_tentativa <= agora,
+            Notificacao.tentativas >= max_tentativas,
+        )
+        .with_for_update(skip_locked=True)
+    )
+    total = db.session.execute(
+        update(Notificacao)
+        .where(Notificacao.id.in_(abandonadas.scalar_subquery()))
+        .values(status="falhou", ultimo_erro="reserva expirada: worker interrompido ou envio sem resposta")
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return total
+
+
+def reservar_lote(tamanho, max_tentativas=5):
+    """Marca até `tamanho` notificações vencidas como 'enviando' e as retorna.
+
+    Cada reserva conta como uma tentativa (`tentativas` já vem incrementado).
+    """
+    agora = datetime.utcnow()
+    vencidas = (
+        db.select(Notificacao.id)
+        .where(
+            or_(
+                and_(Notificacao.status == "pendente", Notificacao.proxima_tentativa <= agora),
+                # reserva expirada (worker interrompido no meio do envio) com tentativas restantes
+                and_(
+                    Notificacao.status == "enviando",
+                    Notificacao.proxima_tentativa <= agora,
+                    Notificacao.tentativas < max_tentativas,
+                ),
+            )
+        )
+        .order_by(Notificacao.proxima_tentativa)
+        .limit(tamanho)
+        .with_for_update(skip_locked=True)
+    )
+    lote = db.session.execute(
+        update(Notificacao)
+        .where(Notificacao.id.in_(vencidas.scalar_subquery()))
+        .values(
+            status="enviando",
+            tentativas=Notificacao.tentativas + 1,
+            proxima_tentativa=agora + timedelta(seconds=RESERVA_S),
+        )
+        .returning(
+            Notificacao.id,
+            Notificacao.canal,
+            Notificacao.destinatario,
+            Notificacao.assunto,
+            Notificacao.mensagem,
+            Notificacao.tentativas,
+        )
+        .execution_options(synchronize_session=False)
+    ).mappings().all()
+    db.session.commit()
+    return [dict(n) for n in lote]
+
+
+def _backoff(tentativas):
+    atraso = min(BACKOFF_BASE_S * 2 ** (tentativas - 1), BACKOFF_MAXIMO_S)
+    return timedelta(seconds=atraso * random.uniform(1.0, 1.1))
+
+
+# Status final -> contador do lote
+_RESULTADOS = {"enviado": "enviadas", "pendente": "reagendadas", "falhou": "falharam"}
+
+
+def _registrar_resultados(linhas):
+    """Grava os resultados de mesmo status; retorna quantos ainda eram desta reserva.
+
+    Só vale onde a notificação continua 'enviando' com as tentativas reservadas:
+    se o envio passou de RESERVA_S, outro worker pode tê-la reservado de novo,
+    e o estado gravado por ele prevalece.
+    """
+    tabela = Notificacao.__table__
+    colunas = [c for c in linhas[0] if c not in ("id", "tentativas")]
+    stmt = (
+        update(tabela)
+        .where(
+            tabela.c.id == bindparam("b_id"),
+            tabela.c.status == "enviando",
+            tabela.c.tentativas == bindparam("b_tentativas"),
+        )
+        .values({c: bindparam(f"b_{c}") for c in colunas})
+    )
+    parametros = [{f"b_{c}": v for c, v in linha.items()} for linha in sorted(linhas, key=lambda l: l["id"])]
+    return db.session.execute(stmt, parametros).rowcount
+
+
+def processar_lote(tamanho=100, threads=4, max_tentativas=5, limites=None):
+    """Reserva, envia e registra um lote. Retorna contadores do processamento."""
+    abandonadas = encerrar_abandonadas(max_tentativas)
+    lote = reservar_lote(tamanho, max_tentativas)
+    if not lote:
+        return {"reservadas": 0, "enviadas": 0, "reagendadas": 0, "falharam": abandonadas, "descartadas": 0}
+
+    limites = limites or {}
+
+    def enviar(notificacao):
+        limite = limites.get(notificacao["canal"])
+        if limite:
+            limite.aguardar()
+        try:
+            PROVEDORES[notificacao["canal"]](notificacao)
+            return notificacao, None
+        except Exception as e:  # qualquer falha do provedor é reagendada
+            return notificacao, str(e) or e.__class__.__name__
+
+    with ThreadPoolExecutor(max_workers=max(1, threads)) as executor:
+        resultados = list(executor.map(enviar, lote))
+
+    agora = datetime.utcnow()
+    por_status = {}
+    for notificacao, erro in resultados:
+        tentativas = notificacao["tentativas"]  # já inclui esta, contada na reserva
+        if erro is None:
+            por_status.setdefault("enviado", []).append({
+                "id": notificacao["id"], "tentativas": tentativas,
+                "status": "enviado", "enviado_em": agora, "ultimo_erro": None,
+            })
+            continue
+        status = "falhou" if tentativas >= max_tentativas else "pendente"
+        por_status.setdefault(status, []).append({
+            "id": notificacao["id"], "tentativas": tentativas, "status": status,
+            "proxima_tentativa": agora + _backoff(tentativas), "ultimo_erro": erro[:1000],
+        })
+
+    # UPDATE em lote (executemany) por status; resultados de reservas superadas são descartados
+    contagem = {"reservadas": len(lote), "enviadas": 0, "reagendadas": 0, "falharam": abandonadas,
+                "descartadas": len(lote)}
+    for status, linhas in sorted(por_status.items()):
+        gravadas = _registrar_resultados(linhas)
+        contagem[_RESULTADOS[status]] += gravadas
+        contagem["descartadas"] -= gravadas
+    db.session.commit()
+    return contagem
+
+
+def executar_worker(tamanho=100, threads=4, max_tentativas=5, taxas=None, intervalo=2.0, uma_vez=False):
+    """Drena a fila continuamente (ou uma única vez, com `uma_vez=True`)."""
+    limites = {canal: LimiteDeTaxa(taxa) for canal, taxa in (taxas or {}).items()}
+    total = {"reservadas": 0, "enviadas": 0, "reagendadas": 0, "falharam": 0, "descartadas": 0}
+    while True:
+        contagem = processar_lote(tamanho, threads, max_tentativas, limites)
+        for chave, valor in contagem.items():
+            total[chave] += valor
+        if contagem["reservadas"] < tamanho:
+            if uma_vez:
+                return total
+            time.sleep(intervalo)
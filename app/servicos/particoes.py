@@ -0,0 +1,99 @@
+# ============================================================
+# 🗂️ Serviço — Partições Mensais (Plantões / Escalas)
+# ============================================================
+# plantoes e escalas são particionadas por mês da data do plantão
+# (RANGE em plantoes.data e escalas.data_plantao): as consultas de
+# um período leem só as partições dele (partition pruning).
+#   • criar_particoes: garante as partições dos próximos meses
+#     (rodar periodicamente, ex.: cron mensal);
+#   • arquivar_ate: desanexa os meses encerrados e os move, com as
+#     substituições deles, para o esquema "arquivo" — fora das
+#     consultas, índices e VACUUM do dia a dia.
+# A DDL fica nas funções SQL criar_particoes_mes e arquivar_mes
+# (escala360.sql).
+# ============================================================
+
+from datetime import date
+
+from sqlalchemy import text
+
+from .. import db
+from ..cache import marcar_alteradas
+
+TABELAS_PARTICIONADAS = ("plantoes", "escalas")
+
+
+def _proximo_mes(mes):
+    return date(mes.year + mes.month // 12, mes.month % 12 + 1, 1)
+
+
+def criar_particoes(meses=12, a_partir_de=None):
+    """Garante as partições do mês atual (ou `a_partir_de`) e dos `meses` seguintes."""
+    mes = (a_partir_de or date.today()).replace(day=1)
+    garantidos = []
+    for _ in range(meses + 1):
+        db.session.execute(text("SELECT criar_particoes_mes(:mes)"), {"mes": mes})
+        garantidos.append(mes)
+        mes = _proximo_mes(mes)
+    db.session.commit()
+    return garantidos
+
+
+def listar_particoes():
+    """Partições ativas e arquivadas: [{tabela, mes, linhas, arquivada}] por mês."""
+    linhas = db.session.execute(text("""
+        SELECT n.nspname, c.relname, c.reltuples::bigint
+          FROM pg_class c
+          JOIN pg_namespace n ON n.oid = c.relnamespace
+         WHERE c.relkind = 'r'
+           AND (n.nspname = 'arquivo'
+                OR c.oid IN (SELECT inhrelid FROM pg_inherits
+                              WHERE inhparent IN ('plantoes'::regclass, 'escalas'::regclass)))
+         ORDER BY c.relname
+    """)).all()
+    particoes = []
+    for esquema, nome, estimadas in linhas:
+        tabela, _, sufixo = nome.partition("_")
+        ano, _, mes = sufixo.partition("_")
+        particoes.append({
+            "tabela": tabela,
+            "particao": f"{esquema}.{nome}",
+            "mes": date(int(ano), int(mes), 1),
+            "linhas": max(estimadas, 0),  # estimativa do ANALYZE (-1: nunca analisada)
+            "arquivada": esquema == "arquivo",
+        })
+    return particoes
+
+
+def arquivar_ate(ultimo_mes):
+    """Arquiva todos os meses ativos até `ultimo_mes` (date), inclusive.
+
+    Só meses encerrados podem ser arquivados. Os resumos do painel são
+    recalculados e as versões das tabelas e das agendas dos profissionais
+    escalados nesses meses sobem (ETags) na mesma transação. Retorna os
+    meses arquivados.
+    """
+    from .agendas import marcar_agendas
+    from .resumos import reconstruir_resumos
+    from .substitutos import invalidar_indice
+
+    ultimo_mes = ultimo_mes.replace(day=1)
+    if ultimo_mes >= date.today().replace(day=1):
+        raise ValueError("Só meses encerrados podem ser arquivados.")
+
+    meses = sorted({
+        p["mes"] for p in listar_particoes()
+        if p["tabela"] == "escalas" and not p["arquivada"] and p["mes"] <= ultimo_mes
+    })
+    if meses:
+        marcar_agendas(db.session, db.session.execute(
+            text("SELECT DISTINCT id_profissional FROM escalas WHERE data_plantao < :fim"),
+            {"fim": _proximo_mes(meses[-1])},
+        ).scalars())
+    for mes in meses:
+        db.session.execute(text("SELECT arquivar_mes(:mes)"), {"mes": mes})
+    if meses:
+        marcar_alteradas(db.session, "plantoes", "escalas", "substituicoes")
+        reconstruir_resumos()  # confirma a transação
+        invalidar_indice()
+    return meses
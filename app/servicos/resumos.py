@@ -0,0 +1,207 @@
+# ============================================================
+# 📊 Serviço — Resumos Incrementais do Painel BI
+# ============================================================
+# Mantém as tabelas resumo_* atualizadas na mesma transação: as
+# inclusões, alterações e exclusões de Escala, Substituicao e
+# Plantao viram deltas (+1/-1), somados a cada flush e aplicados
+# com UPSERT só no commit — as poucas linhas de resumo, disputadas
+# por todas as gravações, ficam travadas pelo menor tempo possível
+# e sempre na mesma ordem (sem impasses entre transações).
+# O painel lê apenas essas poucas linhas.
+# Gravações em lote fora do ORM devem chamar acumular_deltas().
+# ============================================================
+
+from collections import Counter
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from .. import db
+from ..models import (
+    Escala,
+    Plantao,
+    Profissional,
+    ResumoCargaProfissional,
+    ResumoPlantoesDia,
+    ResumoSubstituicaoStatus,
+    Substituicao,
+)
+
+# Entidade -> (atributo agrupador, valor padrão quando ainda não definido)
+AGRUPADORES = {
+    Escala: ("id_profissional", None),
+    Substituicao: ("status", "pendente"),
+    Plantao: ("data", None),
+}
+
+# Tabela de resumo e coluna-chave de cada entidade
+RESUMOS = {
+    Escala: (ResumoCargaProfissional, "id_profissional"),
+    Substituicao: (ResumoSubstituicaoStatus, "status"),
+    Plantao: (ResumoPlantoesDia, "dia"),
+}
+
+
+# ------------------------------------------------------------
+# 🔹 Cálculo dos deltas de um flush
+# ------------------------------------------------------------
+def _valor_atual(obj, atributo, padrao):
+    valor = getattr(obj, atributo)
+    return padrao if valor is None else valor
+
+
+def calcular_deltas(session):
+    """Converte as mudanças pendentes da sessão em deltas por resumo."""
+    deltas = {entidade: Counter() for entidade in AGRUPADORES}
+
+    for obj in session.new:
+        if type(obj) in AGRUPADORES:
+            atributo, padrao = AGRUPADORES[type(obj)]
+            deltas[type(obj)][_valor_atual(obj, atributo, padrao)] += 1
+
+    for obj in session.deleted:
+        if type(obj) in AGRUPADORES:
+            atributo, padrao = AGRUPADORES[type(obj)]
+            historico = inspect(obj).attrs[atributo].history
+            anteriores = historico.deleted or historico.unchanged
+            if anteriores:
+                deltas[type(obj)][anteriores[0]] -= 1
+
+    # Os atributos agrupadores usam active_history=True (app/models.py): o
+    # valor anterior está no histórico mesmo que o objeto tenha expirado.
+    for obj in session.dirty:
+        if type(obj) in AGRUPADORES:
+            atributo, _ = AGRUPADORES[type(obj)]
+            historico = inspect(obj).attrs[atributo].history
+            if historico.added and historico.deleted:
+                deltas[type(obj)][historico.deleted[0]] -= 1
+                deltas[type(obj)][historico.added[0]] += 1
+
+    return deltas
+
+
+_CHAVE = "resumos_deltas"
+
+
+def acumular_deltas(session, deltas):
+    """Soma deltas aos da transação; são aplicados no commit."""
+    pendentes = session.info.setdefault(_CHAVE, {entidade: Counter() for entidade in RESUMOS})
+    for entidade, contagem in deltas.items():
+        pendentes[entidade].update(contagem)
+
+
+def aplicar_deltas(conexao, deltas):
+    """Aplica os deltas com INSERT ... ON CONFLICT DO UPDATE (uma instrução por resumo)."""
+    # Ordem fixa de tabelas e de chaves: transações concorrentes travam as linhas na mesma sequência
+    for entidade, (modelo, coluna) in RESUMOS.items():
+        contagem = deltas.get(entidade, {})
+        linhas = sorted((chave, d) for chave, d in contagem.items() if chave is not None and d)
+        if not linhas:
+            continue
+        tabela = modelo.__table__
+        stmt = pg_insert(tabela).values([{coluna: chave, "total": d} for chave, d in linhas])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[coluna],
+            set_={"total": tabela.c.total + stmt.excluded.total},
+        )
+        conexao.execute(stmt)
+
+
+@event.listens_for(Session, "before_flush")
+def _carregar_excluidos(session, flush_context, instances):
+    # Garante que os valores agrupadores dos excluídos estejam em memória
+    for obj in session.deleted:
+        if type(obj) in AGRUPADORES:
+            getattr(obj, AGRUPADORES[type(obj)][0])
+
+
+@event.listens_for(Session, "after_flush")
+def _acumular_resumos(session, flush_context):
+    # Após o flush as chaves estrangeiras já estão preenchidas, e o
+    # histórico dos atributos ainda reflete o estado anterior.
+    deltas = calcular_deltas(session)
+    if any(deltas.values()):
+        acumular_deltas(session, deltas)
+
+
+@event.listens_for(Session, "before_commit")
+def _atualizar_resumos(session):
+    session.flush()  # o flush final do commit só acontece após este evento
+    deltas = session.info.pop(_CHAVE, None)
+    if deltas:
+        aplicar_deltas(session.connection(), deltas)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar(session):
+    session.info.pop(_CHAVE, None)
+
+
+# ------------------------------------------------------------
+# 🔹 Reconstrução completa e conferência
+# ------------------------------------------------------------
+# Resumo -> (coluna-chave, consulta que recalcula os totais da origem)
+_ORIGENS = {
+    "resumo_carga_profissional": ("id_profissional", "SELECT id_profissional, COUNT(*) FROM escalas GROUP BY 1"),
+    "resumo_substituicoes_status": (
+        "status", "SELECT status, COUNT(*) FROM substituicoes WHERE status IS NOT NULL GROUP BY 1"
+    ),
+    "resumo_plantoes_dia": ("dia", "SELECT data, COUNT(*) FROM plantoes GROUP BY 1"),
+}
+
+
+def conferir_resumos():
+    """Compara os resumos mantidos incrementalmente com os totais recalculados.
+
+    Retorna as divergências [{"resumo", "chave", "resumo_total", "origem_total"}]
+    (lista vazia: os resumos batem com o que reconstruir_resumos() gravaria).
+    """
+    divergencias = []
+    for resumo, (coluna, origem) in _ORIGENS.items():
+        linhas = db.session.execute(text(f"""
+            WITH origem (chave, total) AS ({origem})
+            SELECT COALESCE(r.{coluna}, o.chave) AS chave,
+                   COALESCE(r.total, 0) AS resumo_total, COALESCE(o.total, 0) AS origem_total
+              FROM {resumo} r
+              FULL JOIN origem o ON o.chave = r.{coluna}
+             WHERE COALESCE(r.total, 0) <> COALESCE(o.total, 0)
+             ORDER BY 1
+        """)).all()
+        divergencias += [{"resumo": resumo, **linha._asdict()} for linha in linhas]
+    return divergencias
+
+
+def reconstruir_resumos():
+    """Recalcula todos os resumos a partir das tabelas de origem."""
+    db.session.flush()
+    db.session.execute(text("""
+        TRUNCATE resumo_carga_profissional, resumo_substituicoes_status, resumo_plantoes_dia
+    """))
+    for resumo, (coluna, origem) in _ORIGENS.items():
+        db.session.execute(text(f"INSERT INTO {resumo} ({coluna}, total) {origem}"))
+    db.session.info.pop(_CHAVE, None)  # já contados na reconstrução
+    db.session.commit()
+
+
+# ------------------------------------------------------------
+# 🔹 Leitura para o painel
+# ------------------------------------------------------------
+def dados_do_painel():
+    """Retorna as três séries do painel a partir dos resumos."""
+    carga = db.session.execute(
+        db.select(Profissional.nome, db.func.coalesce(ResumoCargaProfissional.total, 0).label("total"))
+        .outerjoin(ResumoCargaProfissional, ResumoCargaProfissional.id_profissional == Profissional.id)
+        .order_by(db.text("total DESC"), Profissional.nome)
+    ).all()
+    status = db.session.execute(
+        db.select(ResumoSubstituicaoStatus.status, ResumoSubstituicaoStatus.total)
+        .where(ResumoSubstituicaoStatus.total > 0)
+        .order_by(ResumoSubstituicaoStatus.total.desc())
+    ).all()
+    dias = db.session.execute(
+        db.select(ResumoPlantoesDia.dia, ResumoPlantoesDia.total)
+        .where(ResumoPlantoesDia.total > 0)
+        .order_by(ResumoPlantoesDia.dia)
+    ).all()
+    return carga, status, dias
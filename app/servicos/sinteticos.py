@@ -0,0 +1,257 @@
+# ============================================================
+# 🧪 Serviço — Gerador de Dados Sintéticos em Volume
+# ============================================================
+# Popula profissionais, plantões, escalas, substituições e a
+# auditoria com 10³ a 10⁷ plantões para medir a aplicação com
+# volume de produção (`flask dados gerar`, `flask diagnostico
+# benchmark`):
+#   • tudo é gerado no próprio PostgreSQL (INSERT ... SELECT sobre
+#     generate_series), sem trafegar linhas pela rede;
+#   • os sorteios são hashint8extended(índice, semente): a mesma
+#     semente sobre o mesmo banco produz exatamente os mesmos dados,
+#     qualquer que seja o tamanho do lote;
+#   • cada profissional da escala tem um turno fixo (manhã, tarde
+#     ou noite) e no máximo um plantão por dia — nenhuma escala
+#     viola a restrição de exclusão; os substitutos vêm de um
+#     quadro de reserva sem plantões próprios;
+#   • os plantões são gravados em lotes de dias (uma transação por
+#     lote), com chaves e restrições de exclusão ativas; os triggers
+#     que só derivam escalas.periodo ou conferem substituicoes ->
+#     escalas (garantidos pela própria geração) ficam desligados
+#     dentro da transação do lote.
+# Ao final: sequências, resumos do painel, versões das tabelas e
+# das agendas (ETags) e ANALYZE.
+# ============================================================
+
+import math
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
+from .. import db
+
+TABELAS = ("profissionais", "plantoes", "escalas", "substituicoes", "auditoria")
+CARGOS = ("Enfermeiro", "Enfermeira", "Técnico de Enfermagem", "Médico", "Fisioterapeuta")
+NOMES = ("Ana", "Bruno", "Carla", "Daniel", "Eduarda", "Felipe", "Gabriela", "Henrique", "Isabela", "João",
+         "Karina", "Lucas", "Mariana", "Nicolas", "Olívia", "Pedro", "Raquel", "Samuel", "Tatiana", "Vinícius")
+SOBRENOMES = ("Almeida", "Barbosa", "Cardoso", "Duarte", "Ferreira", "Gomes", "Lima", "Martins", "Nunes",
+              "Oliveira", "Pereira", "Ribeiro", "Rocha", "Santos", "Silva", "Souza", "Teixeira", "Vieira",
+              "Costa", "Mendes")
+
+DIAS_MINIMO, DIAS_MAXIMO = 7, 730
+PCT_VAGOS = 3          # plantões sem escala
+PCT_CANCELADAS = 4     # escalas canceladas
+PCT_SUBSTITUICOES = 10  # escalas com pedido de substituição
+
+# Turno pela posição do profissional no dia: manhã, tarde ou noite (até 07h do dia seguinte)
+_HORA_INICIO = "(ARRAY[TIME '07:00', TIME '13:00', TIME '19:00'])[1 + i % :por_dia % 3]"
+_HORA_FIM = "(ARRAY[TIME '13:00', TIME '19:00', TIME '07:00'])[1 + i % :por_dia % 3]"
+
+
+def _sorteio(expressao, fluxo):
+    """Inteiro pseudoaleatório em [0, 2³¹) determinado por (expressão, fluxo, semente)."""
+    return f"(hashint8extended(({expressao})::bigint * 16 + {fluxo}, :semente) & 2147483647)"
+
+
+def dimensoes(linhas):
+    """Plantões pedidos -> (dias, profissionais escalados por dia, profissionais de reserva).
+
+    O período cresce com o volume (de uma semana a dois anos) e o quadro
+    é múltiplo de 3 (um terço por turno).
+    """
+    dias = min(DIAS_MAXIMO, max(DIAS_MINIMO, linhas // 200))
+    por_dia = 3 * max(2, math.ceil(linhas / dias / 3))
+    return dias, por_dia, max(10, por_dia // 5)
+
+
+def banco_local(url):
+    """Indica se a URL aponta para um PostgreSQL local (socket ou loopback)."""
+    url = make_url(url)
+    host = url.host or url.query.get("host") or ""
+    if isinstance(host, tuple):
+        host = host[0]
+    return host in ("", "localhost", "127.0.0.1", "::1") or host.startswith("/")
+
+
+# ------------------------------------------------------------
+# 🔹 Etapas
+# ------------------------------------------------------------
+def _limpar():
+    db.session.execute(text(
+        "TRUNCATE profissionais, plantoes, escalas, substituicoes, auditoria, notificacoes, "
+        "resumo_carga_profissional, resumo_substituicoes_status, resumo_plantoes_dia "
+        "RESTART IDENTITY CASCADE"
+    ))
+    # Os ids serão reaproveitados: nenhuma agenda em cache continua válida
+    db.session.execute(text(
+        "UPDATE versoes_agendas SET versao = versao + 1, alterado_em = now() AT TIME ZONE 'utc'"
+    ))
+    db.session.commit()
+
+
+def _profissionais(p):
+    nome = (
+        f"(:nomes)[1 + {_sorteio('i', 0)} % {len(NOMES)}] || ' ' || "
+        f"(:sobrenomes)[1 + {_sorteio('i', 1)} % {len(SOBRENOMES)}] || ' ' || "
+        f"(:sobrenomes)[1 + {_sorteio('i', 2)} % {len(SOBRENOMES)}]"
+    )
+    # 1..por_dia: escalados (cargo e turno pela posição); depois, a reserva
+    db.session.execute(text(f"""
+        INSERT INTO profissionais (id, nome, cargo, email, telefone, ativo)
+        SELECT :bprof + i, {nome},
+               (:cargos)[1 + CASE WHEN i <= :por_dia THEN (i - 1) % {len(CARGOS)}
+                                  ELSE {_sorteio('i', 3)} % {len(CARGOS)} END],
+               'profissional' || (:bprof + i) || '@sintetico.local',
+               '119' || lpad(({_sorteio('i', 4)} % 100000000)::text, 8, '0'),
+               i <= :por_dia OR {_sorteio('i', 5)} % 10 > 0
+          FROM generate_series(1, :por_dia + :reserva) AS i
+    """), p)
+    db.session.execute(text("""
+        INSERT INTO auditoria (entidade, id_entidade, acao, usuario, data_hora)
+        SELECT 'profissional', :bprof + i, 'criado', 'sintetico', :inicio - INTERVAL '60 days'
+          FROM generate_series(1, :por_dia + :reserva) AS i
+    """), p)
+
+
+def _lote(p, i0, i1):
+    """Plantões [i0, i1) (índice = dia * por_dia + posição) e o que deriva deles."""
+    p = {**p, "i0": i0, "i1": i1}
+    besc = db.session.execute(text("SELECT COALESCE(MAX(id), 0) FROM escalas")).scalar()
+    bsub = db.session.execute(text("SELECT COALESCE(MAX(id), 0) FROM substituicoes")).scalar()
+    p.update(besc=besc, bsub=bsub)
+
+    db.session.execute(text(f"""
+        INSERT INTO plantoes (id, data, hora_inicio, hora_fim, id_funcao, id_local)
+        SELECT :bpl + i + 1, :inicio + i / :por_dia,
+               {_HORA_INICIO}, {_HORA_FIM},
+               1 + i % :por_dia % {len(CARGOS)}, 1 + {_sorteio('i', 6)} % 20
+          FROM generate_series(:i0, :i1 - 1) AS i
+    """), p)
+    # O gerador já fornece o período e só referencia escalas existentes: os triggers que
+    # derivam periodo e conferem substituicoes -> escalas são desligados nesta transação
+    # (buscam por id em todas as partições, linha a linha)
+    db.session.execute(text("ALTER TABLE escalas DISABLE TRIGGER trg_escalas_periodo"))
+    db.session.execute(text("ALTER TABLE substituicoes DISABLE TRIGGER trg_substituicoes_escala"))
+    db.session.execute(text(f"""
+        INSERT INTO escalas (id_plantao, data_plantao, id_profissional, status, data_alocacao, periodo)
+        SELECT :bpl + i + 1, :inicio + i / :por_dia, :bprof + 1 + i % :por_dia,
+               CASE WHEN {_sorteio('i', 7)} % 100 < {PCT_CANCELADAS} THEN 'cancelado' ELSE 'ativo' END,
+               (:inicio + i / :por_dia) - (1 + {_sorteio('i', 8)} % 30) * INTERVAL '1 day'
+                   + (480 + {_sorteio('i', 9)} % 600) * INTERVAL '1 minute',
+               periodo_do_plantao(:inicio + i / :por_dia, {_HORA_INICIO}, {_HORA_FIM})
+          FROM generate_series(:i0, :i1 - 1) AS i
+         WHERE {_sorteio('i', 10)} % 100 >= {PCT_VAGOS}
+         ORDER BY i
+    """), p)
+    db.session.execute(text(f"""
+        INSERT INTO substituicoes (id_escala_original, id_profissional_solicitante, id_profissional_substituto,
+                                   data_solicitacao, status, decidida_por, decidida_em)
+        SELECT e.id, e.id_profissional, e.substituto, e.solicitada, e.status,
+               CASE WHEN e.status <> 'pendente' THEN 'supervisor' || (1 + e.id % 5) END,
+               CASE WHEN e.status <> 'pendente' THEN e.solicitada + (1 + e.id % 48) * INTERVAL '1 hour' END
+          FROM (SELECT e.id, e.id_profissional,
+                       :bprof + :por_dia + 1 + {_sorteio('e.id', 11)} % :reserva AS substituto,
+                       e.data_alocacao + (60 + {_sorteio('e.id', 12)} % 1440) * INTERVAL '1 minute' AS solicitada,
+                       CASE WHEN {_sorteio('e.id', 13)} % 100 < 15 THEN 'pendente'
+                            WHEN {_sorteio('e.id', 13)} % 100 < 70 THEN 'aprovado'
+                            ELSE 'recusado' END AS status
+                  FROM escalas e
+                 WHERE e.id > :besc AND e.status = 'ativo'
+                   AND {_sorteio('e.id', 14)} % 100 < {PCT_SUBSTITUICOES}) e
+         ORDER BY e.id
+    """), p)
+    db.session.execute(text("""
+        INSERT INTO auditoria (entidade, id_entidade, acao, usuario, data_hora)
+        SELECT 'plantao', :bpl + i + 1, 'criado', 'sintetico', :inicio + i / :por_dia - INTERVAL '45 days'
+          FROM generate_series(:i0, :i1 - 1) AS i
+        UNION ALL
+        SELECT 'escala', id, 'criado', 'sintetico', data_alocacao FROM escalas WHERE id > :besc
+        UNION ALL
+        SELECT 'substituicao', id, 'criado', 'sintetico', data_solicitacao FROM substituicoes WHERE id > :bsub
+        UNION ALL
+        SELECT 'substituicao', id, status, decidida_por, decidida_em
+          FROM substituicoes WHERE id > :bsub AND status <> 'pendente'
+    """), p)
+    db.session.execute(text("ALTER TABLE escalas ENABLE TRIGGER trg_escalas_periodo"))
+    db.session.execute(text("ALTER TABLE substituicoes ENABLE TRIGGER trg_substituicoes_escala"))
+    db.session.commit()
+
+
+def _finalizar(p):
+    from ..cache import marcar_alteradas
+    from .resumos import reconstruir_resumos
+    from .substitutos import invalidar_indice
+
+    for tabela in TABELAS:
+        db.session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{tabela}', 'id'), "
+            f"GREATEST((SELECT MAX(id) FROM {tabela}), 1))"
+        ))
+    marcar_alteradas(db.session, "profissionais", "plantoes", "escalas", "substituicoes")
+    db.session.execute(text("""
+        INSERT INTO versoes_agendas (id_profissional, versao, alterado_em)
+        SELECT :bprof + i, 1, now() AT TIME ZONE 'utc' FROM generate_series(1, :por_dia + :reserva) AS i
+        ON CONFLICT (id_profissional) DO UPDATE SET versao = versoes_agendas.versao + 1,
+                                                    alterado_em = EXCLUDED.alterado_em
+    """), p)
+    reconstruir_resumos()  # confirma também as versões das tabelas
+    invalidar_indice()
+    for tabela in TABELAS:
+        db.session.execute(text(f"ANALYZE {tabela}"))
+    db.session.commit()
+
+
+# ------------------------------------------------------------
+# 🔹 Geração
+# ------------------------------------------------------------
+def gerar(linhas, semente=42, inicio=date(2024, 1, 1), limpar=False, lote=200_000, progresso=None):
+    """Gera ~`linhas` plantões a partir de `inicio` (e os demais registros em proporção).
+
+    Com `limpar`, esvazia antes as tabelas (e reinicia os ids): mesma
+    semente, mesmos dados. Sem ele, os dados são acrescentados aos
+    existentes, com profissionais novos. `progresso(mensagem)` recebe
+    o andamento. Retorna o total de linhas por tabela e o tempo.
+    """
+    if linhas < 1:
+        raise ValueError("Informe ao menos 1 linha.")
+    t0 = time.perf_counter()
+    avisar = progresso or (lambda mensagem: None)
+
+    if limpar:
+        _limpar()
+    antes = {t: db.session.execute(text(f"SELECT COUNT(*) FROM {t}")).scalar() for t in TABELAS}
+    dias, por_dia, reserva = dimensoes(linhas)
+    p = {
+        "semente": semente, "inicio": inicio, "por_dia": por_dia, "reserva": reserva,
+        "nomes": list(NOMES), "sobrenomes": list(SOBRENOMES), "cargos": list(CARGOS),
+        "bprof": db.session.execute(text("SELECT COALESCE(MAX(id), 0) FROM profissionais")).scalar(),
+        "bpl": db.session.execute(text("SELECT COALESCE(MAX(id), 0) FROM plantoes")).scalar(),
+    }
+    avisar(f"{dias} dias a partir de {inicio}, {por_dia} profissionais escalados por dia "
+           f"(+{reserva} de reserva)")
+
+    db.session.execute(
+        text("SELECT criar_particoes_mes(m::date) FROM generate_series(:inicio, :fim, INTERVAL '1 month') AS m"),
+        {"inicio": inicio.replace(day=1), "fim": inicio + timedelta(days=dias - 1)},
+    )
+    _profissionais(p)
+    db.session.commit()
+
+    total = dias * por_dia
+    passo = max(1, lote // por_dia) * por_dia  # lotes de dias inteiros
+    for i0 in range(0, total, passo):
+        i1 = min(total, i0 + passo)
+        t_lote = time.perf_counter()
+        _lote(p, i0, i1)
+        avisar(f"{inicio + timedelta(days=i0 // por_dia)} a {inicio + timedelta(days=i1 // por_dia - 1)}: "
+               f"{i1 - i0} plantões em {time.perf_counter() - t_lote:.1f} s")
+
+    _finalizar(p)
+    depois = {t: db.session.execute(text(f"SELECT COUNT(*) FROM {t}")).scalar() for t in TABELAS}
+    return {
+        "tabelas": {t: depois[t] - antes[t] for t in TABELAS},
+        "dias": dias,
+        "tempo_s": round(time.perf_counter() - t0, 1),
+    }
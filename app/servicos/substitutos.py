@@ -0,0 +1,210 @@
+# ============================================================
+# 🧠 Serviço — Sugestão de Substitutos
+# ============================================================
+# Implementa a lógica descrita em docs/logica_substitutos.md
+# sem o padrão N+1 do pseudocódigo: as alocações ativas ficam
+# em um índice em memória (intervalos ordenados por profissional
+# + contador de carga), reconstruído com UMA consulta e
+# invalidado sempre que escalas ou plantões são alterados.
+# ============================================================
+
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .. import db
+from ..models import Escala, Plantao, Profissional
+
+# Nenhum plantão ultrapassa 24h (hora_inicio/hora_fim são TIME)
+DURACAO_MAXIMA = timedelta(hours=24)
+
+
+def intervalo_do_plantao(data, hora_inicio, hora_fim):
+    """Converte um plantão em intervalo [início, fim), tratando a virada de dia."""
+    inicio = datetime.combine(data, hora_inicio)
+    fim = datetime.combine(data, hora_fim)
+    if fim <= inicio:
+        fim += timedelta(days=1)  # plantão noturno (ex.: 19:00 às 07:00)
+    return inicio, fim
+
+
+# ------------------------------------------------------------
+# 🔹 Índice de alocações ativas
+# ------------------------------------------------------------
+class IndiceAlocacoes:
+    """Intervalos ordenados por profissional e carga de plantões ativos."""
+
+    def __init__(self):
+        self._intervalos = {}  # id_profissional -> [(inicio, fim), ...] ordenado
+        self.carga = Counter()
+        self.criado_em = time.monotonic()
+
+    @classmethod
+    def carregar(cls, session):
+        """Monta o índice com uma única consulta (escalas ativas ⨝ plantões)."""
+        indice = cls()
+        linhas = session.execute(
+            db.select(Escala.id_profissional, Plantao.data, Plantao.hora_inicio, Plantao.hora_fim)
+            .join(Escala.plantao)
+            .where(Escala.status == "ativo")
+        )
+        for id_profissional, data, hora_inicio, hora_fim in linhas:
+            indice.adicionar(id_profissional, *intervalo_do_plantao(data, hora_inicio, hora_fim))
+        return indice
+
+    def adicionar(self, id_profissional, inicio, fim):
+        insort(self._intervalos.setdefault(id_profissional, []), (inicio, fim))
+        self.carga[id_profissional] += 1
+
+    def conflita(self, id_profissional, inicio, fim):
+        """Indica se o profissional já tem alocação sobreposta a [inicio, fim)."""
+        intervalos = self._intervalos.get(id_profissional, [])
+        pos = bisect_left(intervalos, (fim,))
+        # Só precisam ser verificados os intervalos que começam até 24h antes
+        while pos > 0:
+            pos -= 1
+            ini, f = intervalos[pos]
+            if ini < inicio - DURACAO_MAXIMA:
+                break
+            if f > inicio:
+                return True
+        return False
+
+    def ultima_atuacao(self, id_profissional, antes_de):
+        """Fim do plantão mais recente encerrado até `antes_de` (ou None)."""
+        intervalos = self._intervalos.get(id_profissional, [])
+        pos = bisect_left(intervalos, (antes_de,))
+        ultima = None
+        while pos > 0:
+            pos -= 1
+            ini, f = intervalos[pos]
+            if ultima is not None and ini + DURACAO_MAXIMA <= ultima:
+                break  # os anteriores terminam antes do já encontrado
+            if f <= antes_de and (ultima is None or f > ultima):
+                ultima = f
+        return ultima
+
+
+# ------------------------------------------------------------
+# 🔹 Cache do índice por processo
+# ------------------------------------------------------------
+# O índice é compartilhado entre as requisições do processo e
+# descartado quando esta instância confirma gravações em escalas/
+# plantões (no commit: até lá as outras sessões nem veem a mudança).
+# Para gravações feitas por outros processos, vale o TTL configurado
+# em SUGESTAO_INDICE_TTL (segundos).
+_lock = threading.Lock()
+_indice = None
+
+ENTIDADES_DO_INDICE = (Escala, Plantao)
+
+_ALTERADO = "indice_alterado"  # session.info: a transação gravou escalas/plantões
+_SUJO = "indice_sujo"  # session.info: índice montado com essas gravações ainda pendentes
+
+
+def invalidar_indice():
+    """Descarta o índice; a próxima sugestão o reconstrói."""
+    global _indice
+    with _lock:
+        _indice = None
+
+
+def obter_indice(ttl=60):
+    """Retorna o índice atual, reconstruindo-o se necessário."""
+    global _indice
+    with _lock:
+        if _indice is None or time.monotonic() - _indice.criado_em > ttl:
+            _indice = IndiceAlocacoes.carregar(db.session)
+            if db.session.info.get(_ALTERADO):
+                # Lido com as gravações ainda não confirmadas desta transação
+                db.session.info[_SUJO] = _indice
+        return _indice
+
+
+@event.listens_for(Session, "after_flush")
+def _marcar_apos_flush(session, flush_context):
+    alterados = list(session.new) + list(session.dirty) + list(session.deleted)
+    if any(isinstance(obj, ENTIDADES_DO_INDICE) for obj in alterados):
+        session.info[_ALTERADO] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_apos_commit(session):
+    session.info.pop(_SUJO, None)
+    if session.info.pop(_ALTERADO, False):
+        invalidar_indice()
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_apos_rollback(session):
+    global _indice
+    session.info.pop(_ALTERADO, None)
+    sujo = session.info.pop(_SUJO, None)
+    # Só descarta o índice se ele foi montado com as gravações desfeitas
+    with _lock:
+        if sujo is not None and _indice is sujo:
+            _indice = None
+
+
+# ------------------------------------------------------------
+# 🔹 Sugestão de substitutos
+# ------------------------------------------------------------
+def sugerir_substituto(id_solicitante, id_plantao, k=5, ttl=60):
+    """Retorna até `k` substitutos elegíveis, do mais indicado ao menos indicado.
+
+    Critérios (docs/logica_substitutos.md): mesmo cargo, status ativo,
+    sem conflito de horário, menor carga e, no empate, atuação mais recente.
+    Usa três consultas fixas (plantão, cargo do solicitante e candidatos); disponibilidade e carga
+    vêm do índice em memória. Retorna None se plantão ou solicitante não existem.
+    """
+    plantao = db.session.execute(
+        db.select(Plantao.data, Plantao.hora_inicio, Plantao.hora_fim).where(Plantao.id == id_plantao)
+    ).one_or_none()
+    if plantao is None:
+        return None
+
+    solicitante_cargo = db.session.execute(
+        db.select(Profissional.cargo).where(Profissional.id == id_solicitante)
+    ).scalar_one_or_none()
+    if solicitante_cargo is None:
+        return None
+
+    candidatos = db.session.execute(
+        db.select(Profissional.id, Profissional.nome, Profissional.cargo)
+        .where(
+            Profissional.cargo == solicitante_cargo,
+            Profissional.ativo.is_(True),
+            Profissional.id != id_solicitante,
+        )
+    ).all()
+
+    indice = obter_indice(ttl)
+    inicio, fim = intervalo_do_plantao(*plantao)
+
+    ranqueados = []
+    for id_prof, nome, cargo in candidatos:
+        if indice.conflita(id_prof, inicio, fim):
+            continue
+        ultima = indice.ultima_atuacao(id_prof, inicio)
+        # Menor carga primeiro; no empate, quem atuou mais recentemente
+        chave = (indice.carga[id_prof], -(ultima.timestamp() if ultima else float("-inf")), nome, id_prof)
+        ranqueados.append((chave, id_prof, nome, cargo, ultima))
+
+    ranqueados.sort(key=lambda item: item[0])
+
+    return [
+        {
+            "id": id_prof,
+            "nome": nome,
+            "cargo": cargo,
+            "plantoes_ativos": indice.carga[id_prof],
+            "ultima_atuacao": ultima.isoformat() if ultima else None,
+            "posicao": posicao,
+        }
+        for posicao, (_, id_prof, nome, cargo, ultima) in enumerate(ranqueados[:k], start=1)
+    ]
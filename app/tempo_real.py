@@ -0,0 +1,225 @@
+# ============================================================
+# 📡 Tempo Real — LISTEN/NOTIFY e Server-Sent Events
+# ============================================================
+# Triggers em substituicoes e escalas publicam cada alteração
+# confirmada no canal escala360_alteracoes (escala360.sql). Em cada
+# processo, um único Ouvinte (thread) mantém UMA conexão com LISTEN
+# e repassa os avisos às assinaturas — uma fila em memória por
+# navegador conectado a GET /api/alteracoes. As abas abertas não
+# ocupam conexões com o banco nem do pool.
+#   • o ouvinte nasce com a primeira assinatura (já no worker, após
+#     o fork do gunicorn) e reconecta sozinho; depois de uma queda os
+#     clientes recebem "recarregar" (avisos podem ter se perdido);
+#   • cada evento tem id "<processo>-<sequência>": o navegador que
+#     reconecta com Last-Event-ID recebe o que perdeu, se ainda
+#     estiver no histórico do processo, ou "recarregar";
+#   • cliente lento (fila cheia) tem a fila trocada por "recarregar".
+# LISTEN exige conexão de sessão: atrás do pooler de transações
+# (PgBouncer) use TEMPO_REAL_DATABASE_URL com a URL direta.
+# ============================================================
+
+import json
+import os
+import queue
+import secrets
+import select
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+
+from .inicializacao import usa_pooler
+
+CANAL = "escala360_alteracoes"
+TABELAS = ("substituicoes", "escalas")
+RECARREGAR = "recarregar"
+
+_CHAVE = "escala360_tempo_real"
+
+
+class Assinatura:
+    """Fila de eventos de um cliente SSE, filtrada pelas tabelas de interesse."""
+
+    def __init__(self, tabelas, max_fila):
+        self.tabelas = set(tabelas)
+        self.fila = queue.Queue(max_fila)
+
+    def entregar(self, evento):
+        if evento["tipo"] != RECARREGAR and evento["tipo"] not in self.tabelas:
+            return
+        try:
+            self.fila.put_nowait(evento)
+        except queue.Full:
+            # Cliente lento: descarta o acumulado e pede que recarregue
+            with self.fila.mutex:
+                self.fila.queue.clear()
+            self.fila.put_nowait({"id": evento["id"], "tipo": RECARREGAR, "dados": "{}"})
+
+
+class Ouvinte:
+    """Conexão LISTEN compartilhada pelo processo e distribuição dos avisos."""
+
+    def __init__(self, url, connect_args, logger, max_clientes=100, max_fila=500, historico=1000):
+        self.url = url
+        self.connect_args = connect_args
+        self.logger = logger
+        self.max_clientes = max_clientes
+        self.max_fila = max_fila
+        self._historico = deque(maxlen=historico)
+        self._assinaturas = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._processo = None
+        self._sequencia = 0
+
+    # -- assinaturas ------------------------------------------------
+    def assinar(self, tabelas, ultimo_id=None):
+        """Retorna (assinatura, eventos perdidos desde `ultimo_id`) ou None se lotado."""
+        with self._lock:
+            if len(self._assinaturas) >= self.max_clientes:
+                return None
+            self._iniciar()
+            assinatura = Assinatura(tabelas, self.max_fila)
+            self._assinaturas.add(assinatura)
+            perdidos = self._desde(ultimo_id) if ultimo_id else []
+            if perdidos is None:
+                perdidos = [{"id": f"{self._processo}-{self._sequencia}", "tipo": RECARREGAR, "dados": "{}"}]
+        return assinatura, [e for e in perdidos if e["tipo"] == RECARREGAR or e["tipo"] in assinatura.tabelas]
+
+    def cancelar(self, assinatura):
+        with self._lock:
+            self._assinaturas.discard(assinatura)
+
+    def _desde(self, ultimo_id):
+        """Eventos do histórico posteriores a `ultimo_id`; None se não der para saber."""
+        processo, _, sequencia = ultimo_id.rpartition("-")
+        if processo != self._processo or not sequencia.isdigit():
+            return None
+        sequencia = int(sequencia)
+        if sequencia >= self._sequencia:
+            return []
+        if not self._historico or int(self._historico[0]["id"].rpartition("-")[2]) > sequencia + 1:
+            return None  # já saiu do histórico
+        return [e for e in self._historico if int(e["id"].rpartition("-")[2]) > sequencia]
+
+    def _proximo_id(self):
+        self._sequencia += 1
+        return f"{self._processo}-{self._sequencia}"
+
+    def _publicar(self, tipo, dados):
+        with self._lock:
+            evento = {"id": self._proximo_id(), "tipo": tipo, "dados": dados}
+            self._historico.append(evento)
+            assinaturas = list(self._assinaturas)
+        for assinatura in assinaturas:
+            assinatura.entregar(evento)
+
+    # -- conexão ------------------------------------------------------
+    def _iniciar(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        # Identifica o processo nos ids dos eventos (cada worker tem o seu histórico)
+        self._processo = f"{os.getpid():x}{secrets.token_hex(2)}"
+        self._sequencia = 0
+        self._historico.clear()
+        self._thread = threading.Thread(target=self._executar, name="escala360-listen", daemon=True)
+        self._thread.start()
+
+    def _executar(self):
+        # Conexão em autocommit: nada a desfazer ao fechar (nem depois de cair)
+        engine = create_engine(self.url, poolclass=NullPool, pool_reset_on_return=None,
+                               connect_args=self.connect_args)
+        espera, conectou_antes = 1, False
+        while True:
+            conexao = None
+            try:
+                conexao = engine.raw_connection()
+                bruta = conexao.driver_connection
+                bruta.autocommit = True
+                with bruta.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CANAL}")
+                self.logger.info(f"📡 LISTEN {CANAL} (processo {os.getpid()})")
+                if conectou_antes:
+                    self._publicar(RECARREGAR, "{}")  # avisos podem ter se perdido na queda
+                conectou_antes, espera = True, 1
+                self._escutar(bruta)
+            except Exception as e:
+                self.logger.warning(f"⚠️ Conexão do LISTEN perdida: {e}; nova tentativa em {espera} s")
+            finally:
+                if conexao is not None:
+                    conexao.close()
+            time.sleep(espera)
+            espera = min(espera * 2, 30)
+
+    def _escutar(self, bruta):
+        while True:
+            if select.select([bruta], [], [], 30) == ([], [], []):
+                with bruta.cursor() as cursor:
+                    cursor.execute("SELECT 1")  # detecta conexão perdida em silêncio
+                continue
+            bruta.poll()
+            while bruta.notifies:
+                aviso = bruta.notifies.pop(0)
+                try:
+                    tabela = json.loads(aviso.payload)["tabela"]
+                except (ValueError, KeyError):
+                    continue
+                self._publicar(tabela, aviso.payload)
+
+
+# ------------------------------------------------------------
+# 🔹 Server-Sent Events
+# ------------------------------------------------------------
+def formatar_evento(evento):
+    return f"id: {evento['id']}\nevent: {evento['tipo']}\ndata: {evento['dados']}\n\n"
+
+
+def transmitir(ouvinte, assinatura, perdidos, intervalo_ping=15):
+    """Gerador do corpo SSE: eventos perdidos, depois os novos e comentários de ping."""
+    try:
+        yield "retry: 3000\n\n"
+        for evento in perdidos:
+            yield formatar_evento(evento)
+        while True:
+            try:
+                evento = assinatura.fila.get(timeout=intervalo_ping)
+            except queue.Empty:
+                yield ": ping\n\n"  # mantém proxies abertos e detecta cliente que saiu
+                continue
+            yield formatar_evento(evento)
+    finally:
+        ouvinte.cancelar(assinatura)
+
+
+def url_do_listen(app):
+    """URL da conexão LISTEN: TEMPO_REAL_DATABASE_URL ou a do primário.
+
+    No Neon o endpoint direto é o host sem '-pooler'.
+    """
+    url = os.getenv("TEMPO_REAL_DATABASE_URL")
+    if url:
+        return url
+    url = app.config["SQLALCHEMY_DATABASE_URI"]
+    if usa_pooler(url):
+        if "-pooler" not in url:
+            app.logger.warning("⚠️ LISTEN atrás de pooler de transações: defina TEMPO_REAL_DATABASE_URL")
+        url = url.replace("-pooler", "")
+    return url
+
+
+def registrar_tempo_real(app):
+    """Cria o ouvinte do processo (fora do modo serverless, onde não há conexão longa)."""
+    if app.config["MODO_EXECUCAO"] == "serverless":
+        return
+    app.extensions[_CHAVE] = Ouvinte(
+        url_do_listen(app),
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"].get("connect_args", {}),
+        app.logger,
+        max_clientes=app.config["TEMPO_REAL_MAX_CLIENTES"],
+    )
+
+
+def ouvinte_da_app(app):
+    return app.extensions.get(_CHAVE)
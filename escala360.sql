@@ -1,3 +1,17 @@
+-- ===================================
+-- Extensões e funções
+-- ===================================
+
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+-- Intervalo [início, fim) de um plantão (plantões noturnos terminam no dia seguinte)
+CREATE FUNCTION periodo_do_plantao(d DATE, inicio TIME, fim TIME)
+RETURNS tsrange LANGUAGE sql IMMUTABLE AS $$
+    SELECT tsrange(d + inicio,
+                   d + fim + CASE WHEN fim <= inicio THEN interval '1 day'
+                                  ELSE interval '0' END)
+$$;
+
 -- ===================================
 -- Tabelas
 -- ===================================
@@ -11,39 +25,357 @@ CREATE TABLE profissionais (
     ativo BOOLEAN DEFAULT true
 );
 
+-- Plantões e escalas são particionados por mês da data do plantão: as
+-- consultas de um período leem só as partições dele e os meses encerrados
+-- podem ser desanexados e arquivados (funções de partição mais abaixo).
+-- A chave primária inclui a chave de partição; o id continua único pela
+-- sequência.
 CREATE TABLE plantoes (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     data DATE NOT NULL,
     hora_inicio TIME NOT NULL,
     hora_fim TIME NOT NULL,
     id_funcao INTEGER NOT NULL,
-    id_local INTEGER NOT NULL
-);
+    id_local INTEGER NOT NULL,
+    PRIMARY KEY (id, data)
+) PARTITION BY RANGE (data);
 
 CREATE TABLE escalas (
-    id SERIAL PRIMARY KEY,
-    id_plantao INTEGER NOT NULL REFERENCES plantoes(id),
+    id SERIAL,
+    id_plantao INTEGER NOT NULL,
+    data_plantao DATE NOT NULL,  -- chave de partição (= plantoes.data; mantida pelo trigger abaixo)
     id_profissional INTEGER NOT NULL REFERENCES profissionais(id),
     status TEXT DEFAULT 'ativo',
-    data_alocacao TIMESTAMP DEFAULT now()
-);
+    data_alocacao TIMESTAMP NOT NULL DEFAULT now(),
+    periodo TSRANGE,  -- preenchido pelos triggers abaixo
+    versao INTEGER NOT NULL DEFAULT 1,  -- controle otimista (aprovação de substituições)
+    PRIMARY KEY (id, data_plantao),
+    -- Mudar a data do plantão move as escalas junto (PostgreSQL 15+)
+    CONSTRAINT escalas_plantao_fkey FOREIGN KEY (id_plantao, data_plantao)
+        REFERENCES plantoes (id, data) ON UPDATE CASCADE
+) PARTITION BY RANGE (data_plantao);
+-- Um profissional não pode ter duas escalas ativas sobrepostas: restrições
+-- de exclusão só existem por partição, então escalas_<AAAA_MM>_sem_sobreposicao
+-- é criada com cada mês (criar_particoes_mes). Sobreposições entre meses
+-- diferentes (plantão noturno do último dia) são apontadas por
+-- `flask escalas conflitos`.
+
+CREATE FUNCTION escalas_definir_periodo() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    p plantoes%ROWTYPE;
+BEGIN
+    -- data_plantao já vem preenchida (é a chave de partição): lê só a partição do mês.
+    -- Se não bater com a data do plantão, a chave estrangeira recusa a linha.
+    SELECT * INTO p FROM plantoes WHERE id = NEW.id_plantao AND data = NEW.data_plantao;
+    IF FOUND THEN
+        NEW.periodo := periodo_do_plantao(p.data, p.hora_inicio, p.hora_fim);
+    END IF;
+    RETURN NEW;
+END
+$$;
+
+CREATE TRIGGER trg_escalas_periodo
+BEFORE INSERT OR UPDATE OF id_plantao ON escalas
+FOR EACH ROW EXECUTE FUNCTION escalas_definir_periodo();
+
+-- A data nova já chegou às escalas pela chave estrangeira (ON UPDATE CASCADE)
+CREATE FUNCTION plantoes_propagar_periodo() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE escalas
+       SET periodo = periodo_do_plantao(NEW.data, NEW.hora_inicio, NEW.hora_fim)
+     WHERE id_plantao = NEW.id AND data_plantao = NEW.data;
+    RETURN NEW;
+END
+$$;
+
+CREATE TRIGGER trg_plantoes_periodo
+AFTER UPDATE OF data, hora_inicio, hora_fim ON plantoes
+FOR EACH ROW EXECUTE FUNCTION plantoes_propagar_periodo();
 
 CREATE TABLE substituicoes (
     id SERIAL PRIMARY KEY,
-    id_escala_original INTEGER NOT NULL REFERENCES escalas(id),
+    id_escala_original INTEGER NOT NULL,  -- escalas(id): garantida pelos triggers abaixo
     id_profissional_solicitante INTEGER NOT NULL REFERENCES profissionais(id),
     id_profissional_substituto INTEGER NOT NULL REFERENCES profissionais(id),
-    data_solicitacao TIMESTAMP DEFAULT now(),
-    status TEXT DEFAULT 'pendente'
+    data_solicitacao TIMESTAMP NOT NULL DEFAULT now(),
+    status TEXT DEFAULT 'pendente',
+    versao INTEGER NOT NULL DEFAULT 1,  -- controle otimista (fila de aprovação)
+    reservada_por VARCHAR(120),         -- aprovador que reservou a pendente...
+    reservada_ate TIMESTAMP,            -- ...até quando (depois volta para a fila)
+    decidida_por VARCHAR(120),
+    decidida_em TIMESTAMP
 );
 
+-- escalas(id) não é chave única da tabela particionada: a chave estrangeira
+-- de substituicoes é garantida por triggers dos dois lados.
+CREATE FUNCTION substituicoes_verificar_escala() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM 1 FROM escalas WHERE id = NEW.id_escala_original FOR KEY SHARE;
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'escala % não existe', NEW.id_escala_original
+            USING ERRCODE = 'foreign_key_violation';
+    END IF;
+    RETURN NEW;
+END
+$$;
+
+CREATE TRIGGER trg_substituicoes_escala
+BEFORE INSERT OR UPDATE OF id_escala_original ON substituicoes
+FOR EACH ROW EXECUTE FUNCTION substituicoes_verificar_escala();
+
+-- Uma escala que muda de mês (UPDATE entre partições) também passa por
+-- aqui, mas continua existindo
+CREATE FUNCTION escalas_verificar_substituicoes() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM substituicoes WHERE id_escala_original = OLD.id)
+       AND NOT EXISTS (SELECT 1 FROM escalas WHERE id = OLD.id) THEN
+        RAISE EXCEPTION 'escala % é referenciada em substituicoes', OLD.id
+            USING ERRCODE = 'foreign_key_violation';
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER trg_escalas_substituicoes
+AFTER DELETE ON escalas
+FOR EACH ROW EXECUTE FUNCTION escalas_verificar_substituicoes();
+
 CREATE TABLE auditoria (
     id SERIAL PRIMARY KEY,
     entidade TEXT NOT NULL,
     id_entidade INTEGER NOT NULL,
     acao TEXT NOT NULL,
     usuario TEXT NOT NULL,
-    data_hora TIMESTAMP DEFAULT now()
+    data_hora TIMESTAMP NOT NULL DEFAULT now()
+);
+
+-- Consulta da trilha por período (GET /api/auditoria) e por registro
+CREATE INDEX idx_auditoria_data_hora ON auditoria (data_hora DESC, id DESC);
+CREATE INDEX idx_auditoria_entidade ON auditoria (entidade, id_entidade, data_hora DESC);
+
+-- ===================================
+-- Índices (formato das consultas das rotas e serviços;
+-- conferidos com `python verificar_planos.py`)
+-- ===================================
+
+-- Listagem de profissionais (ORDER BY nome, id) e candidatos por cargo
+CREATE INDEX idx_profissionais_nome ON profissionais (nome, id);
+CREATE INDEX idx_profissionais_cargo ON profissionais (cargo, nome, id);
+
+-- Listagem de plantões e filtros por período (conflitos, vagos, preenchimento)
+CREATE INDEX idx_plantoes_data ON plantoes (data, hora_inicio, id);
+
+-- Escalas de um plantão/profissional (status = 'ativo' resolvido no índice)
+CREATE INDEX idx_escalas_plantao ON escalas (id_plantao, status);
+CREATE INDEX idx_escalas_profissional ON escalas (id_profissional, status);
+-- Listagem de escalas (ORDER BY data_alocacao DESC, id DESC)
+CREATE INDEX idx_escalas_alocacao ON escalas (data_alocacao, id);
+
+-- Listagem de substituições (ORDER BY data_solicitacao DESC, id DESC)
+CREATE INDEX idx_substituicoes_solicitacao ON substituicoes (data_solicitacao, id);
+-- Fila de pendentes (GET /api/substituicoes): índice só com as pendentes
+CREATE INDEX idx_substituicoes_pendentes ON substituicoes (data_solicitacao, id)
+    WHERE status = 'pendente';
+-- Chaves estrangeiras (junções e exclusões em cascata)
+CREATE INDEX idx_substituicoes_escala ON substituicoes (id_escala_original);
+CREATE INDEX idx_substituicoes_solicitante ON substituicoes (id_profissional_solicitante);
+CREATE INDEX idx_substituicoes_substituto ON substituicoes (id_profissional_substituto);
+
+-- ===================================
+-- Partições mensais (plantões / escalas)
+-- ===================================
+
+-- Cria (se faltarem) as partições do mês de `mes` em plantoes e escalas
+CREATE FUNCTION criar_particoes_mes(mes DATE) RETURNS void
+LANGUAGE plpgsql AS $$
+DECLARE
+    inicio DATE := date_trunc('month', mes)::date;
+    fim DATE := (date_trunc('month', mes) + interval '1 month')::date;
+    sufixo TEXT := to_char(mes, 'YYYY_MM');
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('escala360.particoes'));
+    IF to_regclass('arquivo.plantoes_' || sufixo) IS NOT NULL THEN
+        RAISE EXCEPTION 'o mês % já foi arquivado', to_char(mes, 'YYYY-MM');
+    END IF;
+    IF to_regclass('public.plantoes_' || sufixo) IS NULL THEN
+        EXECUTE format('CREATE TABLE %I PARTITION OF plantoes FOR VALUES FROM (%L) TO (%L)',
+                       'plantoes_' || sufixo, inicio, fim);
+    END IF;
+    IF to_regclass('public.escalas_' || sufixo) IS NULL THEN
+        EXECUTE format('CREATE TABLE %I PARTITION OF escalas FOR VALUES FROM (%L) TO (%L)',
+                       'escalas_' || sufixo, inicio, fim);
+        EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I '
+                       'EXCLUDE USING gist (id_profissional WITH =, periodo WITH &&) '
+                       'WHERE (status = ''ativo'')',
+                       'escalas_' || sufixo, 'escalas_' || sufixo || '_sem_sobreposicao');
+    END IF;
+END
+$$;
+
+-- Desanexa o mês de `mes` e o move para o esquema "arquivo", junto com
+-- as substituições das escalas dele (arquivo.substituicoes_<AAAA_MM>)
+CREATE FUNCTION arquivar_mes(mes DATE) RETURNS void
+LANGUAGE plpgsql AS $$
+DECLARE
+    inicio DATE := date_trunc('month', mes)::date;
+    fim DATE := (date_trunc('month', mes) + interval '1 month')::date;
+    sufixo TEXT := to_char(mes, 'YYYY_MM');
+    restricao TEXT;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('escala360.particoes'));
+    IF to_regclass('public.escalas_' || sufixo) IS NULL THEN
+        RAISE EXCEPTION 'o mês % não tem partição ativa', to_char(mes, 'YYYY-MM');
+    END IF;
+    CREATE SCHEMA IF NOT EXISTS arquivo;
+
+    EXECUTE format('CREATE TABLE arquivo.%I AS '
+                   'SELECT s.* FROM substituicoes s JOIN escalas e ON e.id = s.id_escala_original '
+                   'WHERE e.data_plantao >= %L AND e.data_plantao < %L',
+                   'substituicoes_' || sufixo, inicio, fim);
+    DELETE FROM substituicoes s USING escalas e
+     WHERE e.id = s.id_escala_original AND e.data_plantao >= inicio AND e.data_plantao < fim;
+
+    EXECUTE format('ALTER TABLE escalas DETACH PARTITION %I', 'escalas_' || sufixo);
+    -- A tabela desanexada mantém cópias das chaves estrangeiras: o arquivo é só leitura
+    FOR restricao IN
+        SELECT conname FROM pg_constraint
+         WHERE conrelid = ('public.escalas_' || sufixo)::regclass AND contype = 'f'
+    LOOP
+        EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', 'escalas_' || sufixo, restricao);
+    END LOOP;
+    EXECUTE format('ALTER TABLE plantoes DETACH PARTITION %I', 'plantoes_' || sufixo);
+
+    EXECUTE format('ALTER TABLE %I SET SCHEMA arquivo', 'escalas_' || sufixo);
+    EXECUTE format('ALTER TABLE %I SET SCHEMA arquivo', 'plantoes_' || sufixo);
+END
+$$;
+
+-- Meses dos dados iniciais até 12 meses à frente (depois: `flask particoes criar`)
+SELECT criar_particoes_mes(m::date)
+  FROM generate_series(date '2025-07-01', date_trunc('month', now()) + interval '12 months',
+                       interval '1 month') AS m;
+
+-- ===================================
+-- Alterações em tempo real (LISTEN/NOTIFY; ver app/tempo_real.py)
+-- ===================================
+
+-- Cada comando em substituicoes/escalas publica no canal escala360_alteracoes
+-- um aviso por linha alterada: {"tabela", "acao", "dados"} (a linha nova, ou a
+-- antiga na exclusão). Acima de 100 linhas (importação, preenchimento,
+-- arquivamento) publica um único {"tabela", "acao", "linhas"}: os clientes
+-- recarregam em vez de receber milhares de avisos. Os avisos só saem no commit.
+CREATE FUNCTION notificar_alteracoes() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    acao TEXT := CASE TG_OP WHEN 'INSERT' THEN 'criar' WHEN 'UPDATE' THEN 'atualizar' ELSE 'excluir' END;
+    total BIGINT;
+    linhas JSONB[];
+    linha JSONB;
+BEGIN
+    -- Só existe a tabela de transição do evento do trigger
+    IF TG_OP = 'DELETE' THEN
+        SELECT count(*) INTO total FROM antigas;
+        IF total <= 100 THEN
+            SELECT array_agg(to_jsonb(a) - 'periodo') INTO linhas FROM antigas a;
+        END IF;
+    ELSE
+        SELECT count(*) INTO total FROM novas;
+        IF total <= 100 THEN
+            SELECT array_agg(to_jsonb(n) - 'periodo') INTO linhas FROM novas n;
+        END IF;
+    END IF;
+    IF total > 100 THEN
+        PERFORM pg_notify('escala360_alteracoes',
+                          json_build_object('tabela', TG_TABLE_NAME, 'acao', acao, 'linhas', total)::text);
+        RETURN NULL;
+    END IF;
+    FOREACH linha IN ARRAY coalesce(linhas, '{}') LOOP
+        PERFORM pg_notify('escala360_alteracoes',
+                          json_build_object('tabela', TG_TABLE_NAME, 'acao', acao, 'dados', linha)::text);
+    END LOOP;
+    RETURN NULL;
+END
+$$;
+
+-- Triggers por comando (com tabelas de transição, uma por evento)
+CREATE TRIGGER trg_substituicoes_notificar_criar AFTER INSERT ON substituicoes
+REFERENCING NEW TABLE AS novas FOR EACH STATEMENT EXECUTE FUNCTION notificar_alteracoes();
+CREATE TRIGGER trg_substituicoes_notificar_atualizar AFTER UPDATE ON substituicoes
+REFERENCING NEW TABLE AS novas FOR EACH STATEMENT EXECUTE FUNCTION notificar_alteracoes();
+CREATE TRIGGER trg_substituicoes_notificar_excluir AFTER DELETE ON substituicoes
+REFERENCING OLD TABLE AS antigas FOR EACH STATEMENT EXECUTE FUNCTION notificar_alteracoes();
+CREATE TRIGGER trg_escalas_notificar_criar AFTER INSERT ON escalas
+REFERENCING NEW TABLE AS novas FOR EACH STATEMENT EXECUTE FUNCTION notificar_alteracoes();
+CREATE TRIGGER trg_escalas_notificar_atualizar AFTER UPDATE ON escalas
+REFERENCING NEW TABLE AS novas FOR EACH STATEMENT EXECUTE FUNCTION notificar_alteracoes();
+CREATE TRIGGER trg_escalas_notificar_excluir AFTER DELETE ON escalas
+REFERENCING OLD TABLE AS antigas FOR EACH STATEMENT EXECUTE FUNCTION notificar_alteracoes();
+
+-- ===================================
+-- Versões das tabelas (ETag / cache HTTP das listagens; ver app/cache.py)
+-- ===================================
+
+CREATE TABLE versoes_tabelas (
+    tabela VARCHAR(63) PRIMARY KEY,
+    versao BIGINT NOT NULL DEFAULT 0,
+    alterado_em TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc')
+);
+
+INSERT INTO versoes_tabelas (tabela, versao) VALUES
+('profissionais', 1), ('plantoes', 1), ('escalas', 1), ('substituicoes', 1);
+
+-- Uma linha por profissional: sobe no commit que altera as escalas dele, os
+-- plantões dessas escalas ou as substituições que pediu (app/servicos/agendas.py);
+-- ETag dos feeds /profissionais/<id>/agenda.ics|.json. Sem chave estrangeira:
+-- a versão sobrevive à exclusão e à recriação do profissional.
+CREATE TABLE versoes_agendas (
+    id_profissional INTEGER PRIMARY KEY,
+    versao BIGINT NOT NULL DEFAULT 0,
+    alterado_em TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc')
+);
+
+-- ===================================
+-- Fila de notificações (outbox; drenada por `flask notificacoes worker`)
+-- ===================================
+
+CREATE TABLE notificacoes (
+    id SERIAL PRIMARY KEY,
+    canal VARCHAR(20) NOT NULL,
+    destinatario VARCHAR(120) NOT NULL,
+    assunto VARCHAR(200),
+    mensagem TEXT NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pendente',
+    tentativas INTEGER NOT NULL DEFAULT 0,
+    proxima_tentativa TIMESTAMP NOT NULL DEFAULT now(),
+    ultimo_erro TEXT,
+    criado_em TIMESTAMP DEFAULT now(),
+    enviado_em TIMESTAMP
+);
+
+CREATE INDEX idx_notificacoes_fila ON notificacoes (proxima_tentativa)
+    WHERE status IN ('pendente', 'enviando');
+
+-- ===================================
+-- Resumos do Painel BI (mantidos pela aplicação)
+-- ===================================
+
+CREATE TABLE resumo_carga_profissional (
+    id_profissional INTEGER PRIMARY KEY REFERENCES profissionais(id) ON DELETE CASCADE,
+    total INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE resumo_substituicoes_status (
+    status TEXT PRIMARY KEY,
+    total INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE resumo_plantoes_dia (
+    dia DATE PRIMARY KEY,
+    total INTEGER NOT NULL DEFAULT 0
 );
 
 -- ===================================
@@ -112,7 +444,10 @@ INSERT INTO plantoes (data, hora_inicio, hora_fim, id_funcao, id_local) VALUES
 -- Escalas (20 registros)
 -- ===================================
 
-INSERT INTO escalas (id_plantao, id_profissional, status) VALUES
+-- data_plantao (chave de partição) vem do plantão
+INSERT INTO escalas (id_plantao, data_plantao, id_profissional, status)
+SELECT v.id_plantao, p.data, v.id_profissional, v.status
+  FROM (VALUES
 (1, 1, 'ativo'),
 (2, 2, 'ativo'),
 (3, 3, 'ativo'),
@@ -132,7 +467,10 @@ INSERT INTO escalas (id_plantao, id_profissional, status) VALUES
 (17, 17, 'ativo'),
 (18, 18, 'ativo'),
 (19, 19, 'ativo'),
-(20, 20, 'ativo');
+(20, 20, 'ativo')
+) AS v (id_plantao, id_profissional, status)
+  JOIN plantoes p ON p.id = v.id_plantao
+ ORDER BY v.id_plantao;
 
 -- ===================================
 -- Substituições (7 registros)
@@ -167,3 +505,16 @@ INSERT INTO auditoria (entidade, id_entidade, acao, usuario) VALUES
 ('escala', 6, 'criado', 'sistema'),
 ('escala', 7, 'criado', 'sistema'),
 ('escala', 8, 'criado', 'sistema');
+
+-- ===================================
+-- Carga inicial dos resumos do Painel BI
+-- ===================================
+
+INSERT INTO resumo_carga_profissional (id_profissional, total)
+SELECT id_profissional, COUNT(*) FROM escalas GROUP BY id_profissional;
+
+INSERT INTO resumo_substituicoes_status (status, total)
+SELECT status, COUNT(*) FROM substituicoes WHERE status IS NOT NULL GROUP BY status;
+
+INSERT INTO resumo_plantoes_dia (dia, total)
+SELECT data, COUNT(*) FROM plantoes GROUP BY data;
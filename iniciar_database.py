@@ -1,4 +1,5 @@
 import os
+import argparse
 import psycopg2
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 from dotenv import load_dotenv
@@ -20,22 +21,63 @@ def create_database_if_not_exists(dbname, user, password, host, port):
     conn.close()
 
 def execute_sql_file(dbname, user, password, host, port, sql_file):
-    """Executa o arquivo SQL de criação de tabelas."""
+    """Executa o arquivo SQL de criação de tabelas (uma única transação)."""
     conn = psycopg2.connect(dbname=dbname, user=user, password=password, host=host, port=port)
     cur = conn.cursor()
-    with open(sql_file, "r", encoding="utf-8") as f:
-        commands = [cmd.strip() for cmd in f.read().split(";") if cmd.strip()]
-    for cmd in commands:
-        try:
-            cur.execute(cmd)
-        except Exception as e:
-            print(f"⚠️ Erro em comando: {e}")
-    conn.commit()
+    cur.execute("SELECT to_regclass('public.profissionais')")
+    if cur.fetchone()[0] is not None:
+        print("ℹ️ Tabelas já existem; script SQL não reexecutado.")
+    else:
+        # O script é enviado inteiro: funções/trigger com ';' no corpo não são
+        # quebradas e qualquer erro desfaz tudo (em vez de ser ignorado).
+        with open(sql_file, "r", encoding="utf-8") as f:
+            cur.execute(f.read())
+        conn.commit()
+        print("📜 Script SQL executado com sucesso.")
     cur.close()
     conn.close()
-    print("📜 Script SQL executado com sucesso.")
+
+
+def importar_diretorio(dbname, user, password, host, port, diretorio):
+    """Importa via COPY os arquivos <tabela>.csv/.jsonl encontrados no diretório."""
+    from app.servicos.importacao import TABELAS, importar_arquivos
+
+    arquivos = {}
+    for tabela in TABELAS:
+        for extensao in (".csv", ".jsonl", ".ndjson"):
+            caminho = Path(diretorio) / f"{tabela}{extensao}"
+            if caminho.exists():
+                arquivos[tabela] = caminho
+                break
+    if not arquivos:
+        print(f"⚠️ Nenhum arquivo de importação encontrado em {diretorio}.")
+        return
+
+    conn = psycopg2.connect(dbname=dbname, user=user, password=password, host=host, port=port)
+    try:
+        relatorio = importar_arquivos(conn, arquivos)
+    finally:
+        conn.close()
+
+    for tabela, info in relatorio["tabelas"].items():
+        print(f"📥 {tabela}: {info['linhas']} linhas ({info['linhas_por_s']} linhas/s)")
+    for erro in relatorio["erros"]:
+        print(f"❌ {erro}")
+    if relatorio["gravado"]:
+        print(f"✅ {relatorio['linhas']} linhas importadas ({relatorio['linhas_por_s']} linhas/s).")
+    else:
+        raise SystemExit("❌ Importação cancelada: nenhum dado foi gravado.")
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cria e popula o banco do Escala360.")
+    parser.add_argument(
+        "--importar",
+        metavar="DIRETORIO",
+        help="Diretório com profissionais/plantoes/escalas/substituicoes em CSV ou JSONL.",
+    )
+    args = parser.parse_args()
+
     load_dotenv()
 
     db = os.getenv("POSTGRES_DB", "escala360")
@@ -50,3 +92,6 @@ if __name__ == "__main__":
 
     create_database_if_not_exists(db, user, pwd, host, port)
     execute_sql_file(db, user, pwd, host, port, sql_file)
+
+    if args.importar:
+        importar_diretorio(db, user, pwd, host, port, args.importar)
@@ -0,0 +1,48 @@
+"""notificacoes outbox
+
+Cria a tabela notificacoes (fila de envio de e-mail/WhatsApp drenada
+por `flask notificacoes worker`) e o índice parcial usado para
+reservar os lotes pendentes.
+
+Revision ID: 3b8f1c2d9a47
+Revises: ea56d60602d5
+Create Date: 2026-10-17 23:10:42.118305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b8f1c2d9a47'
+down_revision = 'ea56d60602d5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'notificacoes',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('canal', sa.String(length=20), nullable=False),
+        sa.Column('destinatario', sa.String(length=120), nullable=False),
+        sa.Column('assunto', sa.String(length=200)),
+        sa.Column('mensagem', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='pendente'),
+        sa.Column('tentativas', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('proxima_tentativa', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column('ultimo_erro', sa.Text()),
+        sa.Column('criado_em', sa.DateTime(), server_default=sa.func.now()),
+        sa.Column('enviado_em', sa.DateTime()),
+    )
+    op.create_index(
+        'idx_notificacoes_fila',
+        'notificacoes',
+        ['proxima_tentativa'],
+        postgresql_where=sa.text("status IN ('pendente', 'enviando')"),
+    )
+
+
+def downgrade():
+    op.drop_index('idx_notificacoes_fila', table_name='notificacoes')
+    op.drop_table('notificacoes')
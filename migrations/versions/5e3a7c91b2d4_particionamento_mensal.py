@@ -0,0 +1,338 @@
+"""particionamento mensal
+
+Converte plantoes e escalas em tabelas particionadas por mês da data
+do plantão (RANGE em plantoes.data e na nova coluna
+escalas.data_plantao), com partições dos meses existentes e dos 12
+meses seguintes. As consultas de um período passam a ler só as
+partições dele; meses encerrados podem ser arquivados com
+`flask particoes arquivar`.
+
+Mudanças de esquema decorrentes do particionamento (PostgreSQL 15+):
+  • as chaves primárias incluem a chave de partição: (id, data) e
+    (id, data_plantao);
+  • escalas referencia plantoes por (id_plantao, data_plantao), com
+    ON UPDATE CASCADE — mudar a data do plantão move as escalas;
+  • a referência substituicoes → escalas(id) passa a ser garantida
+    por triggers;
+  • a restrição de exclusão escalas_sem_sobreposicao passa a existir
+    por partição (escalas_<AAAA_MM>_sem_sobreposicao).
+
+As tabelas são reescritas (cópia dos dados) sob bloqueio exclusivo:
+aplique em janela de manutenção.
+
+Revision ID: 5e3a7c91b2d4
+Revises: d2f6b8a4e190
+Create Date: 2026-10-18 01:12:40.118305
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5e3a7c91b2d4'
+down_revision = 'd2f6b8a4e190'
+branch_labels = None
+depends_on = None
+
+INDICES_PLANTOES_ESCALAS = {
+    'idx_plantoes_data': ('plantoes', 'data, hora_inicio, id'),
+    'idx_escalas_plantao': ('escalas', 'id_plantao, status'),
+    'idx_escalas_profissional': ('escalas', 'id_profissional, status'),
+    'idx_escalas_alocacao': ('escalas', 'data_alocacao, id'),
+}
+
+CRIAR_PARTICOES_MES = """
+    CREATE OR REPLACE FUNCTION criar_particoes_mes(mes DATE) RETURNS void
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        inicio DATE := date_trunc('month', mes)::date;
+        fim DATE := (date_trunc('month', mes) + interval '1 month')::date;
+        sufixo TEXT := to_char(mes, 'YYYY_MM');
+    BEGIN
+        PERFORM pg_advisory_xact_lock(hashtext('escala360.particoes'));
+        IF to_regclass('arquivo.plantoes_' || sufixo) IS NOT NULL THEN
+            RAISE EXCEPTION 'o mês % já foi arquivado', to_char(mes, 'YYYY-MM');
+        END IF;
+        IF to_regclass('public.plantoes_' || sufixo) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I PARTITION OF plantoes FOR VALUES FROM (%L) TO (%L)',
+                           'plantoes_' || sufixo, inicio, fim);
+        END IF;
+        IF to_regclass('public.escalas_' || sufixo) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I PARTITION OF escalas FOR VALUES FROM (%L) TO (%L)',
+                           'escalas_' || sufixo, inicio, fim);
+            EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I '
+                           'EXCLUDE USING gist (id_profissional WITH =, periodo WITH &&) '
+                           'WHERE (status = ''ativo'')',
+                           'escalas_' || sufixo, 'escalas_' || sufixo || '_sem_sobreposicao');
+        END IF;
+    END
+    $$
+"""
+
+ARQUIVAR_MES = """
+    CREATE OR REPLACE FUNCTION arquivar_mes(mes DATE) RETURNS void
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        inicio DATE := date_trunc('month', mes)::date;
+        fim DATE := (date_trunc('month', mes) + interval '1 month')::date;
+        sufixo TEXT := to_char(mes, 'YYYY_MM');
+        restricao TEXT;
+    BEGIN
+        PERFORM pg_advisory_xact_lock(hashtext('escala360.particoes'));
+        IF to_regclass('public.escalas_' || sufixo) IS NULL THEN
+            RAISE EXCEPTION 'o mês % não tem partição ativa', to_char(mes, 'YYYY-MM');
+        END IF;
+        CREATE SCHEMA IF NOT EXISTS arquivo;
+
+        EXECUTE format('CREATE TABLE arquivo.%I AS '
+                       'SELECT s.* FROM substituicoes s JOIN escalas e ON e.id = s.id_escala_original '
+                       'WHERE e.data_plantao >= %L AND e.data_plantao < %L',
+                       'substituicoes_' || sufixo, inicio, fim);
+        DELETE FROM substituicoes s USING escalas e
+         WHERE e.id = s.id_escala_original AND e.data_plantao >= inicio AND e.data_plantao < fim;
+
+        EXECUTE format('ALTER TABLE escalas DETACH PARTITION %I', 'escalas_' || sufixo);
+        FOR restricao IN
+            SELECT conname FROM pg_constraint
+             WHERE conrelid = ('public.escalas_' || sufixo)::regclass AND contype = 'f'
+        LOOP
+            EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', 'escalas_' || sufixo, restricao);
+        END LOOP;
+        EXECUTE format('ALTER TABLE plantoes DETACH PARTITION %I', 'plantoes_' || sufixo);
+
+        EXECUTE format('ALTER TABLE %I SET SCHEMA arquivo', 'escalas_' || sufixo);
+        EXECUTE format('ALTER TABLE %I SET SCHEMA arquivo', 'plantoes_' || sufixo);
+    END
+    $$
+"""
+
+ESCALAS_DEFINIR_PERIODO = """
+    CREATE OR REPLACE FUNCTION escalas_definir_periodo() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        p plantoes%ROWTYPE;
+    BEGIN
+        -- data_plantao já vem preenchida (é a chave de partição): lê só a partição do mês.
+        -- Se não bater com a data do plantão, a chave estrangeira recusa a linha.
+        SELECT * INTO p FROM plantoes WHERE id = NEW.id_plantao AND data = NEW.data_plantao;
+        IF FOUND THEN
+            NEW.periodo := periodo_do_plantao(p.data, p.hora_inicio, p.hora_fim);
+        END IF;
+        RETURN NEW;
+    END
+    $$
+"""
+
+PLANTOES_PROPAGAR_PERIODO = """
+    CREATE OR REPLACE FUNCTION plantoes_propagar_periodo() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        UPDATE escalas
+           SET periodo = periodo_do_plantao(NEW.data, NEW.hora_inicio, NEW.hora_fim)
+         WHERE id_plantao = NEW.id AND data_plantao = NEW.data;
+        RETURN NEW;
+    END
+    $$
+"""
+
+SUBSTITUICOES_VERIFICAR_ESCALA = """
+    CREATE OR REPLACE FUNCTION substituicoes_verificar_escala() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        PERFORM 1 FROM escalas WHERE id = NEW.id_escala_original FOR KEY SHARE;
+        IF NOT FOUND THEN
+            RAISE EXCEPTION 'escala % não existe', NEW.id_escala_original
+                USING ERRCODE = 'foreign_key_violation';
+        END IF;
+        RETURN NEW;
+    END
+    $$
+"""
+
+ESCALAS_VERIFICAR_SUBSTITUICOES = """
+    CREATE OR REPLACE FUNCTION escalas_verificar_substituicoes() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF EXISTS (SELECT 1 FROM substituicoes WHERE id_escala_original = OLD.id)
+           AND NOT EXISTS (SELECT 1 FROM escalas WHERE id = OLD.id) THEN
+            RAISE EXCEPTION 'escala % é referenciada em substituicoes', OLD.id
+                USING ERRCODE = 'foreign_key_violation';
+        END IF;
+        RETURN NULL;
+    END
+    $$
+"""
+
+# Versões anteriores (tabelas não particionadas), para o downgrade
+ESCALAS_DEFINIR_PERIODO_ANTERIOR = """
+    CREATE OR REPLACE FUNCTION escalas_definir_periodo() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        SELECT periodo_do_plantao(p.data, p.hora_inicio, p.hora_fim)
+          INTO NEW.periodo
+          FROM plantoes p
+         WHERE p.id = NEW.id_plantao;
+        RETURN NEW;
+    END
+    $$
+"""
+
+PLANTOES_PROPAGAR_PERIODO_ANTERIOR = """
+    CREATE OR REPLACE FUNCTION plantoes_propagar_periodo() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        UPDATE escalas
+           SET periodo = periodo_do_plantao(NEW.data, NEW.hora_inicio, NEW.hora_fim)
+         WHERE id_plantao = NEW.id;
+        RETURN NEW;
+    END
+    $$
+"""
+
+
+def _criar_triggers_de_periodo():
+    op.execute("""
+        CREATE TRIGGER trg_escalas_periodo
+        BEFORE INSERT OR UPDATE OF id_plantao ON escalas
+        FOR EACH ROW EXECUTE FUNCTION escalas_definir_periodo()
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_plantoes_periodo
+        AFTER UPDATE OF data, hora_inicio, hora_fim ON plantoes
+        FOR EACH ROW EXECUTE FUNCTION plantoes_propagar_periodo()
+    """)
+
+
+def _renomear_antigas(sufixo):
+    """Libera os nomes plantoes/escalas (e de seus índices) para as novas tabelas."""
+    op.execute("ALTER TABLE substituicoes DROP CONSTRAINT IF EXISTS substituicoes_id_escala_original_fkey")
+    for nome, (tabela, _) in INDICES_PLANTOES_ESCALAS.items():
+        op.execute(f"DROP INDEX IF EXISTS {nome}")
+    for tabela in ("escalas", "plantoes"):
+        op.execute(f"ALTER TABLE {tabela} RENAME TO {tabela}_{sufixo}")
+        op.execute(f"ALTER INDEX {tabela}_pkey RENAME TO {tabela}_{sufixo}_pkey")
+
+
+def _criar_indices():
+    for nome, (tabela, colunas) in INDICES_PLANTOES_ESCALAS.items():
+        op.execute(f"CREATE INDEX {nome} ON {tabela} ({colunas})")
+
+
+def upgrade():
+    _renomear_antigas("antiga")
+
+    # Mesmas colunas e defaults (sequências plantoes_id_seq / escalas_id_seq)
+    op.execute("""
+        CREATE TABLE plantoes (LIKE plantoes_antiga INCLUDING DEFAULTS, PRIMARY KEY (id, data))
+        PARTITION BY RANGE (data)
+    """)
+    op.execute("""
+        CREATE TABLE escalas (
+            LIKE escalas_antiga INCLUDING DEFAULTS,
+            data_plantao DATE NOT NULL,
+            PRIMARY KEY (id, data_plantao),
+            CONSTRAINT escalas_plantao_fkey FOREIGN KEY (id_plantao, data_plantao)
+                REFERENCES plantoes (id, data) ON UPDATE CASCADE,
+            CONSTRAINT escalas_id_profissional_fkey FOREIGN KEY (id_profissional)
+                REFERENCES profissionais (id)
+        ) PARTITION BY RANGE (data_plantao)
+    """)
+    for tabela in ("plantoes", "escalas"):
+        op.execute(f"ALTER SEQUENCE {tabela}_id_seq OWNED BY {tabela}.id")
+
+    op.execute(CRIAR_PARTICOES_MES)
+    op.execute(ARQUIVAR_MES)
+    op.execute("""
+        SELECT criar_particoes_mes(m::date)
+          FROM generate_series(
+                   date_trunc('month', COALESCE((SELECT MIN(data) FROM plantoes_antiga), now())),
+                   GREATEST(date_trunc('month', now()) + interval '12 months',
+                            (SELECT MAX(data) FROM plantoes_antiga)),
+                   interval '1 month') AS m
+    """)
+
+    # Cópia antes dos triggers: o período das escalas já está calculado
+    op.execute("""
+        INSERT INTO plantoes (id, data, hora_inicio, hora_fim, id_funcao, id_local)
+        SELECT id, data, hora_inicio, hora_fim, id_funcao, id_local FROM plantoes_antiga
+    """)
+    op.execute("""
+        INSERT INTO escalas (id, id_plantao, data_plantao, id_profissional, status, data_alocacao, periodo)
+        SELECT e.id, e.id_plantao, p.data, e.id_profissional, e.status, e.data_alocacao, e.periodo
+          FROM escalas_antiga e
+          JOIN plantoes_antiga p ON p.id = e.id_plantao
+    """)
+    op.execute("DROP TABLE escalas_antiga")
+    op.execute("DROP TABLE plantoes_antiga")
+
+    _criar_indices()
+    op.execute(ESCALAS_DEFINIR_PERIODO)
+    op.execute(PLANTOES_PROPAGAR_PERIODO)
+    _criar_triggers_de_periodo()
+
+    # substituicoes → escalas(id) garantida por triggers
+    op.execute(SUBSTITUICOES_VERIFICAR_ESCALA)
+    op.execute("""
+        CREATE TRIGGER trg_substituicoes_escala
+        BEFORE INSERT OR UPDATE OF id_escala_original ON substituicoes
+        FOR EACH ROW EXECUTE FUNCTION substituicoes_verificar_escala()
+    """)
+    op.execute(ESCALAS_VERIFICAR_SUBSTITUICOES)
+    op.execute("""
+        CREATE TRIGGER trg_escalas_substituicoes
+        AFTER DELETE ON escalas
+        FOR EACH ROW EXECUTE FUNCTION escalas_verificar_substituicoes()
+    """)
+
+    op.execute("ANALYZE plantoes")
+    op.execute("ANALYZE escalas")
+
+
+def downgrade():
+    # Meses já arquivados (esquema arquivo) não voltam para as tabelas
+    op.execute("DROP TRIGGER IF EXISTS trg_substituicoes_escala ON substituicoes")
+    op.execute("DROP FUNCTION IF EXISTS substituicoes_verificar_escala()")
+    _renomear_antigas("particionada")
+
+    op.execute("CREATE TABLE plantoes (LIKE plantoes_particionada INCLUDING DEFAULTS, PRIMARY KEY (id))")
+    op.execute("""
+        CREATE TABLE escalas (
+            LIKE escalas_particionada INCLUDING DEFAULTS,
+            PRIMARY KEY (id),
+            CONSTRAINT escalas_id_plantao_fkey FOREIGN KEY (id_plantao) REFERENCES plantoes (id),
+            CONSTRAINT escalas_id_profissional_fkey FOREIGN KEY (id_profissional)
+                REFERENCES profissionais (id)
+        )
+    """)
+    op.execute("ALTER TABLE escalas DROP COLUMN data_plantao")
+    for tabela in ("plantoes", "escalas"):
+        op.execute(f"ALTER SEQUENCE {tabela}_id_seq OWNED BY {tabela}.id")
+
+    op.execute("""
+        INSERT INTO plantoes (id, data, hora_inicio, hora_fim, id_funcao, id_local)
+        SELECT id, data, hora_inicio, hora_fim, id_funcao, id_local FROM plantoes_particionada
+    """)
+    op.execute("""
+        INSERT INTO escalas (id, id_plantao, id_profissional, status, data_alocacao, periodo)
+        SELECT id, id_plantao, id_profissional, status, data_alocacao, periodo FROM escalas_particionada
+    """)
+    op.execute("DROP TABLE escalas_particionada")
+    op.execute("DROP TABLE plantoes_particionada")
+    op.execute("DROP FUNCTION IF EXISTS escalas_verificar_substituicoes()")
+    op.execute("DROP FUNCTION IF EXISTS arquivar_mes(DATE)")
+    op.execute("DROP FUNCTION IF EXISTS criar_particoes_mes(DATE)")
+
+    _criar_indices()
+    op.execute(ESCALAS_DEFINIR_PERIODO_ANTERIOR)
+    op.execute(PLANTOES_PROPAGAR_PERIODO_ANTERIOR)
+    _criar_triggers_de_periodo()
+    op.execute("""
+        ALTER TABLE escalas
+        ADD CONSTRAINT escalas_sem_sobreposicao
+        EXCLUDE USING gist (id_profissional WITH =, periodo WITH &&)
+        WHERE (status = 'ativo')
+    """)
+    op.execute("""
+        ALTER TABLE substituicoes ADD CONSTRAINT substituicoes_id_escala_original_fkey
+        FOREIGN KEY (id_escala_original) REFERENCES escalas (id)
+    """)
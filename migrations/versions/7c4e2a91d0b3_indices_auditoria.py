@@ -0,0 +1,29 @@
+"""indices auditoria
+
+Índices da trilha de auditoria (gravada pelos eventos de sessão em
+app/servicos/auditoria.py): leitura por período, da mais recente para a
+mais antiga, e histórico de um registro específico.
+
+Revision ID: 7c4e2a91d0b3
+Revises: 3b8f1c2d9a47
+Create Date: 2026-10-17 23:42:07.530118
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '7c4e2a91d0b3'
+down_revision = '3b8f1c2d9a47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE INDEX idx_auditoria_data_hora ON auditoria (data_hora DESC, id DESC)")
+    op.execute("CREATE INDEX idx_auditoria_entidade ON auditoria (entidade, id_entidade, data_hora DESC)")
+
+
+def downgrade():
+    op.drop_index('idx_auditoria_entidade', table_name='auditoria')
+    op.drop_index('idx_auditoria_data_hora', table_name='auditoria')
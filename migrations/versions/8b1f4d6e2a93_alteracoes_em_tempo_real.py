@@ -0,0 +1,80 @@
+"""alteracoes em tempo real
+
+Triggers por comando em substituicoes e escalas que publicam as linhas
+alteradas no canal escala360_alteracoes (pg_notify), consumido pelo
+ouvinte compartilhado de cada worker e repassado aos navegadores por
+Server-Sent Events (GET /api/alteracoes). Comandos com mais de 100
+linhas publicam um único aviso com a contagem.
+
+Revision ID: 8b1f4d6e2a93
+Revises: 5e3a7c91b2d4
+Create Date: 2026-10-18 09:41:05.552817
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8b1f4d6e2a93'
+down_revision = '5e3a7c91b2d4'
+branch_labels = None
+depends_on = None
+
+FUNCAO = """
+CREATE FUNCTION notificar_alteracoes() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    acao TEXT := CASE TG_OP WHEN 'INSERT' THEN 'criar' WHEN 'UPDATE' THEN 'atualizar' ELSE 'excluir' END;
+    total BIGINT;
+    linhas JSONB[];
+    linha JSONB;
+BEGIN
+    -- Só existe a tabela de transição do evento do trigger
+    IF TG_OP = 'DELETE' THEN
+        SELECT count(*) INTO total FROM antigas;
+        IF total <= 100 THEN
+            SELECT array_agg(to_jsonb(a) - 'periodo') INTO linhas FROM antigas a;
+        END IF;
+    ELSE
+        SELECT count(*) INTO total FROM novas;
+        IF total <= 100 THEN
+            SELECT array_agg(to_jsonb(n) - 'periodo') INTO linhas FROM novas n;
+        END IF;
+    END IF;
+    IF total > 100 THEN
+        PERFORM pg_notify('escala360_alteracoes',
+                          json_build_object('tabela', TG_TABLE_NAME, 'acao', acao, 'linhas', total)::text);
+        RETURN NULL;
+    END IF;
+    FOREACH linha IN ARRAY coalesce(linhas, '{}') LOOP
+        PERFORM pg_notify('escala360_alteracoes',
+                          json_build_object('tabela', TG_TABLE_NAME, 'acao', acao, 'dados', linha)::text);
+    END LOOP;
+    RETURN NULL;
+END
+$$;
+"""
+
+# (tabela, evento, tabela de transição)
+TRIGGERS = [
+    (tabela, evento, 'OLD TABLE AS antigas' if evento == 'DELETE' else 'NEW TABLE AS novas')
+    for tabela in ('substituicoes', 'escalas')
+    for evento in ('INSERT', 'UPDATE', 'DELETE')
+]
+
+NOMES = {'INSERT': 'criar', 'UPDATE': 'atualizar', 'DELETE': 'excluir'}
+
+
+def upgrade():
+    op.execute(FUNCAO)
+    for tabela, evento, transicao in TRIGGERS:
+        op.execute(
+            f'CREATE TRIGGER trg_{tabela}_notificar_{NOMES[evento]} AFTER {evento} ON {tabela} '
+            f'REFERENCING {transicao} FOR EACH STATEMENT EXECUTE FUNCTION notificar_alteracoes()'
+        )
+
+
+def downgrade():
+    for tabela, evento, _ in TRIGGERS:
+        op.execute(f'DROP TRIGGER trg_{tabela}_notificar_{NOMES[evento]} ON {tabela}')
+    op.execute('DROP FUNCTION notificar_alteracoes()')
@@ -0,0 +1,38 @@
+"""versoes tabelas
+
+Cria versoes_tabelas: contador de alterações por tabela, incrementado
+a cada commit (app/cache.py) e usado nos ETags / Last-Modified das
+listagens e de GET /api/substituicoes.
+
+Revision ID: a91d5e07c3f2
+Revises: 7c4e2a91d0b3
+Create Date: 2026-10-18 00:05:31.904211
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a91d5e07c3f2'
+down_revision = '7c4e2a91d0b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'versoes_tabelas',
+        sa.Column('tabela', sa.String(length=63), primary_key=True),
+        sa.Column('versao', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('alterado_em', sa.DateTime(), nullable=False,
+                  server_default=sa.text("(now() AT TIME ZONE 'utc')")),
+    )
+    op.execute("""
+        INSERT INTO versoes_tabelas (tabela, versao) VALUES
+        ('profissionais', 1), ('plantoes', 1), ('escalas', 1), ('substituicoes', 1)
+    """)
+
+
+def downgrade():
+    op.drop_table('versoes_tabelas')
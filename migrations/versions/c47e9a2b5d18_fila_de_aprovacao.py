@@ -0,0 +1,40 @@
+"""fila de aprovacao de substituicoes
+
+Colunas de versão (controle otimista) em escalas e substituicoes e de
+reserva/decisão em substituicoes, usadas pela fila de aprovação
+(POST /api/substituicoes/reservar, /aprovar e /recusar). Defaults
+constantes: no PostgreSQL 11+ as colunas são adicionadas sem
+reescrever as tabelas.
+
+Revision ID: c47e9a2b5d18
+Revises: 8b1f4d6e2a93
+Create Date: 2026-10-18 14:27:51.903166
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c47e9a2b5d18'
+down_revision = '8b1f4d6e2a93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('escalas', sa.Column('versao', sa.Integer(), nullable=False, server_default='1'))
+    op.add_column('substituicoes', sa.Column('versao', sa.Integer(), nullable=False, server_default='1'))
+    op.add_column('substituicoes', sa.Column('reservada_por', sa.String(length=120)))
+    op.add_column('substituicoes', sa.Column('reservada_ate', sa.DateTime()))
+    op.add_column('substituicoes', sa.Column('decidida_por', sa.String(length=120)))
+    op.add_column('substituicoes', sa.Column('decidida_em', sa.DateTime()))
+
+
+def downgrade():
+    op.drop_column('substituicoes', 'decidida_em')
+    op.drop_column('substituicoes', 'decidida_por')
+    op.drop_column('substituicoes', 'reservada_ate')
+    op.drop_column('substituicoes', 'reservada_por')
+    op.drop_column('substituicoes', 'versao')
+    op.drop_column('escalas', 'versao')
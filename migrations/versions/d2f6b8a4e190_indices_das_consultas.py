@@ -0,0 +1,61 @@
+"""indices das consultas
+
+Índices secundários para o formato real das consultas das rotas e
+serviços: ordenação das listagens (keyset), filtros por período,
+escalas ativas por plantão/profissional, fila de substituições
+pendentes (índice parcial) e chaves estrangeiras.
+
+Criados com CREATE INDEX CONCURRENTLY (fora da transação da migração)
+para não bloquear gravações em bancos já populados. Confira os planos
+com `python verificar_planos.py` (banco local descartável).
+
+Revision ID: d2f6b8a4e190
+Revises: a91d5e07c3f2
+Create Date: 2026-10-18 00:31:12.447902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2f6b8a4e190'
+down_revision = 'a91d5e07c3f2'
+branch_labels = None
+depends_on = None
+
+# nome -> (tabela, colunas, predicado do índice parcial)
+INDICES = {
+    'idx_profissionais_nome': ('profissionais', ['nome', 'id'], None),
+    'idx_profissionais_cargo': ('profissionais', ['cargo', 'nome', 'id'], None),
+    'idx_plantoes_data': ('plantoes', ['data', 'hora_inicio', 'id'], None),
+    'idx_escalas_plantao': ('escalas', ['id_plantao', 'status'], None),
+    'idx_escalas_profissional': ('escalas', ['id_profissional', 'status'], None),
+    'idx_escalas_alocacao': ('escalas', ['data_alocacao', 'id'], None),
+    'idx_substituicoes_solicitacao': ('substituicoes', ['data_solicitacao', 'id'], None),
+    'idx_substituicoes_pendentes': ('substituicoes', ['data_solicitacao', 'id'], "status = 'pendente'"),
+    'idx_substituicoes_escala': ('substituicoes', ['id_escala_original'], None),
+    'idx_substituicoes_solicitante': ('substituicoes', ['id_profissional_solicitante'], None),
+    'idx_substituicoes_substituto': ('substituicoes', ['id_profissional_substituto'], None),
+}
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for nome, (tabela, colunas, predicado) in INDICES.items():
+            op.create_index(
+                nome,
+                tabela,
+                colunas,
+                postgresql_concurrently=True,
+                postgresql_where=sa.text(predicado) if predicado else None,
+                if_not_exists=True,
+            )
+        for tabela in sorted({t for t, _, _ in INDICES.values()}):
+            op.execute(f"ANALYZE {tabela}")
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for nome, (tabela, _, _) in INDICES.items():
+            op.drop_index(nome, table_name=tabela, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,37 @@
+"""versoes das agendas por profissional
+
+Tabela versoes_agendas: um contador por profissional que sobe no commit
+que altera as escalas dele, os plantões dessas escalas ou as
+substituições que pediu (app/servicos/agendas.py). Alimenta o ETag e a
+chave do cache dos feeds /profissionais/<id>/agenda.ics e .json. Sem
+chave estrangeira para profissionais: a versão sobrevive à exclusão e à
+recriação do profissional e nunca volta para trás.
+
+Revision ID: d3a8f61c9e42
+Revises: c47e9a2b5d18
+Create Date: 2026-10-19 10:12:37.418205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3a8f61c9e42'
+down_revision = 'c47e9a2b5d18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'versoes_agendas',
+        sa.Column('id_profissional', sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column('versao', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('alterado_em', sa.DateTime(), nullable=False,
+                  server_default=sa.text("(now() AT TIME ZONE 'utc')")),
+    )
+
+
+def downgrade():
+    op.drop_table('versoes_agendas')
@@ -0,0 +1,60 @@
+"""tabelas de resumo do painel
+
+Cria resumo_carga_profissional, resumo_substituicoes_status e
+resumo_plantoes_dia (mantidas por app/servicos/resumos.py) em bancos
+que nasceram antes delas e só foram atualizados com `flask db upgrade`:
+sem elas todo flush do ORM falha e o painel responde 500. As tabelas
+que faltarem são criadas e preenchidas a partir das tabelas de origem,
+como em reconstruir_resumos(); bancos criados pelo escala360.sql já as
+têm e ficam como estão.
+
+Revision ID: e81c4b7a2f65
+Revises: d3a8f61c9e42
+Create Date: 2026-10-19 16:05:42.731094
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e81c4b7a2f65'
+down_revision = 'd3a8f61c9e42'
+branch_labels = None
+depends_on = None
+
+
+# tabela -> (coluna-chave, tipo, referência, consulta que a preenche)
+RESUMOS = {
+    'resumo_carga_profissional': (
+        'id_profissional', sa.Integer(), sa.ForeignKey('profissionais.id', ondelete='CASCADE'),
+        "SELECT id_profissional, COUNT(*) FROM escalas GROUP BY id_profissional",
+    ),
+    'resumo_substituicoes_status': (
+        'status', sa.Text(), None,
+        "SELECT status, COUNT(*) FROM substituicoes WHERE status IS NOT NULL GROUP BY status",
+    ),
+    'resumo_plantoes_dia': (
+        'dia', sa.Date(), None,
+        "SELECT data, COUNT(*) FROM plantoes GROUP BY data",
+    ),
+}
+
+
+def upgrade():
+    existentes = set(sa.inspect(op.get_bind()).get_table_names())
+    for tabela, (chave, tipo, referencia, origem) in RESUMOS.items():
+        if tabela in existentes:
+            continue
+        op.create_table(
+            tabela,
+            sa.Column(chave, tipo, *([referencia] if referencia is not None else []), primary_key=True),
+            sa.Column('total', sa.Integer(), nullable=False, server_default='0'),
+        )
+        op.execute(f"INSERT INTO {tabela} ({chave}, total) {origem}")
+
+
+def downgrade():
+    # As tabelas fazem parte do esquema base (escala360.sql) e são usadas
+    # pelo código de todas as revisões anteriores: não são removidas.
+    pass
@@ -0,0 +1,130 @@
+"""escalas sem sobreposicao
+
+Adiciona a coluna escalas.periodo (tsrange do plantão, mantida por
+triggers) e uma restrição de exclusão GiST que impede o mesmo
+profissional de ter duas escalas ativas com horários sobrepostos.
+
+Parte do esquema criado por escala360.sql. Se já existirem conflitos,
+o upgrade é interrompido antes de qualquer alteração e a mensagem
+lista os primeiros pares: cancele ou realoque essas escalas e rode
+`flask db upgrade` de novo.
+
+Revision ID: ea56d60602d5
+Revises: 
+Create Date: 2026-10-17 22:25:15.599599
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ea56d60602d5'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _conflitos_existentes(limite=20):
+    """Pares de escalas ativas sobrepostas do mesmo profissional (antes da coluna periodo)."""
+    return op.get_bind().execute(sa.text("""
+        WITH periodos AS (
+            SELECT e.id, e.id_profissional,
+                   tsrange(p.data + p.hora_inicio,
+                           p.data + p.hora_fim
+                             + CASE WHEN p.hora_fim <= p.hora_inicio
+                                    THEN interval '1 day' ELSE interval '0' END) AS periodo
+            FROM escalas e
+            JOIN plantoes p ON p.id = e.id_plantao
+            WHERE e.status = 'ativo'
+        )
+        SELECT a.id_profissional, a.id, b.id
+        FROM periodos a
+        JOIN periodos b ON b.id_profissional = a.id_profissional AND a.id < b.id
+        WHERE a.periodo && b.periodo
+        ORDER BY a.id_profissional, a.id, b.id
+        LIMIT :limite
+    """), {"limite": limite}).all()
+
+
+def upgrade():
+    conflitos = _conflitos_existentes()
+    if conflitos:
+        pares = "; ".join(f"profissional {p}: escalas {a} e {b}" for p, a, b in conflitos)
+        raise RuntimeError(
+            "Há escalas ativas sobrepostas; a restrição escalas_sem_sobreposicao não pode "
+            f"ser criada. Cancele ou realoque-as e rode o upgrade de novo. Primeiros pares: {pares}"
+        )
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION periodo_do_plantao(d DATE, inicio TIME, fim TIME)
+        RETURNS tsrange LANGUAGE sql IMMUTABLE AS $$
+            SELECT tsrange(d + inicio,
+                           d + fim + CASE WHEN fim <= inicio THEN interval '1 day'
+                                          ELSE interval '0' END)
+        $$
+    """)
+
+    op.add_column("escalas", sa.Column("periodo", sa.dialects.postgresql.TSRANGE()))
+    op.execute("""
+        UPDATE escalas e
+        SET periodo = periodo_do_plantao(p.data, p.hora_inicio, p.hora_fim)
+        FROM plantoes p
+        WHERE p.id = e.id_plantao
+    """)
+
+    # Novas escalas (ou troca de plantão) recebem o período do plantão
+    op.execute("""
+        CREATE OR REPLACE FUNCTION escalas_definir_periodo() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            SELECT periodo_do_plantao(p.data, p.hora_inicio, p.hora_fim)
+              INTO NEW.periodo
+              FROM plantoes p
+             WHERE p.id = NEW.id_plantao;
+            RETURN NEW;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_escalas_periodo
+        BEFORE INSERT OR UPDATE OF id_plantao ON escalas
+        FOR EACH ROW EXECUTE FUNCTION escalas_definir_periodo()
+    """)
+
+    # Alterar o horário de um plantão atualiza as escalas dele
+    op.execute("""
+        CREATE OR REPLACE FUNCTION plantoes_propagar_periodo() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE escalas
+               SET periodo = periodo_do_plantao(NEW.data, NEW.hora_inicio, NEW.hora_fim)
+             WHERE id_plantao = NEW.id;
+            RETURN NEW;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_plantoes_periodo
+        AFTER UPDATE OF data, hora_inicio, hora_fim ON plantoes
+        FOR EACH ROW EXECUTE FUNCTION plantoes_propagar_periodo()
+    """)
+
+    op.execute("""
+        ALTER TABLE escalas
+        ADD CONSTRAINT escalas_sem_sobreposicao
+        EXCLUDE USING gist (id_profissional WITH =, periodo WITH &&)
+        WHERE (status = 'ativo')
+    """)
+
+
+def downgrade():
+    op.execute("ALTER TABLE escalas DROP CONSTRAINT IF EXISTS escalas_sem_sobreposicao")
+    op.execute("DROP TRIGGER IF EXISTS trg_plantoes_periodo ON plantoes")
+    op.execute("DROP TRIGGER IF EXISTS trg_escalas_periodo ON escalas")
+    op.execute("DROP FUNCTION IF EXISTS plantoes_propagar_periodo()")
+    op.execute("DROP FUNCTION IF EXISTS escalas_definir_periodo()")
+    op.drop_column("escalas", "periodo")
+    op.execute("DROP FUNCTION IF EXISTS periodo_do_plantao(DATE, TIME, TIME)")
@@ -0,0 +1,48 @@
+"""chaves de paginacao obrigatorias
+
+escalas.data_alocacao, substituicoes.data_solicitacao e
+auditoria.data_hora passam a NOT NULL: são a primeira coluna da chave
+das listagens paginadas por cursor (app/paginacao.py), e a comparação de
+tuplas nunca alcança as linhas com NULL. As lacunas existentes recebem
+a melhor data conhecida: a do plantão (escalas), a alocação da escala
+original (substituições) e, na falta dela, o instante da migração.
+
+Revision ID: f5b2c8d1a376
+Revises: e81c4b7a2f65
+Create Date: 2026-10-20 09:27:14.603318
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f5b2c8d1a376'
+down_revision = 'e81c4b7a2f65'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        UPDATE escalas SET data_alocacao = data_plantao::timestamp
+         WHERE data_alocacao IS NULL
+    """)
+    op.execute("""
+        UPDATE substituicoes s
+           SET data_solicitacao = COALESCE(
+                   (SELECT e.data_alocacao FROM escalas e WHERE e.id = s.id_escala_original LIMIT 1),
+                   now() AT TIME ZONE 'utc')
+         WHERE s.data_solicitacao IS NULL
+    """)
+    op.execute("UPDATE auditoria SET data_hora = now() AT TIME ZONE 'utc' WHERE data_hora IS NULL")
+
+    # Em escalas (particionada) a restrição vale para todas as partições
+    op.alter_column('escalas', 'data_alocacao', nullable=False)
+    op.alter_column('substituicoes', 'data_solicitacao', nullable=False)
+    op.alter_column('auditoria', 'data_hora', nullable=False)
+
+
+def downgrade():
+    op.alter_column('auditoria', 'data_hora', nullable=True)
+    op.alter_column('substituicoes', 'data_solicitacao', nullable=True)
+    op.alter_column('escalas', 'data_alocacao', nullable=True)
@@ -0,0 +1,284 @@
+# -- coding: utf-8 --
+# ============================================================
+# 🔬 Script de Desenvolvimento — Planos de Consulta (EXPLAIN)
+# ============================================================
+# Confere que as consultas da aplicação continuam usando índices
+# quando as tabelas crescem:
+#   1. executa as rotas e serviços de leitura capturando o SQL
+#      realmente enviado ao banco (com os parâmetros);
+#   2. em uma transação separada, popula as tabelas com dados
+#      sintéticos em volume (generate_series) e roda ANALYZE;
+#   3. faz EXPLAIN de cada consulta capturada e aponta as que
+#      leem sequencialmente uma tabela grande;
+#   4. desfaz tudo (ROLLBACK).
+# Cria partições e insere ~100 mil linhas antes de desfazer: só
+# roda contra um PostgreSQL local descartável (recusa qualquer
+# outro). Uso: python verificar_planos.py --linhas 100000
+# ============================================================
+
+import argparse
+import json
+import sys
+from datetime import date
+
+from sqlalchemy import event, text
+
+from app import create_app, db
+from app.servicos.sinteticos import banco_local
+
+# Tabelas pequenas por natureza: leitura sequencial é esperada
+SEMPRE_PERMITIDAS = {"versoes_tabelas"}
+
+# Caso -> (requisições GET ou função, tabelas com leitura completa esperada)
+# Os serviços que varrem uma tabela inteira por desenho declaram a exceção.
+CASOS = {
+    "profissionais": ("/profissionais/", set()),
+    "profissionais por cargo": ("/profissionais/?cargo=Enfermeiro", set()),
+    "plantões": ("/plantoes/", set()),
+    "plantões por período": ("/plantoes/?data_inicio=2025-07-01&data_fim=2025-07-07", set()),
+    "escalas": ("/escalas/", set()),
+    "escalas por período": ("/escalas/?data_inicio=2025-07-01&data_fim=2025-07-07", set()),
+    "escalas por cargo": ("/escalas/?cargo=Enfermeiro", set()),
+    "substituições": ("/substituicoes/", set()),
+    "substituições pendentes": ("/substituicoes/?status=pendente", set()),
+    # Sem filtros a rota devolve a tabela inteira (exportação): confere os filtros
+    "api substituições pendentes": ("/api/substituicoes?status=pendente", set()),
+    "api substituições por profissional": ("/api/substituicoes?id_profissional=1", set()),
+    "exportação do mês": ("/api/escalas/exportar?mes=2025-07", set()),
+    "api auditoria": ("/api/auditoria?entidade=escalas&id_entidade=1", set()),
+    "plantões vagos": ("plantoes_vagos", set()),
+    "conflitos": ("varrer_conflitos", set()),
+    # O índice de alocações carrega todas as escalas ativas (com TTL)
+    "sugestão de substitutos": ("sugerir_substituto", {"escalas", "plantoes"}),
+    "preenchimento (simulação)": ("preencher_vagas", {"escalas", "plantoes"}),
+    # O painel lê os resumos inteiros e todos os profissionais
+    "painel": ("dados_do_painel", {"profissionais", "resumo_carga_profissional",
+                                  "resumo_substituicoes_status", "resumo_plantoes_dia"}),
+}
+
+INICIO, FIM = date(2025, 7, 1), date(2025, 7, 31)
+
+
+def _executar_servico(nome):
+    if nome == "plantoes_vagos":
+        from app.servicos.escalonamento import plantoes_vagos
+        plantoes_vagos(INICIO, FIM)
+    elif nome == "varrer_conflitos":
+        from app.servicos.conflitos import varrer_conflitos
+        varrer_conflitos(INICIO, FIM)
+    elif nome == "sugerir_substituto":
+        from app.servicos.substitutos import invalidar_indice, sugerir_substituto
+        invalidar_indice()
+        sugerir_substituto(1, 1)
+    elif nome == "preencher_vagas":
+        from app.servicos.escalonamento import preencher_vagas
+        from app.servicos.substitutos import invalidar_indice
+        invalidar_indice()
+        preencher_vagas(INICIO, FIM, simular=True)
+    elif nome == "dados_do_painel":
+        from app.servicos.resumos import dados_do_painel
+        dados_do_painel()
+    db.session.rollback()
+
+
+# ------------------------------------------------------------
+# 🔹 1. Captura do SQL
+# ------------------------------------------------------------
+def capturar_consultas(app):
+    """Executa os casos e retorna {caso: [SQL com parâmetros]} (apenas SELECTs)."""
+    from app.cache import respostas
+
+    capturadas = {}
+    atual = []
+
+    def _capturar(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            atual.append(cursor.mogrify(statement, parameters).decode())
+
+    # Todas as engines: com réplicas configuradas, os GETs leem delas
+    for engine in db.engines.values():
+        event.listen(engine, "before_cursor_execute", _capturar)
+    try:
+        cliente = app.test_client()
+        for caso, (alvo, _) in CASOS.items():
+            atual.clear()
+            respostas.limpar()  # uma resposta em cache não executaria a consulta
+            if alvo.startswith("/"):
+                resposta = cliente.get(alvo)
+                resposta.get_data()  # consome respostas transmitidas em blocos
+                resposta.close()
+                if resposta.status_code != 200:
+                    raise RuntimeError(f"{caso}: GET {alvo} retornou {resposta.status_code}")
+            else:
+                _executar_servico(alvo)
+            capturadas[caso] = list(dict.fromkeys(atual))
+    finally:
+        for engine in db.engines.values():
+            event.remove(engine, "before_cursor_execute", _capturar)
+    return capturadas
+
+
+# ------------------------------------------------------------
+# 🔹 2. Dados sintéticos (dentro da transação)
+# ------------------------------------------------------------
+def _popular(conexao, linhas):
+    """Insere `linhas` plantões/escalas (e proporcionalmente os demais) sem sobreposições.
+
+    Os ids vêm das sequências (nextval), como nas gravações da aplicação:
+    nada colide com inserções concorrentes.
+    """
+    n_prof = max(linhas // 50, 100)
+    parametros = {"n": linhas, "np": n_prof}
+
+    # Número sintético -> id tirado da sequência de cada tabela
+    conexao.execute(text("""
+        CREATE TEMP TABLE planos_profissionais ON COMMIT DROP AS
+        SELECT i, nextval(pg_get_serial_sequence('profissionais', 'id')) AS id
+          FROM generate_series(0, :np - 1) AS i
+    """), parametros)
+    conexao.execute(text("""
+        CREATE TEMP TABLE planos_plantoes ON COMMIT DROP AS
+        SELECT i, nextval(pg_get_serial_sequence('plantoes', 'id')) AS id_plantao,
+                  nextval(pg_get_serial_sequence('escalas', 'id')) AS id_escala
+          FROM generate_series(0, :n - 1) AS i
+    """), parametros)
+    conexao.execute(text("ALTER TABLE planos_profissionais ADD PRIMARY KEY (i)"))
+    conexao.execute(text("ALTER TABLE planos_plantoes ADD PRIMARY KEY (i)"))
+
+    conexao.execute(text("""
+        INSERT INTO profissionais (id, nome, cargo, email, telefone, ativo)
+        SELECT id, 'Sintético ' || i,
+               (ARRAY['Enfermeiro', 'Técnico de Enfermagem', 'Médico', 'Fisioterapeuta', 'Auxiliar'])[1 + i % 5],
+               'sintetico' || id || '@planos.local', NULL, true
+          FROM planos_profissionais
+    """), parametros)
+    # Partições mensais dos dias sintéticos (a partir de 2020-01-01)
+    conexao.execute(text("""
+        SELECT criar_particoes_mes(m::date)
+          FROM generate_series(DATE '2020-01-01', DATE '2020-01-01' + (:n - 1) / :np,
+                               INTERVAL '1 month') AS m
+    """), parametros)
+    # Cada profissional recebe no máximo um plantão (08h–14h) por dia
+    conexao.execute(text("""
+        INSERT INTO plantoes (id, data, hora_inicio, hora_fim, id_funcao, id_local)
+        SELECT id_plantao, DATE '2020-01-01' + (i / :np), TIME '08:00', TIME '14:00', 1 + i % 5, 1 + i % 20
+          FROM planos_plantoes
+    """), parametros)
+    conexao.execute(text("""
+        INSERT INTO escalas (id, id_plantao, data_plantao, id_profissional, status, data_alocacao)
+        SELECT pl.id_escala, pl.id_plantao, DATE '2020-01-01' + (pl.i / :np), pr.id,
+               CASE WHEN pl.i % 20 = 0 THEN 'cancelado' ELSE 'ativo' END,
+               TIMESTAMP '2020-01-01' + (pl.i / :np) * INTERVAL '1 day' - INTERVAL '7 days'
+          FROM planos_plantoes pl
+          JOIN planos_profissionais pr ON pr.i = pl.i % :np
+    """), parametros)
+    conexao.execute(text("""
+        INSERT INTO substituicoes (id_escala_original, id_profissional_solicitante,
+                                   id_profissional_substituto, data_solicitacao, status)
+        SELECT pl.id_escala, solicitante.id, substituto.id,
+               TIMESTAMP '2020-01-01' + (pl.i / :np) * INTERVAL '1 day',
+               CASE WHEN pl.i % 200 = 0 THEN 'pendente' WHEN pl.i % 30 = 0 THEN 'recusado' ELSE 'aprovado' END
+          FROM planos_plantoes pl
+          JOIN planos_profissionais solicitante ON solicitante.i = pl.i % :np
+          JOIN planos_profissionais substituto ON substituto.i = (pl.i + 1) % :np
+         WHERE pl.i % 10 = 0
+    """), parametros)
+    conexao.execute(text("""
+        INSERT INTO auditoria (entidade, id_entidade, acao, usuario, data_hora)
+        SELECT 'escala', id_escala, 'criado', 'sintetico', TIMESTAMP '2020-01-01' + i * INTERVAL '1 minute'
+          FROM planos_plantoes
+    """), parametros)
+    for tabela in ("profissionais", "plantoes", "escalas", "substituicoes", "auditoria"):
+        conexao.execute(text(f"ANALYZE {tabela}"))
+
+
+# ------------------------------------------------------------
+# 🔹 3. EXPLAIN
+# ------------------------------------------------------------
+def _leituras_sequenciais(plano):
+    """Percorre o plano (FORMAT JSON) e retorna as tabelas lidas com Seq Scan."""
+    encontradas = []
+    pilha = [plano]
+    while pilha:
+        no = pilha.pop()
+        if no.get("Node Type") == "Seq Scan":
+            encontradas.append(no["Relation Name"])
+        pilha.extend(no.get("Plans", []))
+    return encontradas
+
+
+def verificar_planos(app, linhas=100_000, minimo_linhas=10_000):
+    """Retorna as consultas por caso e os problemas ({caso, consulta, tabela, linhas}).
+
+    Tabelas com menos de `minimo_linhas` linhas estimadas são ignoradas:
+    para elas o Seq Scan costuma ser o melhor plano.
+    """
+    capturadas = capturar_consultas(app)
+
+    problemas = []
+    with db.engine.connect() as conexao:
+        transacao = conexao.begin()
+        try:
+            _popular(conexao, linhas)
+            tamanhos = dict(conexao.execute(text(
+                "SELECT relname, reltuples::bigint FROM pg_class WHERE relkind = 'r'"
+            )).all())
+            # Partições (plantoes_2025_07, ...) respondem pela tabela particionada
+            particionadas = dict(conexao.execute(text(
+                "SELECT c.relname, p.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+                "WHERE c.relkind = 'r'"
+            )).all())
+            for caso, consultas in capturadas.items():
+                permitidas = CASOS[caso][1] | SEMPRE_PERMITIDAS
+                for sql in consultas:
+                    plano = conexao.exec_driver_sql("EXPLAIN (FORMAT JSON) " + sql).scalar()
+                    if isinstance(plano, str):
+                        plano = json.loads(plano)
+                    for tabela in _leituras_sequenciais(plano[0]["Plan"]):
+                        if (particionadas.get(tabela, tabela) in permitidas
+                                or tamanhos.get(tabela, 0) < minimo_linhas):
+                            continue
+                        problemas.append({"caso": caso, "consulta": sql, "tabela": tabela,
+                                          "linhas": tamanhos.get(tabela, 0)})
+        finally:
+            transacao.rollback()
+    return {"casos": {c: len(q) for c, q in capturadas.items()}, "problemas": problemas}
+
+
+# ------------------------------------------------------------
+# 🔹 Execução
+# ------------------------------------------------------------
+def _bancos_remotos():
+    """URLs (sem senha) dos bancos usados que não são locais: primário e réplicas."""
+    return [
+        engine.url.render_as_string(hide_password=True)
+        for engine in db.engines.values()
+        if not banco_local(engine.url)
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="EXPLAIN das consultas da aplicação com dados em volume (banco local descartável)."
+    )
+    parser.add_argument("--linhas", type=int, default=100_000, help="Plantões/escalas sintéticos inseridos.")
+    parser.add_argument("--minimo-linhas", type=int, default=10_000,
+                        help="Ignora leituras sequenciais em tabelas menores que isso.")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        remotos = _bancos_remotos()
+        if remotos:
+            sys.exit("❌ Recusado: a verificação cria partições e insere dados em volume. "
+                     f"Aponte o .env para um PostgreSQL local descartável (banco atual: {', '.join(remotos)}).")
+        resultado = verificar_planos(app, linhas=args.linhas, minimo_linhas=args.minimo_linhas)
+
+    for caso, total in resultado["casos"].items():
+        print(f"🔬 {caso}: {total} consulta(s)")
+    for p in resultado["problemas"]:
+        print(f"❌ {p['caso']}: Seq Scan em {p['tabela']} (~{p['linhas']} linhas)\n   {p['consulta']}")
+    print(f"📋 {len(resultado['problemas'])} leitura(s) sequencial(is) indevida(s).")
+    if resultado["problemas"]:
+        sys.exit(1)